@@ -21,8 +21,8 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from app.models.base_model import BaseModel
-from app.models.product import Product
-from app.models.order import Order
+from app.models.product import CatalogVersion, Product, ProductStockShard
+from app.models.order import Order, OrderIdempotencyKey, OrderItem
 
 target_metadata = BaseModel.metadata
 
@@ -33,6 +33,13 @@ target_metadata = BaseModel.metadata
 def get_url():
     return str(settings.SQLALCHEMY_DATABASE_URI)
 
+# Created by DDL outside the models (see app/models/product.py), so that
+# autogenerate does not offer to drop them
+UNMAPPED_SCHEMA_OBJECTS = {"search_vector", "ix_products_search_vector"}
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and name in UNMAPPED_SCHEMA_OBJECTS)
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -49,6 +56,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -74,7 +82,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
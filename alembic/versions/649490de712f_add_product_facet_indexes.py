@@ -0,0 +1,40 @@
+"""Add product facet indexes
+
+Revision ID: 649490de712f
+Revises: b0f6a50ccecf
+Create Date: 2026-10-18 19:36:52.408113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '649490de712f'
+down_revision: Union[str, None] = 'b0f6a50ccecf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+IN_STOCK = sa.text('stock > 0 OR stock_shards > 0')
+NAME_SORT_KEY = sa.text('name COLLATE "C"')
+
+
+def upgrade() -> None:
+    op.create_index('ix_products_in_stock_id', 'products', ['id'], unique=False,
+                    postgresql_where=IN_STOCK, sqlite_where=IN_STOCK)
+    op.create_index('ix_products_price_id', 'products', ['price', 'id'], unique=False)
+    op.create_index('ix_products_in_stock_price_id', 'products', ['price', 'id'], unique=False,
+                    postgresql_where=IN_STOCK, sqlite_where=IN_STOCK)
+    op.create_index('ix_products_name_id', 'products', [NAME_SORT_KEY, 'id'], unique=False)
+    op.create_index('ix_products_in_stock_name_id', 'products', [NAME_SORT_KEY, 'id'], unique=False,
+                    postgresql_where=IN_STOCK, sqlite_where=IN_STOCK)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_in_stock_name_id', table_name='products')
+    op.drop_index('ix_products_name_id', table_name='products')
+    op.drop_index('ix_products_in_stock_price_id', table_name='products')
+    op.drop_index('ix_products_price_id', table_name='products')
+    op.drop_index('ix_products_in_stock_id', table_name='products')
@@ -0,0 +1,36 @@
+"""Add product search
+
+Revision ID: b0f6a50ccecf
+Revises: dd15bf7cd1da
+Create Date: 2026-10-18 18:44:30.117052
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b0f6a50ccecf'
+down_revision: Union[str, None] = 'dd15bf7cd1da'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_DOCUMENT = ("setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+                   "setweight(to_tsvector('english', coalesce(description, '')), 'B')")
+
+
+def upgrade() -> None:
+    # A stored generated column rewrites the products table once; the
+    # database keeps it current on every insert and update afterwards
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(),
+                                        sa.Computed(SEARCH_DOCUMENT, persisted=True), nullable=True))
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_search_vector', table_name='products', postgresql_using='gin')
+    op.drop_column('products', 'search_vector')
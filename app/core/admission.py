@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict
+from app.core.config import settings
+from app.core.log import SAMPLED
+from app.lib.exceptions import AppException, ErrorCode
+from app.lib.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    # Lower values are admitted first
+    ORDER_WRITE = 0
+    READ = 1
+
+admission_in_flight = registry.gauge(
+    "admission_in_flight", "Requests admitted to database work and not finished yet")
+admission_queue_depth = registry.gauge(
+    "admission_queue_depth", "Requests waiting for admission, by priority", ["priority"])
+admission_shed = registry.counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control, by priority and reason",
+    ["priority", "reason"])
+admission_wait = registry.histogram(
+    "admission_queue_wait_seconds", "Time admitted requests spent queued, by priority", ["priority"])
+
+
+class AdmissionController:
+    """Caps the requests of one worker doing database work at once.
+
+    Up to ``max_in_flight`` requests run; up to ``max_queue`` more wait, for
+    at most ``queue_timeout`` seconds, and a freed slot goes to the oldest
+    waiter of the highest priority. Anything beyond is shed at once with a
+    503 and ``Retry-After`` instead of piling up on pool checkouts. When the
+    queue is full, a request of higher priority takes the place of the most
+    recent waiter of a lower one, which is shed.
+
+    Runs on the event loop only, so its state needs no lock.
+    """
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float, retry_after: int,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters: Dict[Priority, Deque[asyncio.Future]] = {priority: deque() for priority in Priority}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        if not self.enabled:
+            yield
+            return
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: Priority) -> None:
+        """Wait for a slot, or raise SERVICE_UNAVAILABLE; pair with ``release``."""
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+            self.__update_gauges()
+            return
+        if self.queued >= self.max_queue and not self.__preempt(priority):
+            raise self.__shed(priority, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        self.__update_gauges()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except BaseException:
+            # Cancelled (the client went away) while queued
+            self.__abandon(priority, waiter)
+            raise
+        if not waiter.done():
+            self.__abandon(priority, waiter)
+            raise self.__shed(priority, "timeout")
+        # Raises the rejection of a waiter preempted by a higher priority
+        waiter.result()
+        admission_wait.observe(time.perf_counter() - started, priority=priority.name)
+
+    def release(self) -> None:
+        # The slot passes straight to the next waiter, so in_flight only
+        # drops when nobody is queued
+        for priority in Priority:
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    self.__update_gauges()
+                    return
+        self.in_flight -= 1
+        self.__update_gauges()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            **{f"queued_{priority.name.lower()}": len(self._waiters[priority]) for priority in Priority},
+        }
+
+    def __preempt(self, priority: Priority) -> bool:
+        for lower in reversed(Priority):
+            if lower <= priority:
+                return False
+            if self._waiters[lower]:
+                self._waiters[lower].pop().set_exception(self.__shed(lower, "preempted"))
+                return True
+        return False
+
+    def __abandon(self, priority: Priority, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            self._waiters[priority].remove(waiter)
+            waiter.cancel()
+            self.__update_gauges()
+        elif not waiter.cancelled() and waiter.exception() is None:
+            # Granted a slot just as the wait ended; hand it on
+            self.release()
+
+    def __shed(self, priority: Priority, reason: str) -> AppException:
+        admission_shed.inc(priority=priority.name, reason=reason)
+        # One line per shed request would add to the overload; the counter has them all
+        logger.info('Shedding a %s request (%s)', priority.name, reason,
+                    extra={**SAMPLED, **self.snapshot()})
+        return AppException(
+            error_code=ErrorCode.SERVICE_UNAVAILABLE,
+            message="The server is overloaded, retry later",
+            details={"reason": reason},
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def __update_gauges(self) -> None:
+        admission_in_flight.set(self.in_flight)
+        for priority in Priority:
+            admission_queue_depth.set(len(self._waiters[priority]), priority=priority.name)
+
+
+def default_max_in_flight() -> int:
+    # One request per connection the pool can hand out
+    return settings.ADMISSION_MAX_IN_FLIGHT or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+admission_controller = AdmissionController(default_max_in_flight(),
+                                           max_queue=settings.ADMISSION_MAX_QUEUE,
+                                           queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+                                           retry_after=settings.ADMISSION_RETRY_AFTER,
+                                           enabled=settings.ADMISSION_CONTROL)
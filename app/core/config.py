@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing_extensions import Self
-from typing import Literal, Union
+from typing import List, Literal, Union
 from pydantic import HttpUrl, PostgresDsn, computed_field
 from pydantic_core import MultiHostUrl
 
@@ -12,6 +12,49 @@ class Settings(BaseSettings):
           extra="ignore",
       )
     ENVIRONMENT: Literal["development", "staging", "production"] = "development"
+    # "async" serves requests from an AsyncEngine built on ASYNC_DATABASE_URL,
+    # "sync" keeps the blocking engine (services then run in the threadpool)
+    DATABASE_MODE: Literal["sync", "async"] = "sync"
+
+    # Root log level; records are written as JSON lines (or "text") by a
+    # background thread. Messages logged with extra=SAMPLED, like the per
+    # product stock updates, are kept at LOG_SAMPLE_RATE
+    LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    LOG_SAMPLE_RATE: float = 0.01
+    # Log every SQL statement, through the same pipeline
+    DB_ECHO: bool = False
+    # One app.access line per request, with its status, duration and SQL
+    # statement count (uvicorn's own access log is turned off in entrypoint.sh)
+    ACCESS_LOG: bool = True
+
+    # Connection pool, per engine and per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+
+    # Read replicas for the read-only routes, as a JSON list of sync URLs
+    # (async mode reaches them through asyncpg). Reads go to the replica with
+    # the fewest connections in use ("least_connections") or in turn
+    # ("round_robin"); replicas more than READ_REPLICA_MAX_LAG seconds behind
+    # are left out, rechecked every READ_REPLICA_CHECK_INTERVAL seconds
+    READ_REPLICA_URLS: List[str] = []
+    READ_REPLICA_ROUTING: Literal["least_connections", "round_robin"] = "least_connections"
+    READ_REPLICA_MAX_LAG: float = 5.0
+    READ_REPLICA_CHECK_INTERVAL: float = 5.0
+
+    # Admission control of the products and orders routes, per worker:
+    # ADMISSION_MAX_IN_FLIGHT requests do database work at once (0: one per
+    # pool connection, DB_POOL_SIZE + DB_MAX_OVERFLOW), ADMISSION_MAX_QUEUE
+    # more wait up to ADMISSION_QUEUE_TIMEOUT seconds, order writes first;
+    # the rest get a 503 with Retry-After: ADMISSION_RETRY_AFTER
+    ADMISSION_CONTROL: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = 0
+    ADMISSION_MAX_QUEUE: int = 100
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+    ADMISSION_RETRY_AFTER: int = 1
 
     SENTRY_DSN: Union[HttpUrl, None] = None
     POSTGRES_SERVER: str
@@ -20,7 +63,24 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
     PRODUCT_TOKEN: str = ""
+    # Rows validated and written per transaction by POST /products/bulk
+    BULK_IMPORT_CHUNK_SIZE: int = 1000
+    # Longer lines (and CSV records) are reported as row errors and skipped
+    BULK_IMPORT_MAX_LINE_BYTES: int = 65536
+    # Per-process catalog cache; PRODUCT_CACHE_SIZE=0 disables it
+    PRODUCT_CACHE_SIZE: int = 1024
+    PRODUCT_CACHE_TTL: float = 30.0
+    # GET /products returns the page pre-serialized to JSON by the service,
+    # bypassing FastAPI's response_model validation and serialization
+    FAST_JSON_RESPONSES: bool = False
     ORDER_TOKEN: str = ""
+    # Group commit for POST /orders: concurrent orders arriving within
+    # ORDER_BATCH_MAX_WAIT seconds are placed in one transaction
+    ORDER_BATCHING: bool = False
+    ORDER_BATCH_MAX_SIZE: int = 50
+    ORDER_BATCH_MAX_WAIT: float = 0.005
+    # Seconds a POST /orders Idempotency-Key replays its order's response
+    IDEMPOTENCY_KEY_TTL: int = 86400
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -1,18 +1,66 @@
+from typing import Callable, TypeVar, Union
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument_engine
+
+T = TypeVar("T")
+
+def pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
 
 engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI),
-                       echo=settings.ENVIRONMENT == "development")
+                       poolclass=InstrumentedQueuePool,
+                       **pool_options())
+instrument_engine("primary", engine)
+
+# Objects returned by the services are serialized after the session has
+# committed, so they must not be expired (an async session cannot lazy load).
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.DATABASE_MODE == "async":
+    async_engine = create_async_engine(settings.ASYNC_DATABASE_URL,
+                                       poolclass=InstrumentedAsyncAdaptedQueuePool,
+                                       **pool_options())
+    instrument_engine("primary_async", async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
 
 Base = declarative_base()
 
-def get_session():
+DBSession = Union[Session, AsyncSession]
+
+def get_sync_session():
     try:
-        with Session(engine) as session:
+        with SessionLocal() as session:
             yield session
     finally:
         session.close()
 
+async def get_async_session():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+get_session = get_async_session if settings.DATABASE_MODE == "async" else get_sync_session
+
+async def run_with_session(db: DBSession, fn: Callable[[Session], T]) -> T:
+    """Run a sync unit of work against ``db`` without blocking the event loop.
+
+    An ``AsyncSession`` runs ``fn`` through ``run_sync`` so every statement is
+    awaited on the async driver; a plain ``Session`` is handed to the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn)
+    return await run_in_threadpool(fn, db)
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
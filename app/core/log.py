@@ -0,0 +1,125 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+from app.core.config import settings
+
+# Pass as ``extra`` on high-volume messages (one per product, per shard...)
+# so that only LOG_SAMPLE_RATE of them are written
+SAMPLED = {"sampled": True}
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the ``extra`` fields of the call."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps ``rate`` of the records logged with ``extra=SAMPLED``, below WARNING."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        record.sample_rate = self.rate
+        return random.random() < self.rate
+
+
+class _StderrHandler(logging.StreamHandler):
+    # Looks sys.stderr up on every write, so that redirecting it (as pytest
+    # does) redirects the logs too
+    def __init__(self):
+        super().__init__(sys.stderr)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default merges the traceback into the message; keep them apart
+        # for the JSON formatter, and drop what cannot cross threads cheaply
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _QueueListener(QueueListener):
+    def stop(self) -> None:
+        # Safe to call again, from the atexit hook or a later setup
+        if self._thread is not None:
+            super().stop()
+
+
+_listener: Optional[QueueListener] = None
+
+def configure_logging(level: str, format: str, sample_rate: float, db_echo: bool = False,
+                      stream: Optional[TextIO] = None) -> QueueListener:
+    """Route every record through a queue to one handler on a background thread.
+
+    A request only pays for filtering and enqueueing; formatting and the
+    write happen on the listener's thread. Replaces any earlier setup.
+    """
+    global _listener
+    shutdown_logging()
+
+    handler = logging.StreamHandler(stream) if stream is not None else _StderrHandler()
+    handler.setFormatter(JsonFormatter() if format == "json" else
+                         logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    # SQL statements go through the same pipeline instead of echo's own handler
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if db_echo else logging.WARNING)
+
+    _listener = _QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def setup_logging() -> QueueListener:
+    return configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_SAMPLE_RATE, settings.DB_ECHO)
+
+def shutdown_logging() -> None:
+    """Write out what is still queued and stop the listener's thread."""
+    if _listener is not None:
+        _listener.stop()
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,194 @@
+import asyncio
+import itertools
+import logging
+from typing import Callable, List, Optional, Union
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.db import DBSession, get_session, pool_options
+from app.core.pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument_engine
+from app.lib.exceptions import AppException, ErrorCode
+
+logger = logging.getLogger(__name__)
+
+# Sent by a client that must see its own writes, e.g. right after POST /orders
+READ_PRIMARY_HEADER = "x-read-primary"
+# Set in Session.info of the primary session of such a request, which must not
+# be served cached copies that may predate those writes
+READS_OWN_WRITES = "reads_own_writes"
+
+# Seconds the replica's replayed state is behind the primary; 0 when it has
+# replayed everything it received (an idle primary leaves the last replay
+# timestamp behind, which is not lag)
+PG_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaSession(Session):
+    """Session of a read replica: rejects writes and row locks up front.
+
+    Those would fail on a hot standby anyway, and must go to the primary.
+    """
+
+
+@event.listens_for(ReplicaSession, "do_orm_execute")
+def _reject_writes(orm_execute_state):
+    # Textual statements (EXPLAIN) pass; a hot standby still refuses writes in them
+    statement = orm_execute_state.statement
+    if (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete
+            or getattr(statement, "_for_update_arg", None) is not None):
+        raise AppException(
+            error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            message="Writes and locking reads must use the primary",
+            details={"statement": str(statement)[:200]},
+        )
+
+@event.listens_for(ReplicaSession, "before_flush")
+def _reject_flush(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise AppException(
+            error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            message="Writes and locking reads must use the primary",
+        )
+
+
+class Replica:
+    def __init__(self, name: str, engine: Union[Engine, AsyncEngine]):
+        self.name = name
+        self.engine = engine
+        if isinstance(engine, AsyncEngine):
+            self.session_factory = async_sessionmaker(bind=engine, expire_on_commit=False,
+                                                      sync_session_class=ReplicaSession)
+        else:
+            self.session_factory = sessionmaker(bind=engine, expire_on_commit=False, class_=ReplicaSession)
+        # In rotation until a health check says otherwise
+        self.healthy = True
+        self.lag: Optional[float] = None
+
+    @property
+    def pool(self):
+        return self.engine.sync_engine.pool if isinstance(self.engine, AsyncEngine) else self.engine.pool
+
+    def connections_in_use(self) -> int:
+        return self.pool.checkedout()
+
+
+class ReplicaSet:
+    """Read replicas of one worker, and which of them take reads.
+
+    ``choose`` picks among the replicas in rotation, round-robin or the one
+    with the fewest checked-out connections, or returns None when there is
+    none (reads then go to the primary). ``check`` measures each replica's
+    replication lag and takes out of rotation those behind by more than
+    ``max_lag`` seconds or not answering; they come back once they catch up.
+    """
+    def __init__(self, replicas: List[Replica], strategy: str = "least_connections", max_lag: float = 5.0,
+                 lag_probe: Optional[Callable] = None):
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self._lag_probe = lag_probe or self.__query_lag
+        self._next = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        candidates = [replica for replica in self.replicas if replica.healthy]
+        if not candidates:
+            return None
+        if self.strategy == "round_robin":
+            return candidates[next(self._next) % len(candidates)]
+        return min(candidates, key=Replica.connections_in_use)
+
+    async def check(self) -> None:
+        for replica in self.replicas:
+            try:
+                lag = await self._lag_probe(replica)
+            except Exception as e:
+                lag = None
+                logger.warning('Replica %s failed its health check: %s', replica.name, e)
+            healthy = lag is not None and lag <= self.max_lag
+            if healthy != replica.healthy:
+                logger.warning('Replica %s %s rotation (lag: %s)', replica.name,
+                               "back in" if healthy else "taken out of", lag)
+            replica.healthy, replica.lag = healthy, lag
+
+    async def run_health_checks(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
+
+    @staticmethod
+    async def __query_lag(replica: Replica) -> float:
+        # Only PostgreSQL reports replay lag; other databases (SQLite stand-ins
+        # in tests) count as caught up once they answer
+        if isinstance(replica.engine, AsyncEngine):
+            async with replica.engine.connect() as conn:
+                query = PG_LAG_QUERY if conn.dialect.name == "postgresql" else text("SELECT 0")
+                return float((await conn.execute(query)).scalar())
+
+        def probe() -> float:
+            with replica.engine.connect() as conn:
+                query = PG_LAG_QUERY if conn.dialect.name == "postgresql" else text("SELECT 0")
+                return float(conn.execute(query).scalar())
+        return await run_in_threadpool(probe)
+
+
+def create_replica_set() -> ReplicaSet:
+    replicas = []
+    for index, url in enumerate(settings.READ_REPLICA_URLS):
+        name = f"replica{index}"
+        if settings.DATABASE_MODE == "async":
+            # Same server, driven through asyncpg like the primary
+            engine = create_async_engine(make_url(url).set(drivername="postgresql+asyncpg"),
+                                         poolclass=InstrumentedAsyncAdaptedQueuePool, **pool_options())
+            instrument_engine(name, engine.sync_engine)
+        else:
+            engine = create_engine(url, poolclass=InstrumentedQueuePool, **pool_options())
+            instrument_engine(name, engine)
+        replicas.append(Replica(name, engine))
+    return ReplicaSet(replicas, strategy=settings.READ_REPLICA_ROUTING, max_lag=settings.READ_REPLICA_MAX_LAG)
+
+replica_set = create_replica_set()
+
+
+def reads_primary(request: Request) -> bool:
+    return request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true", "yes")
+
+async def get_read_session(request: Request, primary: DBSession = Depends(get_session)):
+    """``get_session`` for read-only routes: a replica session when one is in rotation.
+
+    Falls back to the primary session when no replica is configured or
+    healthy, or when the request sends ``X-Read-Primary: true`` to read its
+    own writes; that session is then flagged with ``READS_OWN_WRITES``. The
+    primary session only checks out a connection if used.
+    """
+    if reads_primary(request):
+        primary.info[READS_OWN_WRITES] = True
+        try:
+            yield primary
+        finally:
+            primary.info.pop(READS_OWN_WRITES, None)
+        return
+    replica = replica_set.choose()
+    if replica is None:
+        yield primary
+        return
+    if isinstance(replica.engine, AsyncEngine):
+        async with replica.session_factory() as session:
+            yield session
+    else:
+        session = replica.session_factory()
+        try:
+            yield session
+        finally:
+            await run_in_threadpool(session.close)
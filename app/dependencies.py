@@ -1,11 +1,11 @@
 from typing import Annotated
 from app.core.config import settings
+from app.core.admission import Priority, admission_controller
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-from fastapi import Header, HTTPException
+from fastapi import Header, HTTPException, Request
 
 async def get_product_header(x_token: Annotated[str, Header()]):
     if x_token != settings.PRODUCT_TOKEN:
@@ -14,3 +14,14 @@ async def get_product_header(x_token: Annotated[str, Header()]):
 async def get_order_header(x_token: Annotated[str, Header()]):
     if x_token != settings.ORDER_TOKEN:
         raise HTTPException(status_code=400, detail="X-Token header invalid")
+
+
+# Declared after the token checks and before the session, so a shed request
+# never waits for a connection
+async def admit_catalog():
+    async with admission_controller.slot(Priority.READ):
+        yield
+
+async def admit_order(request: Request):
+    async with admission_controller.slot(Priority.READ if request.method == "GET" else Priority.ORDER_WRITE):
+        yield
@@ -0,0 +1,135 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, Tuple, Union
+from app.core.config import settings
+from app.lib.exceptions import AppException, ErrorCode
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_CONTENT_TYPES = ("text/csv",)
+
+# A parsed row, or the reason it could not be parsed
+RawRow = Union[Dict[str, Any], str]
+
+class BadLine(str):
+    """A line that could not be read, carrying why; reported as that row's error."""
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without holding more than one line.
+
+    A UTF-8 byte order mark is only dropped at the start of the stream. A
+    line that is not valid UTF-8, or longer than ``max_line_bytes`` (whose
+    bytes are discarded as they arrive), comes out as a ``BadLine``.
+    """
+    pending = b""
+    at_start = True
+    # Inside a line already found too long: its bytes up to the next newline are dropped
+    overlong = False
+
+    def decode(line: bytes) -> str:
+        nonlocal at_start
+        if at_start:
+            at_start = False
+            if line.startswith(codecs.BOM_UTF8):
+                line = line[len(codecs.BOM_UTF8):]
+        if len(line) > max_line_bytes:
+            return BadLine(f"Line longer than {max_line_bytes} bytes")
+        try:
+            return line.decode("utf-8").rstrip("\r")
+        except UnicodeDecodeError as e:
+            return BadLine(f"Invalid UTF-8 at byte {e.start}: {e.reason}")
+
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if overlong:
+                overlong = False
+                at_start = False
+                yield BadLine(f"Line longer than {max_line_bytes} bytes")
+            else:
+                yield decode(line)
+        if len(pending) > max_line_bytes + len(codecs.BOM_UTF8):
+            overlong, pending = True, b""
+    if overlong:
+        yield BadLine(f"Line longer than {max_line_bytes} bytes")
+    elif pending:
+        yield decode(pending)
+
+async def iter_rows(chunks: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Tuple[int, RawRow]]:
+    """Yield ``(row_number, row)`` for each record of an NDJSON or CSV upload.
+
+    Rows are numbered from 1, not counting the CSV header. A row that cannot
+    be parsed is yielded as an error message so the caller can report it and
+    carry on with the rest of the stream.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    max_line_bytes = settings.BULK_IMPORT_MAX_LINE_BYTES
+    if media_type in NDJSON_CONTENT_TYPES:
+        rows = _iter_ndjson(iter_lines(chunks, max_line_bytes))
+    elif media_type in CSV_CONTENT_TYPES:
+        rows = _iter_csv(iter_lines(chunks, max_line_bytes), max_line_bytes)
+    else:
+        raise AppException(
+            error_code=ErrorCode.BAD_REQUEST,
+            message="Unsupported content type for bulk import",
+            details={'content_type': content_type,
+                     'supported': list(NDJSON_CONTENT_TYPES + CSV_CONTENT_TYPES)}
+        )
+
+    row_number = 0
+    async for row in rows:
+        row_number += 1
+        yield row_number, row
+
+async def _iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[RawRow]:
+    async for line in lines:
+        if isinstance(line, BadLine):
+            yield str(line)
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield f"Invalid JSON: {e}"
+            continue
+        yield row if isinstance(row, dict) else "Each line must be a JSON object"
+
+async def _iter_csv(lines: AsyncIterator[str], max_record_bytes: int) -> AsyncIterator[RawRow]:
+    header = None
+    record = None
+    async for line in lines:
+        if isinstance(line, BadLine):
+            if header is None:
+                # Nothing has been written yet, and no row can be read without it
+                raise AppException(
+                    error_code=ErrorCode.BAD_REQUEST,
+                    message="Unreadable CSV header",
+                    details={'reason': str(line)}
+                )
+            # Also ends a quoted field it may have been part of
+            record = None
+            yield str(line)
+            continue
+        record = line if record is None else f"{record}\n{line}"
+        if len(record) > max_record_bytes:
+            # A quote left open would otherwise gather the rest of the upload
+            record = None
+            yield f"Record longer than {max_record_bytes} characters"
+            continue
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            continue
+        fields, record = next(csv.reader([record]), []), None
+        if not fields:
+            continue
+        if header is None:
+            header = [name.strip() for name in fields]
+        elif len(fields) != len(header):
+            yield f"Expected {len(header)} columns, got {len(fields)}"
+        else:
+            yield dict(zip(header, fields))
+    if record is not None:
+        yield "Unterminated quoted field"
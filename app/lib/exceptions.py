@@ -23,6 +23,7 @@ class ErrorCode(Enum):
     VALIDATION_ERROR = (400, HTTPStatus.BAD_REQUEST, "Validation Error")
     INVALID_PRODUCT_DATA = (400, HTTPStatus.BAD_REQUEST, "Invalid Product Data")
     INVALID_ORDER_DATA = (400, HTTPStatus.BAD_REQUEST, "Invalid Order Data")
+    IDEMPOTENCY_KEY_REUSED = (422, HTTPStatus.UNPROCESSABLE_ENTITY, "Idempotency Key Reused")
 
     # Authentication/Authorization Errors
     AUTHENTICATION_FAILED = (401, HTTPStatus.UNAUTHORIZED, "Authentication Failed")
@@ -53,12 +54,15 @@ class AppException(Exception):
         error_code: ErrorCode,
         message: Optional[str] = None,
         details: Optional[Dict[str, Any]] = None,
-        original_error: Optional[Exception] = None
+        original_error: Optional[Exception] = None,
+        headers: Optional[Dict[str, str]] = None
     ):
         self.error_code = error_code
         self.message = message or error_code.message
         self.details = details or {}
         self.original_error = original_error
+        # Sent with the error response, e.g. Retry-After
+        self.headers = headers or {}
         super().__init__(self.message)
 
     def to_dict(self) -> Dict[str, Any]:
@@ -0,0 +1,27 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, Sequence
+
+EXPORT_FIELDS = ("id", "name", "description", "price", "stock")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+async def encode_export(batches: AsyncIterator[Sequence[Dict[str, Any]]], fmt: str) -> AsyncIterator[bytes]:
+    """Encode batches of product rows as one NDJSON or CSV byte chunk per batch."""
+    if fmt == "csv":
+        yield _csv_chunk([EXPORT_FIELDS])
+    async for batch in batches:
+        if fmt == "csv":
+            yield _csv_chunk([[row[field] for field in EXPORT_FIELDS] for row in batch])
+        else:
+            yield "".join(json.dumps({field: row[field] for field in EXPORT_FIELDS}, separators=(",", ":")) + "\n"
+                          for row in batch).encode()
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
@@ -0,0 +1,31 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict
+from app.lib.exceptions import AppException, ErrorCode
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Turn the keyset position of the last row on a page into an opaque token."""
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *keys: str) -> Dict[str, Any]:
+    """Inverse of encode_cursor; ``keys`` must all be present in the token."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError) as e:
+        raise AppException(
+            error_code=ErrorCode.VALIDATION_ERROR,
+            message="Invalid pagination cursor",
+            details={'cursor': cursor},
+            original_error=e
+        ) from e
+
+    if not isinstance(position, dict) or any(key not in position for key in keys):
+        raise AppException(
+            error_code=ErrorCode.VALIDATION_ERROR,
+            message="Invalid pagination cursor",
+            details={'cursor': cursor}
+        )
+    return position
@@ -1,16 +1,29 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routers.api.v1 import main
-import logging
-from app.middleware import error_handler_middleware
+from app.core.config import settings
+from app.core.log import setup_logging
+from app.core.replicas import replica_set
+from app.middleware import ErrorHandlerMiddleware, MetricsMiddleware, QueryStatsMiddleware
+from app.routers import metrics
 
-app = FastAPI(title='E- Commerce App', version='1.0', description='E-Commerce app Made with FastApi and ❤️.')
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Replicas are checked before the first request, then in the background
+    health_checks = None
+    if replica_set:
+        await replica_set.check()
+        health_checks = asyncio.create_task(replica_set.run_health_checks(settings.READ_REPLICA_CHECK_INTERVAL))
+    yield
+    if health_checks is not None:
+        health_checks.cancel()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+app = FastAPI(title='E- Commerce App', version='1.0', description='E-Commerce app Made with FastApi and ❤️.',
+              lifespan=lifespan)
+
+setup_logging()
 
 # CORS middleware configuration
 app.add_middleware(
@@ -22,6 +35,14 @@ app.add_middleware(
 )
 
 # Error handling middleware
-app.middleware("http")(error_handler_middleware)
+app.add_middleware(ErrorHandlerMiddleware)
+
+# SQL statements per request, in Server-Timing and the access log; outside
+# the error handler so that error responses carry the header too
+app.add_middleware(QueryStatsMiddleware)
+
+# Request metrics, outermost so that error responses are counted too
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(main.api_v1_router, prefix='/api/v1')
+app.include_router(metrics.router)
@@ -1,70 +1,201 @@
-from fastapi import Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
+from app.core.config import settings
+from app.core.query_stats import track_queries
 from app.lib.exceptions import AppException, ErrorCode
+from app.lib.metrics import registry
 from pydantic import ValidationError
 import logging
+import time
 
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("app.access")
 
-async def error_handler_middleware(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except AppException as e:
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ["route", "method", "status"])
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and method", ["route", "method"])
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ["method"])
+app_errors = registry.counter(
+    "app_errors_total", "Errors turned into an error response, by ErrorCode", ["code"])
+
+def error_response(error: Exception, path: str) -> JSONResponse:
+    """Map an exception raised while handling a request to the JSON error contract."""
+    if isinstance(error, AppException):
+        app_errors.inc(code=error.error_code.name)
         logger.error(
             "Application error",
             extra={
-                "error_code": e.error_code.code,
-                "error_message": e.message,
-                "details": e.details,
-                "path": request.url.path
+                "error_code": error.error_code.code,
+                "error_message": error.message,
+                "details": error.details,
+                "path": path
             }
         )
-        return JSONResponse(
-            status_code=e.error_code.status,
-            content=e.to_dict()
-        )
-    except ValidationError as e:
+        app_error = error
+    elif isinstance(error, ValidationError):
+        app_errors.inc(code=ErrorCode.VALIDATION_ERROR.name)
         logger.error(
             "Validation error",
             extra={
-                "errors": e.errors(),
-                "path": request.url.path
+                "errors": error.errors(),
+                "path": path
             }
         )
         app_error = AppException(
             error_code=ErrorCode.VALIDATION_ERROR,
-            details={"validation_errors": e.errors()}
+            details={"validation_errors": error.errors()}
         )
-        return JSONResponse(
-            status_code=app_error.error_code.status,
-            content=app_error.to_dict()
-        )
-    except SQLAlchemyError as e:
+    elif isinstance(error, SQLAlchemyError):
+        app_errors.inc(code=ErrorCode.DATABASE_ERROR.name)
         logger.error(
             "Database error",
-            exc_info=True,
-            extra={"path": request.url.path}
+            exc_info=error,
+            extra={"path": path}
         )
         app_error = AppException(
             error_code=ErrorCode.DATABASE_ERROR,
             message="A database error occurred"
         )
-        return JSONResponse(
-            status_code=app_error.error_code.status,
-            content=app_error.to_dict()
-        )
-    except Exception as e:
+    else:
+        app_errors.inc(code=ErrorCode.UNKNOWN_ERROR.name)
         logger.error(
             "Unhandled exception",
-            exc_info=True,
-            extra={"path": request.url.path}
+            exc_info=error,
+            extra={"path": path}
         )
         app_error = AppException(
             error_code=ErrorCode.UNKNOWN_ERROR,
             message="An unexpected error occurred"
         )
-        return JSONResponse(
-            status_code=app_error.error_code.status,
-            content=app_error.to_dict()
-        )
\ No newline at end of file
+    return JSONResponse(
+        status_code=app_error.error_code.status,
+        content=app_error.to_dict(),
+        headers=app_error.headers
+    )
+
+
+class ErrorHandlerMiddleware:
+    """Pure ASGI middleware turning exceptions into JSON error responses.
+
+    Unlike an ``@app.middleware("http")`` function it does not wrap the
+    response in a ``BaseHTTPMiddleware`` stream, so streaming responses go
+    straight to the server. An exception raised after the response has
+    started cannot become an error response any more and is re-raised.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            if response_started:
+                raise
+            response = error_response(e, scope["path"])
+            await response(scope, receive, send)
+
+
+def route_template(scope) -> str:
+    """Full path template of the route that served ``scope``, or ``unmatched``.
+
+    FastAPI keeps included routers nested, so ``scope["route"]`` only knows its
+    own path; the effective route context it records has the prefixed one.
+    """
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    template = getattr(context, "path_format", None) or getattr(scope.get("route"), "path_format", None)
+    return template or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request counts, latency and in-flight requests.
+
+    Requests are labelled with the matched route's path template (e.g.
+    ``/api/v1/products/{product_id}``), or ``unmatched``, so the number of
+    series stays bounded whatever paths clients send.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method=method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(method=method)
+            route_path = route_template(scope)
+            http_requests.inc(route=route_path, method=method, status=status_code)
+            http_request_duration.observe(time.perf_counter() - started, route=route_path, method=method)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware counting the SQL statements of each request.
+
+    The count and time spent in the database so far go out in a
+    ``Server-Timing: db;dur=<ms>;desc="<n> queries"`` header, and the final
+    ones (including statements a streaming body runs after the headers) in
+    the ``app.access`` log line written once the response is complete.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        with track_queries() as stats:
+            async def send_wrapper(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    message["headers"] = [*message.get("headers", []),
+                                          (b"server-timing", stats.server_timing().encode("latin-1"))]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if settings.ACCESS_LOG:
+                    access_logger.info(
+                        '%s %s %s', scope["method"], scope["path"], status_code,
+                        extra={
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "route": route_template(scope),
+                            "status": status_code,
+                            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                            "db_queries": stats.count,
+                            "db_ms": round(stats.seconds * 1000, 2),
+                        }
+                    )
@@ -1,6 +1,6 @@
 from enum import Enum
 from app.models.base_model import BaseModel
-from sqlalchemy import Column, Integer, JSON, Float, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, JSON, Float, String, Enum as SQLAlchemyEnum
 
 
 class OrderStatus(Enum):
@@ -9,12 +9,61 @@ class OrderStatus(Enum):
 
 class Order(BaseModel):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # GET /orders pages newest first by (created_at, id), optionally for
+        # one status; both shapes are served in index order
+        Index('ix_orders_status_created_at_id', 'status', 'created_at', 'id'),
+        Index('ix_orders_created_at_id', 'created_at', 'id'),
+    )
 
-    id = Column(Integer, primary_key=True, unique=True, index=True)
+    id = Column(Integer, primary_key=True)
     products = Column(JSON, nullable=False)
 
     total_price = Column(Float, nullable=False, default=0.0)
     status = Column(SQLAlchemyEnum(OrderStatus), default=OrderStatus.PENDING, nullable=False)
 
     def __repr__(self):
-        return f'<Order Id: {self.id}, Product Id: {self.product_id}, Quantity: {self.quantity}, Status: {self.status}>'
\ No newline at end of file
+        return f'<Order Id: {self.id}, Product Id: {self.product_id}, Quantity: {self.quantity}, Status: {self.status}>'
+
+
+class OrderItem(BaseModel):
+    """One line of an order, queryable by product and frozen at purchase time.
+
+    ``Order.products`` keeps the same lines as JSON for the API response.
+    """
+    __tablename__ = 'order_items'
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    # No foreign key: the snapshot outlives the product row
+    product_id = Column(Integer, nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    # NULL only for lines backfilled after their product was gone
+    unit_price = Column(Float)
+    product_name = Column(String)
+
+    def __repr__(self):
+        return f'<OrderItem Id: {self.id}, Order Id: {self.order_id}, Product Id: {self.product_id}, Quantity: {self.quantity}>'
+
+
+class OrderIdempotencyKey(BaseModel):
+    """The response of an order placed under a client's ``Idempotency-Key``.
+
+    Written in the transaction that places the order, so a key exists
+    exactly when its order does; looked up by primary key.
+    """
+    __tablename__ = 'order_idempotency_keys'
+    __table_args__ = (
+        # Serves the purge of expired keys
+        Index('ix_order_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    key = Column(String(255), primary_key=True)
+    # sha256 of the order request, a key cannot be reused for another order
+    request_hash = Column(String(64), nullable=False)
+    response = Column(JSON, nullable=False)
+    # Naive UTC
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<OrderIdempotencyKey Key: {self.key}, Expires At: {self.expires_at}>'
@@ -1,5 +1,29 @@
-from sqlalchemy import Column, Integer, String
-from app.models.base_model import BaseModel
+from sqlalchemy import DDL, BigInteger, CheckConstraint, Column, ForeignKey, Index, Integer, String, case, event, func, or_, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import column_property
+from sqlalchemy.sql.functions import FunctionElement
+from app.models.base_model import Base, BaseModel
+
+class byte_order(FunctionElement):
+    """A text column compared and sorted by code point, whatever the database's collation.
+
+    PostgreSQL orders text by the database locale, in which the names sharing
+    a prefix need not be contiguous; under COLLATE "C" they are, so one index
+    serves both a prefix filter and the ordering. SQLite's default BINARY
+    collation already orders this way.
+    """
+    type = String()
+    name = 'byte_order'
+    inherit_cache = True
+
+@compiles(byte_order)
+def _compile_byte_order(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+@compiles(byte_order, 'postgresql')
+def _compile_byte_order_postgresql(element, compiler, **kw):
+    return f'{compiler.process(element.clauses, **kw)} COLLATE "C"'
+
 
 class Product(BaseModel):
     __tablename__ = 'products'
@@ -9,6 +33,101 @@ class Product(BaseModel):
     description = Column(String)
     price = Column(Integer)
     stock = Column(Integer, default=0)
+    # 0 keeps the stock in `stock`; N > 0 splits it across N ProductStockShard
+    # rows (and `stock` stays 0) so that orders for a hot product do not all
+    # queue on this row
+    stock_shards = Column(Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<Product Id: {self.id}, Name: {self.name}>'
+
+
+class ProductStockShard(BaseModel):
+    __tablename__ = 'product_stock_shards'
+    __table_args__ = (
+        CheckConstraint('stock >= 0', name='ck_product_stock_shards_stock'),
+    )
+
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    stock = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ProductStockShard Product Id: {self.product_id}, Shard: {self.shard}, Stock: {self.stock}>'
+
+
+# The catalog version behind the listing ETag is the sum of these counters.
+# Every transaction that changes a product or its stock adds one to a random
+# slot, so the version moves on with each commit whatever the clock says, and
+# concurrent orders seldom queue on the same row (like the stock shards).
+CATALOG_VERSION_SLOTS = 16
+
+class CatalogVersion(Base):
+    __tablename__ = 'catalog_version'
+
+    slot = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(BigInteger, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
-        return f'<Product Id: {self.id}, Name: {self.name}>'
\ No newline at end of file
+        return f'<CatalogVersion Slot: {self.slot}, Version: {self.version}>'
+
+@event.listens_for(CatalogVersion.__table__, "after_create")
+def _create_catalog_version_slots(target, connection, **kw):
+    connection.execute(target.insert(), [{'slot': slot, 'version': 0} for slot in range(CATALOG_VERSION_SLOTS)])
+
+
+# Stock available to orders, whichever way the product stores it
+Product.total_stock = column_property(
+    case(
+        (Product.stock_shards > 0,
+         select(func.coalesce(func.sum(ProductStockShard.stock), 0))
+         .where(ProductStockShard.product_id == Product.id)
+         .scalar_subquery()),
+        else_=Product.stock,
+    )
+)
+
+
+# Catalog facets. Each sort the listing offers is served by an index that
+# also covers its filters, the partial ones holding only the products that
+# can be in stock: a sharded product keeps its stock in the shards, so it is
+# in them whatever its shards hold.
+IN_STOCK = or_(Product.stock > 0, Product.stock_shards > 0)
+NAME_SORT_KEY = byte_order(Product.name)
+
+Index('ix_products_in_stock_id', Product.id,
+      postgresql_where=IN_STOCK, sqlite_where=IN_STOCK)
+Index('ix_products_price_id', Product.price, Product.id)
+Index('ix_products_in_stock_price_id', Product.price, Product.id,
+      postgresql_where=IN_STOCK, sqlite_where=IN_STOCK)
+Index('ix_products_name_id', NAME_SORT_KEY, Product.id)
+Index('ix_products_in_stock_name_id', NAME_SORT_KEY, Product.id,
+      postgresql_where=IN_STOCK, sqlite_where=IN_STOCK)
+
+
+# Full-text search over name and description. Neither structure is mapped,
+# the ORM never reads or writes them: on PostgreSQL a generated tsvector
+# column with a GIN index (added by migration b0f6a50ccecf on existing
+# databases), on SQLite an external-content FTS5 table kept in sync by
+# triggers.
+SEARCH_DOCUMENT = ("setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+                   "setweight(to_tsvector('english', coalesce(description, '')), 'B')")
+
+for statement in (
+    f"ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_DOCUMENT}) STORED",
+    "CREATE INDEX ix_products_search_vector ON products USING gin (search_vector)",
+):
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+for statement in (
+    "CREATE VIRTUAL TABLE products_fts USING fts5(name, description, content='products', content_rowid='id')",
+    "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER products_fts_update AFTER UPDATE OF name, description ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+):
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Product.__table__, "after_drop", DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"))
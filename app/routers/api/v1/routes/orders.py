@@ -1,20 +1,42 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Response
+from typing import Annotated, Optional
 from app.schemas.order import OrderCreate
-from sqlalchemy.orm import Session
-from app.dependencies import get_order_header
-from app.core.db import get_session
-from app.schemas.order import Order
-from app.services.order_management_service import OrderManagementService
+from app.dependencies import get_order_header, admit_order
+from app.core.db import DBSession, get_session
+from app.core.replicas import get_read_session
+from app.schemas.order import AllOrders, FilterOrderParams, Order
+from app.services.order_management_service import AsyncOrderManagementService
+from app.services.order_batcher import order_batcher
+from app.core.config import settings
 
 router = APIRouter()
 
 router = APIRouter(
     prefix="",
     tags=["orders"],
-    dependencies=[Depends(get_order_header)],
+    dependencies=[Depends(get_order_header), Depends(admit_order)],
     responses={404: {"description": "Not found"}},
 )
 
 @router.post("/", response_model=Order)
-async def create_order(order: OrderCreate, db: Session = Depends(get_session)):
-    return OrderManagementService(db).process_order(order)
\ No newline at end of file
+async def create_order(order: OrderCreate, response: Response, db: DBSession = Depends(get_session),
+                       idempotency_key: Annotated[Optional[str], Header(
+                           min_length=1, max_length=255,
+                           description="Retries with the same key and order get the first response back instead of a new order")] = None):
+    if idempotency_key is not None:
+        # Placed on its own: a batch has no way to replay one of its orders
+        body, replayed = await AsyncOrderManagementService(db).process_idempotent_order(order, idempotency_key)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return body
+    if settings.ORDER_BATCHING:
+        return await order_batcher.submit(order)
+    return await AsyncOrderManagementService(db).process_order(order)
+
+@router.get("/", response_model=AllOrders)
+async def read_orders(filter_query: Annotated[FilterOrderParams, Query()], db: DBSession = Depends(get_read_session)):
+    return await AsyncOrderManagementService(db).get_orders(filter_query)
+
+@router.get("/{order_id}", response_model=Order)
+async def read_order(order_id: int, db: DBSession = Depends(get_read_session)):
+    return await AsyncOrderManagementService(db).get_order(order_id)
@@ -1,22 +1,79 @@
-from fastapi import APIRouter, Query, Depends
-from typing import Annotated
-from sqlalchemy.orm import Session
-from app.schemas.product import Product, ProductCreate, FilterProductParams, AllProducts
-from app.dependencies import get_product_header
-from app.core.db import get_session
-from app.services.product_service import ProductService
+from fastapi import APIRouter, Query, Depends, Request, Response
+from typing import Annotated, Literal
+from fastapi.responses import StreamingResponse
+from app.schemas.product import Product, ProductCreate, FilterProductParams, AllProducts, BulkImportResult, ProductSearchParams, ProductSearchResults
+from app.dependencies import get_product_header, admit_catalog
+from app.core.config import settings
+from app.core.db import DBSession, get_session
+from app.core.replicas import get_read_session
+from app.services.product_service import AsyncProductService
+from app.lib.bulk import iter_rows
+from app.lib.export import MEDIA_TYPES, encode_export
+from app.lib.etag import if_none_match
 
 router = APIRouter(
     prefix="",
     tags=["products"],
-    dependencies=[Depends(get_product_header)],
+    dependencies=[Depends(get_product_header), Depends(admit_catalog)],
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/", response_model=AllProducts)
-async def read_products(filter_query: Annotated[FilterProductParams, Query()], db: Session = Depends(get_session)):
-    return ProductService(db).get_all_products(filter_query)
+@router.get("/", response_model=AllProducts, responses={304: {"description": "Catalog unchanged since the ETag in If-None-Match"}})
+async def read_products(filter_query: Annotated[FilterProductParams, Query()], request: Request, response: Response,
+                        db: DBSession = Depends(get_read_session)):
+    service = AsyncProductService(db)
+    etag = await service.get_catalog_etag()
+    # An unchanged catalog is answered before any page is built or serialized
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    # A cached page comes with the ETag it was read at, which may be older
+    page_etag, page = await service.get_catalog_page(filter_query, etag, as_json=settings.FAST_JSON_RESPONSES)
+    # That older page is the one the client already holds
+    if if_none_match(request.headers.get("if-none-match"), page_etag):
+        return Response(status_code=304, headers={"ETag": page_etag})
+    if settings.FAST_JSON_RESPONSES:
+        # Returning a Response skips response_model; it still documents the body
+        return Response(page, media_type="application/json", headers={"ETag": page_etag})
+    response.headers["ETag"] = page_etag
+    return page
+
+@router.get("/search", response_model=ProductSearchResults)
+async def search_products(search_query: Annotated[ProductSearchParams, Query()], db: DBSession = Depends(get_read_session)):
+    return await AsyncProductService(db).search_products(search_query)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_products(fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                          db: DBSession = Depends(get_read_session)):
+    batches = AsyncProductService(db).export_products()
+    return StreamingResponse(
+        encode_export(batches, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="products.{fmt}"'}
+    )
 
 @router.post("/", response_model=Product)
-async def create_product(product: ProductCreate, db: Session = Depends(get_session)):
-    return ProductService(db).create_product(product)
\ No newline at end of file
+async def create_product(product: ProductCreate, db: DBSession = Depends(get_session)):
+    return await AsyncProductService(db).create_product(product)
+
+@router.post(
+    "/bulk",
+    response_model=BulkImportResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "description": "One product per line as NDJSON, or CSV with a name,description,price,stock header",
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk_import_products(request: Request, db: DBSession = Depends(get_session)):
+    # The body is consumed as a stream, never buffered whole
+    rows = iter_rows(request.stream(), request.headers.get("content-type", ""))
+    return await AsyncProductService(db).import_products(rows)
+
+@router.get("/{product_id}", response_model=Product)
+async def read_product(product_id: int, db: DBSession = Depends(get_read_session)):
+    return await AsyncProductService(db).get_product(product_id)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.pool_metrics import pool_metrics
+from app.core.replicas import replica_set
+from app.lib.metrics import MetricFamily, registry
+from app.services.product_service import product_cache
+
+router = APIRouter()
+
+def collect_product_cache():
+    stats = product_cache.stats()
+    for name in ("hits", "misses", "evictions", "expirations"):
+        yield MetricFamily(f"product_cache_{name}_total", "counter", f"Product cache {name}").add(stats[name])
+    yield MetricFamily("product_cache_entries", "gauge", "Entries in the product cache").add(stats["size"])
+
+def collect_pools():
+    snapshots = {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+    families = [
+        ("db_pool_size", "gauge", "Configured pool size", "pool_size"),
+        ("db_pool_checked_out", "gauge", "Connections currently checked out", "checked_out"),
+        ("db_pool_overflow", "gauge", "Overflow connections currently open", "overflow"),
+        ("db_pool_checkouts_total", "counter", "Connection checkouts", "checkouts"),
+        ("db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection", "timeouts"),
+        ("db_pool_invalidations_total", "counter", "Connections invalidated", "invalidations"),
+    ]
+    for name, kind, help, key in families:
+        family = MetricFamily(name, kind, help)
+        for pool, snapshot in snapshots.items():
+            family.add(snapshot[key], pool=pool)
+        yield family
+
+    wait = MetricFamily("db_pool_checkout_wait_seconds", "summary", "Time spent waiting for a pooled connection")
+    for pool, snapshot in snapshots.items():
+        wait.add(snapshot["wait_seconds_total"], "_sum", pool=pool)
+        wait.add(snapshot["waits"], "_count", pool=pool)
+    yield wait
+
+def collect_replicas():
+    healthy = MetricFamily("db_replica_healthy", "gauge", "1 while a read replica is in rotation")
+    lag = MetricFamily("db_replica_lag_seconds", "gauge", "Replication lag measured by the last health check")
+    for replica in replica_set.replicas:
+        healthy.add(int(replica.healthy), replica=replica.name)
+        if replica.lag is not None:
+            lag.add(replica.lag, replica=replica.name)
+    yield healthy
+    yield lag
+
+registry.add_collector(collect_product_cache)
+registry.add_collector(collect_pools)
+registry.add_collector(collect_replicas)
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
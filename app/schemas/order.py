@@ -1,5 +1,8 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field, model_validator
 from enum import Enum
+from app.schemas.product import MAX_PAGE_SIZE
 
 class OrderItemBase(BaseModel):
     product_id: int = Field(..., description="ID of the product")
@@ -19,6 +22,24 @@ class OrderCreate(BaseModel):
 
 class Order(OrderBase):
     id: int
+    created_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class AllOrders(BaseModel):
+    orders: list[Order]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page, null on the last page")
+
+class FilterOrderParams(BaseModel):
+    status: Optional[OrderStatus] = None
+    created_from: Optional[datetime] = Field(None, description="Only orders created at or after this time")
+    created_to: Optional[datetime] = Field(None, description="Only orders created before this time")
+    limit: int = Field(10, ge=1, le=MAX_PAGE_SIZE)
+    cursor: Optional[str] = Field(None, description="Opaque `next_cursor` from a previous page")
+
+    @model_validator(mode="after")
+    def check_created_range(self):
+        if self.created_from is not None and self.created_to is not None and self.created_from >= self.created_to:
+            raise ValueError("created_from must be before created_to")
+        return self
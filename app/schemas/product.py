@@ -1,4 +1,8 @@
-from pydantic import BaseModel, Field
+from typing import Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+MAX_PAGE_SIZE = 100
+MAX_REPORTED_IMPORT_ERRORS = 1000
 
 class ProductBase(BaseModel):
     name: str
@@ -17,8 +21,61 @@ class Product(ProductBase):
 
 class AllProducts(BaseModel):
     products: list[Product]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page, null on the last page")
+    total: Optional[int] = Field(None, description="Number of matching products, only with `include_total`")
+    total_is_estimate: Optional[bool] = Field(None, description="Whether `total` is the query planner's estimate rather than an exact count")
 
 class FilterProductParams(BaseModel):
     skip: int = Field(0, ge=0)
-    limit: int = Field(10, ge=1)
-    
\ No newline at end of file
+    limit: int = Field(10, ge=1, le=MAX_PAGE_SIZE)
+    cursor: Optional[str] = Field(None, description="Opaque `next_cursor` from a previous page, valid for the same sort")
+    sort: Literal["id", "price", "-price", "name"] = Field("id", description="`-price` is the most expensive first")
+    min_price: Optional[float] = Field(None, ge=0, description="Needs sort=price or sort=-price")
+    max_price: Optional[float] = Field(None, ge=0, description="Needs sort=price or sort=-price")
+    name_prefix: Optional[str] = Field(None, min_length=1, max_length=200, description="Case-sensitive; needs sort=name")
+    in_stock: bool = Field(False, description="Only the products that can be ordered now")
+    include_total: bool = Field(False, description="Also return the number of matching products")
+
+    @model_validator(mode="after")
+    def check_pagination_mode(self):
+        if self.cursor is not None and self.skip:
+            raise ValueError("skip cannot be combined with cursor")
+        return self
+
+    @model_validator(mode="after")
+    def check_indexed_filters(self):
+        # Each sort has an index that serves its own filter (and in_stock)
+        # only; any other combination would scan the catalog
+        if (self.min_price is not None or self.max_price is not None) and self.sort not in ("price", "-price"):
+            raise ValueError("min_price and max_price need sort=price or sort=-price")
+        if self.name_prefix is not None and self.sort != "name":
+            raise ValueError("name_prefix needs sort=name")
+        if self.min_price is not None and self.max_price is not None and self.min_price > self.max_price:
+            raise ValueError("min_price cannot be above max_price")
+        return self
+
+class ProductSearchParams(BaseModel):
+    q: str = Field(..., min_length=1, max_length=200, description="Words to look for in the name and description")
+    limit: int = Field(10, ge=1, le=MAX_PAGE_SIZE)
+
+class ProductSearchResults(BaseModel):
+    products: list[Product] = Field(..., description="Best match first")
+
+class BulkImportRowError(BaseModel):
+    row: int = Field(..., description="1-based row number in the upload, not counting a CSV header")
+    errors: list[str]
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: list[BulkImportRowError] = Field(default_factory=list, description=f"Per-row errors, at most {MAX_REPORTED_IMPORT_ERRORS} are listed")
+
+    def add_error(self, row: int, errors: list[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_IMPORT_ERRORS:
+            self.errors.append(BulkImportRowError(row=row, errors=errors))
+
+    def merge(self, other: "BulkImportResult") -> None:
+        self.inserted += other.inserted
+        self.failed += other.failed
+        self.errors.extend(other.errors[:MAX_REPORTED_IMPORT_ERRORS - len(self.errors)])
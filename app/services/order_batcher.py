@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.db import DBSession, run_with_session
+from app.schemas.order import OrderCreate
+from app.services.order_management_service import OrderManagementService
+
+logger = logging.getLogger(__name__)
+
+class OrderBatcher:
+    """Group-commits concurrent orders of one worker process.
+
+    The first order of a batch opens a window of ``max_wait`` seconds; every
+    order submitted meanwhile joins it, up to ``max_size``. The batch is then
+    placed by ``OrderManagementService.process_orders`` in one transaction
+    with its own session, and each caller gets its own order or error back.
+    An order whose caller went away is still placed, as it would be once its
+    transaction had started without batching.
+    """
+    def __init__(self, session_factory: Callable[[], DBSession], max_size: int, max_wait: float):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[OrderCreate, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def submit(self, order_request: OrderCreate):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((order_request, future))
+        if len(self._pending) >= self.max_size:
+            self.__flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.__flush)
+        return await future
+
+    def __flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Kept referenced until done; batches that overlap in time lock
+            # their products in id order, like single orders do
+            task = asyncio.get_running_loop().create_task(self.__place(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def __place(self, batch: List[Tuple[OrderCreate, asyncio.Future]]) -> None:
+        try:
+            results = await self.__process([order_request for order_request, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        logger.info('Placed a batch of %s orders', len(batch))
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def __process(self, order_requests: List[OrderCreate]):
+        session = self.session_factory()
+        try:
+            return await run_with_session(session, lambda db: OrderManagementService(db).process_orders(order_requests))
+        finally:
+            if isinstance(session, AsyncSession):
+                await session.close()
+            else:
+                await run_in_threadpool(session.close)
+
+
+def default_session_factory() -> DBSession:
+    # Resolved on use so that the engines are only touched once batching is on
+    from app.core.db import AsyncSessionLocal, SessionLocal
+    return AsyncSessionLocal() if settings.DATABASE_MODE == "async" else SessionLocal()
+
+order_batcher = OrderBatcher(default_session_factory,
+                             max_size=settings.ORDER_BATCH_MAX_SIZE,
+                             max_wait=settings.ORDER_BATCH_MAX_WAIT)
@@ -1,148 +1,469 @@
 from sqlalchemy.orm import Session
-from app.models.order import Order, OrderStatus
-from app.models.product import Product
-from app.schemas.order import OrderCreate
-from sqlalchemy import select
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from app.core.db import DBSession, run_with_session
+from app.core.config import settings
+from app.core.log import SAMPLED
+from app.models.order import Order, OrderIdempotencyKey, OrderItem, OrderStatus
+from app.models.product import Product, ProductStockShard
+from app.schemas.order import AllOrders, FilterOrderParams, OrderCreate, Order as OrderSchema
+from sqlalchemy import case, delete, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from app.lib.exceptions import AppException, ErrorCode
+from app.lib.pagination import encode_cursor, decode_cursor
+from app.services.product_service import bump_catalog_version, invalidate_products
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+import hashlib
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+def utcnow() -> datetime:
+    # Naive UTC, the way OrderIdempotencyKey.expires_at is stored
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class OrderManagementService:
     def __init__(self, db: Session):
         self.db = db
 
     def process_order(self, order_request: OrderCreate):
         try:
-            order, products_to_update = self.__create_order(order_request=order_request)
-            order = self.__update_order_status(order)
-            self.__verify_and_update_product_stock(order, products_to_update)
+            # Validating, decrementing stock and recording the order all
+            # happen in one transaction, committed exactly once
+            order = self.__place_order(order_request=order_request)
+            bump_catalog_version(self.db)
+            self.db.commit()
+            # The cached catalog entries of the products whose stock was taken
+            # are dropped once the new stock is visible to other sessions
+            invalidate_products(item['product_id'] for item in order.products)
             return order
-        
+
         except SQLAlchemyError as e:
-            logger.error('Error creating product: %s', {str(e)})
+            logger.error('Error creating order: %s', {str(e)})
+            self.db.rollback()
             raise AppException(
                 error_code=ErrorCode.DATABASE_ERROR,
-                message="An error occurred while creating the product",
+                message="An error occurred while creating the order",
                 details={'error_details': str(e)},
                 original_error=e
           ) from e
+        except AppException as e:
+            logger.error('Error creating order: %s', {str(e)})
+            self.db.rollback()
+            raise e
+
+    def process_idempotent_order(self, order_request: OrderCreate, idempotency_key: str) -> Tuple[Dict, bool]:
+        """Place the order once per ``idempotency_key``.
+
+        Returns the order's response body and whether it is replayed from an
+        earlier request with the same key. The key is inserted before the
+        products are locked, in the transaction that places the order: a
+        concurrent request with the same key blocks on that insert until the
+        first one ends, then replays its response, or places the order itself
+        if the first one was rolled back.
+        """
+        request_hash = hashlib.sha256(order_request.model_dump_json().encode()).hexdigest()
+        try:
+            response = self.__stored_response(idempotency_key, request_hash)
+            if response is not None:
+                return response, True
+
+            claim = OrderIdempotencyKey(key=idempotency_key, request_hash=request_hash, response={},
+                                        expires_at=utcnow() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL))
+            self.db.add(claim)
+            self.db.flush()
+            order = self.__place_order(order_request=order_request)
+            claim.response = OrderSchema.model_validate(order).model_dump(mode='json')
+            bump_catalog_version(self.db)
+            self.db.commit()
+            invalidate_products(item['product_id'] for item in order.products)
+            return claim.response, False
+
         except IntegrityError as e:
-            logger.error('Error creating product: %s', {str(e)})
+            self.db.rollback()
+            response = self.__stored_response(idempotency_key, request_hash)
+            if response is None:
+                logger.error('Error creating order: %s', {str(e)})
+                raise AppException(
+                    error_code=ErrorCode.DATABASE_ERROR,
+                    message="An error occurred while creating the order",
+                    details={'error_details': str(e)},
+                    original_error=e
+                ) from e
+            return response, True
+        except SQLAlchemyError as e:
+            logger.error('Error creating order: %s', {str(e)})
+            self.db.rollback()
             raise AppException(
                 error_code=ErrorCode.DATABASE_ERROR,
-                message="An error occurred while creating the product",
+                message="An error occurred while creating the order",
                 details={'error_details': str(e)},
                 original_error=e
             ) from e
         except AppException as e:
-            logger.error('Error creating product: %s', {str(e)})
+            logger.error('Error creating order: %s', {str(e)})
             self.db.rollback()
             raise e
 
-    def __create_order(self, order_request: OrderCreate):
-        self.__validate_order_request(order_request)
-        total_price = 0
-        products_to_update = []
-        # Starting a transaction to ensure that all operations are atomic
-        with self.db.begin_nested():
-            # Making sure all products in the request are available
-            for item in order_request.products:
-                # Locking the product row to prevent
-                # concurrent updates and getting the wrong stock value
-                product = self.__lock_product(item.product_id)
-                self.__check_stock_integrity(product, item.quantity)
-
-                # product.stock -= item.quantity
-                total_price += product.price * item.quantity
-                products_to_update.append((product, item.quantity))
-
-            
-            
-            # Creating the order
-            order = self.__create_new_order(products= order_request.products,
-                                            total_price=total_price,
-                                            status= OrderStatus.PENDING)
-            
-            # Flush to ensure the order gets an ID
-            self.db.flush()
-          
-            # Refresh to get the latest state including the ID
-            self.db.refresh(order)
+    def purge_idempotency_keys(self, batch_size: int = 1000) -> int:
+        """Delete the expired idempotency keys, ``batch_size`` per transaction."""
+        purged = 0
+        try:
+            while True:
+                expired = (select(OrderIdempotencyKey.key)
+                           .where(OrderIdempotencyKey.expires_at <= utcnow())
+                           .limit(batch_size))
+                deleted = self.db.execute(delete(OrderIdempotencyKey)
+                                          .where(OrderIdempotencyKey.key.in_(expired))).rowcount
+                self.db.commit()
+                purged += deleted
+                if deleted < batch_size:
+                    return purged
+        except SQLAlchemyError as e:
+            logger.error('Error purging idempotency keys: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while purging the idempotency keys",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
+
+    def __stored_response(self, idempotency_key: str, request_hash: str) -> Optional[Dict]:
+        # One primary key probe. An expired key is deleted here, in the
+        # transaction that is about to insert it again
+        try:
+            stored = self.db.execute(select(OrderIdempotencyKey.request_hash,
+                                            OrderIdempotencyKey.response,
+                                            OrderIdempotencyKey.expires_at)
+                                     .where(OrderIdempotencyKey.key == idempotency_key)).first()
+            if stored is not None and stored.expires_at <= utcnow():
+                self.db.execute(delete(OrderIdempotencyKey).where(OrderIdempotencyKey.key == idempotency_key))
+                stored = None
+        except SQLAlchemyError as e:
+            logger.error('Error fetching idempotency key: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while creating the order",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
 
-        return order, products_to_update
+        if stored is None:
+            return None
+        if stored.request_hash != request_hash:
+            raise AppException(
+                error_code=ErrorCode.IDEMPOTENCY_KEY_REUSED,
+                message="The Idempotency-Key was already used for a different order",
+                details={'idempotency_key': idempotency_key}
+            )
+        return stored.response
 
-            # Some payment or other functionalities here which updates the order status
-        
-    def __update_order_status(self, order) -> Order:
-        order.status = OrderStatus.COMPLETED
-        self.db.add(order)
-        self.db.commit()
+    def process_orders(self, order_requests: List[OrderCreate]) -> List[Union[Order, AppException]]:
+        """Place a batch of orders in one transaction and one commit.
+
+        The products of every order are locked together, then the orders are
+        accepted or rejected one by one in the given sequence against the
+        stock the earlier ones left. Each entry of the result is the placed
+        order or the AppException that rejected it. A database error, or a
+        sharded product's stock taken by another transaction between the
+        check and the update, fails the whole batch.
+        """
+        try:
+            results = self.__place_orders(order_requests)
+            if any(isinstance(order, Order) for order in results):
+                bump_catalog_version(self.db)
+            self.db.commit()
+            invalidate_products({item['product_id']
+                                 for order in results if isinstance(order, Order)
+                                 for item in order.products})
+            return results
+
+        except SQLAlchemyError as e:
+            logger.error('Error creating orders: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while creating the order",
+                details={'error_details': str(e)},
+                original_error=e
+          ) from e
+        except AppException as e:
+            logger.error('Error creating orders: %s', {str(e)})
+            self.db.rollback()
+            raise e
+
+    def get_order(self, order_id: int) -> Order:
+        try:
+            order = self.db.get(Order, order_id)
+        except SQLAlchemyError as e:
+            logger.error('Error fetching order: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while fetching the order",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
+
+        if order is None:
+            raise AppException(
+                error_code=ErrorCode.ORDER_NOT_FOUND,
+                message="Order not found",
+                details={'order_id': order_id}
+            )
         return order
-    
-    def __verify_and_update_product_stock(self, order, products_to_update) -> None:
-        with self.db.begin():
 
-            if order.status == OrderStatus.COMPLETED:
+    def get_orders(self, filter_query: FilterOrderParams) -> AllOrders:
+        # Newest first. Every filter is a prefix or range of the
+        # (status, created_at, id) / (created_at, id) indexes, and the keyset
+        # condition continues the same index scan, so no page sorts or skips rows
+        statement = (select(Order)
+                     .order_by(Order.created_at.desc(), Order.id.desc())
+                     .limit(filter_query.limit + 1))
+        if filter_query.status is not None:
+            statement = statement.where(Order.status == OrderStatus(filter_query.status.value))
+        if filter_query.created_from is not None:
+            statement = statement.where(Order.created_at >= filter_query.created_from)
+        if filter_query.created_to is not None:
+            statement = statement.where(Order.created_at < filter_query.created_to)
+        if filter_query.cursor is not None:
+            created_at, order_id = self.__decode_order_cursor(filter_query.cursor)
+            statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
 
-              self.__update_stock(products_to_update)
+        try:
+            orders = self.db.scalars(statement).all()
+        except SQLAlchemyError as e:
+            logger.error('Error fetching orders: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while fetching the orders",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
 
-              # Flush to ensure the order gets an ID
-              self.db.flush()
-          
-              # Refresh to get the latest state including the ID
-              self.db.refresh(order)
-            else:
-                raise AppException(
-                    error_code=ErrorCode.CANNOT_UPDATE_STOCK,
-                    message="Stock cannot be updated if it's not in completed state",
-                    details={'order_id': order.id}
-                )
+        next_cursor = None
+        if len(orders) > filter_query.limit:
+            orders = orders[:filter_query.limit]
+            next_cursor = encode_cursor({'created_at': orders[-1].created_at.isoformat(), 'id': orders[-1].id})
+        return AllOrders(orders=orders, next_cursor=next_cursor)
 
-        self.db.commit()
+    def __decode_order_cursor(self, cursor: str):
+        position = decode_cursor(cursor, 'created_at', 'id')
+        try:
+            return datetime.fromisoformat(position['created_at']), int(position['id'])
+        except (TypeError, ValueError) as e:
+            raise AppException(
+                error_code=ErrorCode.VALIDATION_ERROR,
+                message="Invalid pagination cursor",
+                details={'cursor': cursor},
+                original_error=e
+            ) from e
+
+    def __place_orders(self, order_requests: List[OrderCreate]) -> List[Union[Order, AppException]]:
+        baskets: List[Union[Dict[int, int], AppException]] = []
+        for order_request in order_requests:
+            try:
+                self.__validate_order_request(order_request)
+                baskets.append(self.__merge_line_items(order_request.products))
+            except AppException as e:
+                baskets.append(e)
 
-        return order    
+        product_ids = sorted({product_id for basket in baskets if isinstance(basket, dict) for product_id in basket})
+        products = self.__lock_products(product_ids) if product_ids else {}
+        available = {product_id: product.total_stock for product_id, product in products.items()}
 
+        results: List[Union[Dict, AppException]] = []
+        taken: Dict[int, int] = {}
+        for basket in baskets:
+            if isinstance(basket, AppException):
+                results.append(basket)
+                continue
+            try:
+                self.__check_stock_integrity(products, basket, available)
+            except AppException as e:
+                results.append(e)
+                continue
+            for product_id, quantity in basket.items():
+                available[product_id] -= quantity
+                taken[product_id] = taken.get(product_id, 0) + quantity
+            results.append({'products': [{'product_id': product_id, 'quantity': quantity}
+                                         for product_id, quantity in basket.items()],
+                            'total_price': sum(products[product_id].price * quantity
+                                               for product_id, quantity in basket.items()),
+                            'status': OrderStatus.COMPLETED})
 
-    def __lock_product(self, product_id) -> Product:
-        # Lock the row for update
-        query = select(Product).where(Product.id == product_id).with_for_update()
-        result = self.db.execute(query).scalars().first()
+        accepted = [result for result in results if isinstance(result, dict)]
+        if not accepted:
+            return results
+        self.__update_stock(products, dict(sorted(taken.items())))
+        placed = self.__create_new_orders(accepted)
+        self.__create_order_items(placed, products)
+        orders = iter(placed)
+        return [result if isinstance(result, AppException) else next(orders) for result in results]
 
-        if not result:
+    def __place_order(self, order_request: OrderCreate) -> Order:
+        self.__validate_order_request(order_request)
+        quantities = self.__merge_line_items(order_request.products)
+
+        # Locking every product of the basket in one statement, always in
+        # id order so that overlapping baskets cannot deadlock each other
+        products = self.__lock_products(quantities.keys())
+        self.__check_stock_integrity(products, quantities, {product_id: product.total_stock for product_id, product in products.items()})
+
+        total_price = 0
+        for product_id, quantity in quantities.items():
+            total_price += products[product_id].price * quantity
+
+        # Some payment or other functionalities would go here, before the
+        # stock is taken and the order is recorded as completed
+        self.__update_stock(products, quantities)
+        order = self.__create_new_order(products= [{'product_id': product_id, 'quantity': quantity}
+                                                   for product_id, quantity in quantities.items()],
+                                        total_price=total_price,
+                                        status= OrderStatus.COMPLETED)
+        self.__create_order_items([order], products)
+        return order
+
+    def __merge_line_items(self, items) -> Dict[int, int]:
+        # Duplicate lines for the same product are ordered as one, keyed in
+        # ascending id order (the order the rows get locked in)
+        quantities: Dict[int, int] = {}
+        for item in sorted(items, key=lambda item: item.product_id):
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        return quantities
+
+    def __lock_products(self, product_ids) -> Dict[int, Product]:
+        # Lock all the rows for update in a single round trip. A sharded
+        # product's row is only share-locked (its stock lives in the shards),
+        # which keeps it stable against resharding without queueing orders
+        product_ids = list(product_ids)
+        query = (select(Product)
+                 .where(Product.id.in_(product_ids), Product.stock_shards == 0)
+                 .order_by(Product.id)
+                 .with_for_update())
+        products = {product.id: product for product in self.db.execute(query).scalars()}
+        if len(products) < len(product_ids):
+            query = (select(Product)
+                     .where(Product.id.in_(product_ids), Product.stock_shards > 0)
+                     .order_by(Product.id)
+                     .with_for_update(read=True))
+            products.update((product.id, product) for product in self.db.execute(query).scalars())
+        return products
+
+    def __check_stock_integrity(self, products: Dict[int, Product], quantities: Dict[int, int], available: Dict[int, int]) -> None:
+        # Collect every problem with the basket so the client can fix it in one go
+        missing = [product_id for product_id in quantities if product_id not in products]
+        insufficient = [
+            {'product_id': product_id,
+             'product_name': products[product_id].name,
+             'available_stock': available[product_id],
+             'requested_stock': quantity}
+            for product_id, quantity in quantities.items()
+            if product_id in products and available[product_id] < quantity
+        ]
+
+        if missing:
             raise AppException(
                 error_code=ErrorCode.PRODUCT_NOT_FOUND,
                 message="Product not found",
-                details={'product_id': product_id}
+                details={'missing_product_ids': missing,
+                         'insufficient_stock': insufficient}
             )
-        
-        return result
+        if insufficient:
+            raise AppException(
+                error_code=ErrorCode.INSUFFICIENT_INVENTORY,
+                message="Insufficient stock for order",
+                details={'insufficient_stock': insufficient}
+            )
+
+    def __create_new_order(self, products, total_price, status) -> Order:
+        # INSERT ... RETURNING hands back the id and defaults, no refresh needed
+        # products are the merged line items, already plain JSON-ready dicts
+        statement = insert(Order).values(products= products,
+                                         total_price= total_price,
+                                         status= status).returning(Order)
+        return self.db.scalars(statement).one()
+
+    def __create_new_orders(self, orders: List[Dict]) -> List[Order]:
+        # One multi-row INSERT ... RETURNING, rows come back in parameter order
+        statement = insert(Order).returning(Order, sort_by_parameter_order=True)
+        return list(self.db.scalars(statement, orders))
+
+    def __create_order_items(self, orders: List[Order], products: Dict[int, Product]) -> None:
+        # One executemany INSERT for every line of every order, with the name
+        # and unit price the product had when it was bought
+        self.db.execute(insert(OrderItem), [
+            {'order_id': order.id,
+             'product_id': item['product_id'],
+             'quantity': item['quantity'],
+             'unit_price': products[item['product_id']].price,
+             'product_name': products[item['product_id']].name}
+            for order in orders
+            for item in order.products
+        ])
 
-    def __check_stock_integrity(self, product, quantity) -> None:
-        if product.stock < quantity:
+    def __update_stock(self, products: Dict[int, Product], quantities: Dict[int, int]) -> None:
+        unsharded = {product_id: quantity for product_id, quantity in quantities.items()
+                     if not products[product_id].stock_shards}
+        if unsharded:
+            # One UPDATE for the whole basket; RETURNING also syncs the locked
+            # Product objects already in the session
+            statement = (update(Product)
+                         .where(Product.id.in_(list(unsharded)))
+                         .values(stock=Product.stock - case(unsharded, value=Product.id))
+                         .returning(Product.id, Product.stock)
+                         .execution_options(synchronize_session="fetch"))
+            for product_id, stock in self.db.execute(statement):
+                logger.info('Updated stock for product %s, %s left', product_id, stock,
+                            extra={**SAMPLED, 'product_id': product_id, 'stock': stock})
+
+        # Shards are taken in product id order, like the product rows
+        for product_id, quantity in quantities.items():
+            if product_id not in unsharded:
+                self.__take_from_shards(products[product_id], quantity)
+
+    def __take_from_shards(self, product: Product, quantity: int) -> None:
+        # A random shard that can cover the whole quantity and that no other
+        # order holds right now; concurrent orders thus land on different rows
+        shard = self.db.scalars(select(ProductStockShard)
+                                .where(ProductStockShard.product_id == product.id,
+                                       ProductStockShard.stock >= quantity)
+                                .order_by(func.random())
+                                .limit(1)
+                                .with_for_update(skip_locked=True)).first()
+        if shard is not None:
+            shard.stock -= quantity
+            self.db.flush()
+            logger.info('Took %s from shard %s of product %s, %s left', quantity, shard.shard, product.id, shard.stock,
+                        extra={**SAMPLED, 'product_id': product.id, 'shard': shard.shard, 'stock': shard.stock})
+            return
+
+        # Otherwise wait for all the shards and drain them in shard order
+        shards = self.db.scalars(select(ProductStockShard)
+                                 .where(ProductStockShard.product_id == product.id)
+                                 .order_by(ProductStockShard.shard)
+                                 .with_for_update()).all()
+        available = sum(shard.stock for shard in shards)
+        if available < quantity:
+            # Other orders took the stock since it was checked
             raise AppException(
                 error_code=ErrorCode.INSUFFICIENT_INVENTORY,
                 message="Insufficient stock for order",
-                details={'product id:': product.id,
-                         'Product Name': product.name,
-                         'Available Stock': product.stock,
-                         'Requested Stock': quantity}
+                details={'insufficient_stock': [{'product_id': product.id,
+                                                 'product_name': product.name,
+                                                 'available_stock': available,
+                                                 'requested_stock': quantity}]}
             )
-    def __create_new_order(self, products, total_price, status):
-        new_order = Order(products= [item.dict() for item in products],
-                          total_price= total_price,
-                          status= status)
-        self.db.add(new_order)
-        return new_order
-    
-    def __update_stock(self, products) -> None:
-        for product, quanity in products:
-            product.stock -= quanity
-            logger.info('Updating stock for product: %s', {product.id})
-            self.db.add(product)
+        remaining = quantity
+        for shard in shards:
+            taken = min(shard.stock, remaining)
+            shard.stock -= taken
+            remaining -= taken
+        self.db.flush()
+        logger.info('Took %s from the shards of product %s, %s left', quantity, product.id, available - quantity,
+                    extra={**SAMPLED, 'product_id': product.id, 'stock': available - quantity})
 
     def __validate_order_request(self, order_request: OrderCreate) -> None:
         if not order_request.products or len(order_request.products) == 0:
@@ -161,3 +482,19 @@ class OrderManagementService:
                 )
 
 
+class AsyncOrderManagementService:
+    """Awaitable front for OrderManagementService, used by the async routes."""
+    def __init__(self, db: DBSession):
+        self.db = db
+
+    async def process_order(self, order_request: OrderCreate):
+        return await run_with_session(self.db, lambda session: OrderManagementService(session).process_order(order_request))
+
+    async def process_idempotent_order(self, order_request: OrderCreate, idempotency_key: str) -> Tuple[Dict, bool]:
+        return await run_with_session(self.db, lambda session: OrderManagementService(session).process_idempotent_order(order_request, idempotency_key))
+
+    async def get_order(self, order_id: int):
+        return await run_with_session(self.db, lambda session: OrderManagementService(session).get_order(order_id))
+
+    async def get_orders(self, filter_query: FilterOrderParams) -> AllOrders:
+        return await run_with_session(self.db, lambda session: OrderManagementService(session).get_orders(filter_query))
@@ -1,15 +1,89 @@
 from sqlalchemy.orm import Session
-from app.models.product import Product
-from app.schemas.product import ProductCreate, AllProducts
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool
+from app.core.db import DBSession, run_with_session
+from app.core.replicas import READS_OWN_WRITES, ReplicaSession
+from app.models.product import CATALOG_VERSION_SLOTS, IN_STOCK, NAME_SORT_KEY, CatalogVersion, Product
+from app.schemas.product import ProductCreate, AllProducts, BulkImportResult, ProductSearchParams, ProductSearchResults, Product as ProductSchema
+from app.core.config import settings
+from sqlalchemy import column, func, insert, literal_column, select, table, text, tuple_, update
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import SQLAlchemyError
 from app.lib.exceptions import AppException, ErrorCode
+from app.lib.pagination import encode_cursor, decode_cursor
+from app.lib.cache import TTLLRUCache, MISSING
+from app.lib.etag import weak_etag
+from pydantic import ValidationError
+from pydantic_core import to_json
+import json
+from typing import Optional, Tuple, Union
 import logging
+import math
+import random
+import re
+
+EXPORT_BATCH_SIZE = 1000
+
+# Above this many matching products by the planner's estimate, the total of
+# a listing is that estimate: an exact count would visit every one of them
+EXACT_COUNT_LIMIT = 10000
+
+# Columns of the Product schema, read without building ORM objects; stock is
+# the total over the stock shards for a sharded product
+PAGE_COLUMNS = (Product.id, Product.name, Product.description, Product.price, Product.total_stock.label('stock'))
+
+# Listing sort -> (ordering key, the key's field in the cursor, descending);
+# id breaks ties. app/models/product.py has an index for each
+SORT_KEYS = {
+    'id': (Product.id, None, False),
+    'price': (Product.price, 'price', False),
+    '-price': (Product.price, 'price', True),
+    'name': (NAME_SORT_KEY, 'name', False),
+}
+
+# Type of each field a catalog cursor can carry
+CURSOR_FIELD_TYPES = {'id': int, 'price': int, 'name': str}
+
+# SQLite's full-text index of the products (see app/models/product.py)
+PRODUCTS_FTS = table('products_fts', column('rowid'), column('products_fts'))
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Catalog pages and single products are served from this per-process cache.
+# Entries are tagged with the ids of the products they contain so that a
+# stock change only drops what it affects; PAGES_TAG covers every page, which
+# is what a new product invalidates. Each worker has its own cache, the TTL
+# bounds how stale another worker's copy can get.
+product_cache = TTLLRUCache(maxsize=settings.PRODUCT_CACHE_SIZE, ttl=settings.PRODUCT_CACHE_TTL)
+PAGES_TAG = 'pages'
+
+def product_tag(product_id: int):
+    return ('product', product_id)
+
+def invalidate_products(product_ids) -> None:
+    product_cache.invalidate_tags([product_tag(product_id) for product_id in product_ids])
+
+def bump_catalog_version(db: Session) -> None:
+    """Move the catalog version on in ``db``'s transaction, just before its commit.
+
+    The slot row stays locked until the commit; taken last, it is held
+    briefly and never while waiting on a product lock.
+    """
+    db.execute(update(CatalogVersion)
+               .where(CatalogVersion.slot == random.randrange(CATALOG_VERSION_SLOTS))
+               .values(version=CatalogVersion.version + 1))
+
+def prefix_upper_bound(prefix: str):
+    """The least string above every string starting with ``prefix``, in code point order."""
+    stripped = prefix.rstrip(chr(0x10FFFF))
+    if not stripped:
+        return None
+    successor = ord(stripped[-1]) + 1
+    if 0xD800 <= successor <= 0xDFFF:
+        # Surrogates are not valid text
+        successor = 0xE000
+    return stripped[:-1] + chr(successor)
+
 class ProductService:
     def __init__(self, db: Session):
         self.db = db
@@ -19,8 +93,11 @@ class ProductService:
             self.__validate_create_params(product)
             db_product = Product(**product.model_dump())
             self.db.add(db_product)
+            self.db.flush()
+            bump_catalog_version(self.db)
             self.db.commit()
             self.db.refresh(db_product)
+            product_cache.invalidate_tags([PAGES_TAG])
             return db_product
         except SQLAlchemyError as e:
             logger.error('Error creating product: %s', {str(e)})
@@ -50,24 +127,377 @@ class ProductService:
                 original_error=e
             ) from e
     
-    def get_all_products(self, filter_query):
+    def get_all_products(self, filter_query) -> AllProducts:
+        return self.get_catalog_page(filter_query)[1]
+
+    def get_all_products_json(self, filter_query) -> bytes:
+        return self.get_catalog_page(filter_query, as_json=True)[1]
+
+    def get_catalog_page(self, filter_query, etag: Optional[str] = None,
+                         as_json: bool = False) -> Tuple[str, Union[AllProducts, bytes]]:
+        """A catalog page and the ETag of the catalog version it was read at.
+
+        Both are cached as one entry, so a cached page is never sent with the
+        ETag of a newer catalog. A page loaded on a miss takes ``etag``, when
+        the caller has just read it, or the current one; it is read before
+        the page, so it can only be older than the page, never newer.
+        """
+        cache_key = ('page_json' if as_json else 'page',) + tuple(filter_query.model_dump().items())
+        cached = product_cache.get(cache_key) if self.__reads_cache() else MISSING
+        if cached is not MISSING:
+            return cached
+
+        if etag is None:
+            etag = self.get_catalog_etag()
+        page = self.__load_page(filter_query)
+        # Serialized once per cache entry; a hit costs no Pydantic work at all
+        entry = (etag, to_json(page) if as_json else page)
+        product_cache.set(cache_key, entry, tags=[PAGES_TAG, *(product_tag(product.id) for product in page.products)],
+                          ttl=self.__cache_ttl())
+        return entry
+
+    def __reads_cache(self) -> bool:
+        # A request reading its own writes gets them from the primary, not a
+        # copy cached before them; what it reads is cached as usual
+        return not self.db.info.get(READS_OWN_WRITES)
+
+    def __cache_ttl(self) -> Optional[float]:
+        # A replica may still serve rows from before a write whose entries
+        # this worker has just dropped; they are kept no longer than the
+        # replica itself may lag, rather than for the whole cache TTL
+        return settings.READ_REPLICA_MAX_LAG if isinstance(self.db, ReplicaSession) else None
+
+    def __load_page(self, filter_query) -> AllProducts:
+        key, field, descending = SORT_KEYS[filter_query.sort]
+        keys = (Product.id,) if field is None else (key, Product.id)
+        fields = ('id',) if field is None else (field, 'id')
+        conditions = self.__filter_conditions(filter_query)
         try:
-            statement = select(Product).offset(filter_query.skip).limit(filter_query.limit)
-            products = self.db.scalars(statement).all()
-            return AllProducts(products=products)
+            # Plain column rows are validated straight into the schema, no
+            # ORM objects are built. One extra row tells us whether there is
+            # a next page
+            statement = (select(*PAGE_COLUMNS)
+                         .where(*conditions)
+                         .order_by(*(key.desc() if descending else key for key in keys))
+                         .limit(filter_query.limit + 1))
+            if filter_query.cursor is not None:
+                position = self.__decode_page_cursor(filter_query.cursor, fields)
+                after, start = tuple_(*keys), tuple_(*position)
+                statement = statement.where(after < start if descending else after > start)
+            else:
+                statement = statement.offset(filter_query.skip)
+
+            rows = self.db.execute(statement).mappings().all()
+            total, total_is_estimate = self.__count_matching(conditions) if filter_query.include_total else (None, None)
         except SQLAlchemyError as e:
-            logger.error('Error creating product: %s', {str(e)})
+            logger.error('Error fetching products: %s', {str(e)})
             self.db.rollback()
             raise AppException(
                 error_code=ErrorCode.DATABASE_ERROR,
-                message="An error occurred while creating the product",
+                message="An error occurred while fetching the products",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
+
+        next_cursor = None
+        if len(rows) > filter_query.limit:
+            rows = rows[:filter_query.limit]
+            next_cursor = encode_cursor({field: rows[-1][field] for field in fields})
+        return AllProducts(products=rows, next_cursor=next_cursor, total=total, total_is_estimate=total_is_estimate)
+
+    @staticmethod
+    def __decode_page_cursor(cursor: str, fields) -> tuple:
+        # The token comes from the client: anything but the types the query
+        # binds is rejected here rather than failing (or matching nothing) in SQL
+        position = decode_cursor(cursor, *fields)
+        values = []
+        for field in fields:
+            value, expected = position[field], CURSOR_FIELD_TYPES[field]
+            if expected is int and (isinstance(value, bool) or not isinstance(value, int)):
+                value = None
+            elif expected is str and not isinstance(value, str):
+                value = None
+            if value is None:
+                raise AppException(
+                    error_code=ErrorCode.VALIDATION_ERROR,
+                    message="Invalid pagination cursor",
+                    details={'cursor': cursor}
+                )
+            values.append(value)
+        return tuple(values)
+
+    @staticmethod
+    def __filter_conditions(filter_query) -> list:
+        conditions = []
+        # products.price is an integer column: whole bounds keep the
+        # comparison on the column's type, and so on its index
+        if filter_query.min_price is not None:
+            conditions.append(Product.price >= math.ceil(filter_query.min_price))
+        if filter_query.max_price is not None:
+            conditions.append(Product.price <= math.floor(filter_query.max_price))
+        if filter_query.name_prefix is not None:
+            # A range on the sort key, which its index serves, unlike LIKE
+            conditions.append(NAME_SORT_KEY >= filter_query.name_prefix)
+            upper_bound = prefix_upper_bound(filter_query.name_prefix)
+            if upper_bound is not None:
+                conditions.append(NAME_SORT_KEY < upper_bound)
+        if filter_query.in_stock:
+            # IN_STOCK selects the partial indexes; the total only has to be
+            # summed for the sharded products among their rows
+            conditions.extend([IN_STOCK, Product.total_stock > 0])
+        return conditions
+
+    def __count_matching(self, conditions):
+        """The number of products meeting ``conditions`` and whether it is an estimate."""
+        statement = select(Product.id).where(*conditions)
+        if self.db.get_bind().dialect.name == 'postgresql':
+            estimate = self.__estimate_rows(statement)
+            if estimate > EXACT_COUNT_LIMIT:
+                return estimate, True
+        return self.db.scalar(select(func.count()).select_from(statement.subquery())), False
+
+    def __estimate_rows(self, statement) -> int:
+        # Compiled with named parameters so that the EXPLAIN is bound like
+        # any other statement, whichever driver runs it
+        compiled = statement.compile(dialect=postgresql.dialect(paramstyle='named'))
+        plan = self.db.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}').bindparams(**compiled.params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def search_products(self, search_query: ProductSearchParams) -> ProductSearchResults:
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'postgresql':
+            statement = self.__postgres_search(search_query.q, search_query.limit)
+        elif dialect == 'sqlite':
+            statement = self.__sqlite_search(search_query.q, search_query.limit)
+        else:
+            raise AppException(
+                error_code=ErrorCode.NOT_IMPLEMENTED,
+                message="Product search is not available on this database",
+                details={'dialect': dialect}
+            )
+        if statement is None:
+            return ProductSearchResults(products=[])
+
+        try:
+            rows = self.db.execute(statement).mappings().all()
+        except SQLAlchemyError as e:
+            logger.error('Error searching products: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while searching the products",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
+        return ProductSearchResults(products=rows)
+
+    def __postgres_search(self, q: str, limit: int):
+        # websearch_to_tsquery accepts any user input; the GIN index on the
+        # generated search_vector finds the matches, name hits weigh most
+        search_vector = literal_column('products.search_vector')
+        query = func.websearch_to_tsquery('english', q)
+        return (select(*PAGE_COLUMNS)
+                .where(search_vector.op('@@')(query))
+                .order_by(func.ts_rank_cd(search_vector, query).desc(), Product.id)
+                .limit(limit))
+
+    def __sqlite_search(self, q: str, limit: int):
+        # Every word quoted, so nothing in the input is FTS5 query syntax
+        words = re.findall(r'\w+', q)
+        if not words:
+            return None
+        match = ' '.join(f'"{word}"' for word in words)
+        # bm25 is lower for better matches; a name hit counts ten times.
+        # Ranked inside the FTS table alone, only the top rows are joined
+        rank = func.bm25(literal_column('products_fts'), 10.0, 1.0).label('rank')
+        best = (select(PRODUCTS_FTS.c.rowid, rank)
+                .where(PRODUCTS_FTS.c.products_fts.op('MATCH')(match))
+                .order_by(rank, PRODUCTS_FTS.c.rowid)
+                .limit(limit)
+                .subquery())
+        return (select(*PAGE_COLUMNS)
+                .join_from(Product, best, best.c.rowid == Product.id)
+                .order_by(best.c.rank, Product.id))
+
+    def get_catalog_etag(self) -> str:
+        # Sixteen primary key rows, however large the catalog
+        try:
+            version = self.db.scalar(select(func.coalesce(func.sum(CatalogVersion.version), 0)))
+        except SQLAlchemyError as e:
+            logger.error('Error computing catalog version: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while fetching the products",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
+        return weak_etag(version)
+
+    def get_product(self, product_id: int):
+        cache_key = product_tag(product_id)
+        product = product_cache.get(cache_key) if self.__reads_cache() else MISSING
+        if product is not MISSING:
+            return product
+
+        try:
+            db_product = self.db.execute(select(*PAGE_COLUMNS).where(Product.id == product_id)).mappings().first()
+        except SQLAlchemyError as e:
+            logger.error('Error fetching product: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while fetching the product",
                 details={'error_details': str(e)},
                 original_error=e
             ) from e
-        
+
+        if db_product is None:
+            raise AppException(
+                error_code=ErrorCode.PRODUCT_NOT_FOUND,
+                message="Product not found",
+                details={'product_id': product_id}
+            )
+        product = ProductSchema.model_validate(db_product)
+        product_cache.set(cache_key, product, tags=[product_tag(product_id)], ttl=self.__cache_ttl())
+        return product
+
+    @staticmethod
+    def export_query(batch_size: int):
+        # yield_per streams the result through a server-side cursor, so only
+        # one batch of rows is ever held in memory
+        return (select(*PAGE_COLUMNS)
+                .order_by(Product.id)
+                .execution_options(yield_per=batch_size))
+
+    def iter_product_batches(self, batch_size: int = EXPORT_BATCH_SIZE):
+        result = self.db.execute(self.export_query(batch_size))
+        for batch in result.mappings().partitions():
+            yield batch
+
+    def import_products(self, rows) -> BulkImportResult:
+        """Validate and insert one chunk of ``(row_number, raw_row)`` pairs.
+
+        Invalid rows are reported and skipped; the valid ones are written
+        together and committed once for the whole chunk.
+        """
+        result = BulkImportResult()
+        products = []
+        for row_number, raw in rows:
+            if isinstance(raw, str):
+                result.add_error(row_number, [raw])
+                continue
+            try:
+                product = ProductCreate(**raw)
+                self.__validate_create_params(product)
+            except ValidationError as e:
+                result.add_error(row_number, [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()])
+                continue
+            except ValueError as e:
+                result.add_error(row_number, [str(e)])
+                continue
+            products.append((row_number, product))
+
+        if not products:
+            return result
+
+        try:
+            self.__write_products([product.model_dump() for _, product in products])
+            bump_catalog_version(self.db)
+            self.db.commit()
+            product_cache.invalidate_tags([PAGES_TAG])
+            result.inserted = len(products)
+        except SQLAlchemyError as e:
+            logger.error('Error importing products: %s', {str(e)})
+            self.db.rollback()
+            for row_number, _ in products:
+                result.add_error(row_number, ["A database error occurred while importing this row's chunk"])
+        return result
+
+    def __write_products(self, values) -> None:
+        if self.db.get_bind().dialect.driver == "psycopg":
+            self.__copy_products(values)
+        else:
+            # executemany, batched by the driver
+            self.db.execute(insert(Product), values)
+
+    def __copy_products(self, values) -> None:
+        # COPY bypasses the column defaults, so take the timestamps from the
+        # database clock the same way func.now() would
+        now = self.db.scalar(select(func.now()))
+        connection = self.db.connection().connection.driver_connection
+        with connection.cursor() as cursor:
+            with cursor.copy("COPY products (name, description, price, stock, created_at, updated_at) FROM STDIN") as copy:
+                for value in values:
+                    # products.price is an integer column; round() matches the
+                    # half-to-even rounding PostgreSQL applies on INSERT
+                    copy.write_row((value['name'], value['description'], round(value['price']),
+                                    value['stock'], now, now))
+
     def __validate_create_params(self, params):
         if params.price < 0:
             raise ValueError("Price cannot be negative")
         if params.stock < 0:
             raise ValueError("Stock cannot be negative")
-        return True
\ No newline at end of file
+        return True
+
+
+class AsyncProductService:
+    """Awaitable front for ProductService, used by the async routes.
+
+    The product logic lives in ProductService only; each call runs it through
+    run_with_session so that neither database mode blocks the event loop.
+    """
+    def __init__(self, db: DBSession):
+        self.db = db
+
+    async def create_product(self, product: ProductCreate):
+        return await run_with_session(self.db, lambda session: ProductService(session).create_product(product))
+
+    async def get_all_products(self, filter_query):
+        return await run_with_session(self.db, lambda session: ProductService(session).get_all_products(filter_query))
+
+    async def get_all_products_json(self, filter_query) -> bytes:
+        return await run_with_session(self.db, lambda session: ProductService(session).get_all_products_json(filter_query))
+
+    async def get_catalog_page(self, filter_query, etag: Optional[str] = None,
+                               as_json: bool = False) -> Tuple[str, Union[AllProducts, bytes]]:
+        return await run_with_session(self.db, lambda session: ProductService(session).get_catalog_page(filter_query, etag, as_json))
+
+    async def search_products(self, search_query: ProductSearchParams) -> ProductSearchResults:
+        return await run_with_session(self.db, lambda session: ProductService(session).search_products(search_query))
+
+    async def get_catalog_etag(self) -> str:
+        return await run_with_session(self.db, lambda session: ProductService(session).get_catalog_etag())
+
+    async def get_product(self, product_id: int):
+        return await run_with_session(self.db, lambda session: ProductService(session).get_product(product_id))
+
+    async def export_products(self, batch_size: int = EXPORT_BATCH_SIZE):
+        if isinstance(self.db, AsyncSession):
+            result = await self.db.stream(ProductService.export_query(batch_size))
+            async for batch in result.mappings().partitions():
+                yield batch
+        else:
+            # Each fetch blocks, so the sync cursor is advanced in the threadpool
+            async for batch in iterate_in_threadpool(ProductService(self.db).iter_product_batches(batch_size)):
+                yield batch
+
+    async def import_products(self, rows) -> BulkImportResult:
+        # rows is an async iterator over the request body; each chunk is
+        # validated and written in its own unit of work
+        result = BulkImportResult()
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= settings.BULK_IMPORT_CHUNK_SIZE:
+                result.merge(await self.__import_chunk(chunk))
+                chunk = []
+        if chunk:
+            result.merge(await self.__import_chunk(chunk))
+        return result
+
+    async def __import_chunk(self, chunk) -> BulkImportResult:
+        return await run_with_session(self.db, lambda session: ProductService(session).import_products(chunk))
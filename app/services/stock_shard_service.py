@@ -0,0 +1,95 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.lib.exceptions import AppException, ErrorCode
+from app.models.product import Product, ProductStockShard
+from app.services.product_service import bump_catalog_version, invalidate_products
+from typing import Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StockShardService:
+    """Splits a product's stock across counter rows, rebalances or merges them.
+
+    Every operation locks the product row, which waits for the orders holding
+    it (or its share lock) and keeps new ones out until the commit, then
+    rewrites the shards with the same total stock spread evenly.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def reshard(self, product_id: int, shards: int) -> Dict:
+        """Spread the product's stock over ``shards`` rows; 0 merges it back into ``products.stock``."""
+        if shards < 0:
+            raise AppException(
+                error_code=ErrorCode.VALIDATION_ERROR,
+                message="The number of stock shards cannot be negative",
+                details={'shards': shards}
+            )
+        try:
+            product = self.db.scalars(select(Product)
+                                      .where(Product.id == product_id)
+                                      .with_for_update()).first()
+            if product is None:
+                raise AppException(
+                    error_code=ErrorCode.PRODUCT_NOT_FOUND,
+                    message="Product not found",
+                    details={'product_id': product_id}
+                )
+            existing = self.db.scalars(select(ProductStockShard)
+                                       .where(ProductStockShard.product_id == product_id)
+                                       .order_by(ProductStockShard.shard)
+                                       .with_for_update()).all()
+            total = sum(shard.stock for shard in existing) if product.stock_shards else product.stock
+
+            self.db.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product_id))
+            if shards:
+                share, remainder = divmod(total, shards)
+                self.db.execute(insert(ProductStockShard), [
+                    {'product_id': product_id, 'shard': shard, 'stock': share + (1 if shard < remainder else 0)}
+                    for shard in range(shards)
+                ])
+            product.stock = 0 if shards else total
+            product.stock_shards = shards
+            bump_catalog_version(self.db)
+            self.db.commit()
+        except SQLAlchemyError as e:
+            logger.error('Error resharding stock: %s', {str(e)})
+            self.db.rollback()
+            raise AppException(
+                error_code=ErrorCode.DATABASE_ERROR,
+                message="An error occurred while resharding the stock",
+                details={'error_details': str(e)},
+                original_error=e
+            ) from e
+        except AppException as e:
+            self.db.rollback()
+            raise e
+
+        invalidate_products([product_id])
+        logger.info('Product %s stock of %s now in %s shards', product_id, total, shards)
+        return self.describe(product_id)
+
+    def rebalance(self, product_id: int) -> Dict:
+        """Even out the shards of a sharded product, keeping their number."""
+        product = self.db.get(Product, product_id)
+        return self.reshard(product_id, product.stock_shards if product is not None else 0)
+
+    def merge(self, product_id: int) -> Dict:
+        return self.reshard(product_id, 0)
+
+    def describe(self, product_id: int) -> Dict:
+        row = self.db.execute(select(Product.stock_shards, Product.total_stock)
+                              .where(Product.id == product_id)).first()
+        if row is None:
+            raise AppException(
+                error_code=ErrorCode.PRODUCT_NOT_FOUND,
+                message="Product not found",
+                details={'product_id': product_id}
+            )
+        shards = self.db.scalars(select(ProductStockShard.stock)
+                                 .where(ProductStockShard.product_id == product_id)
+                                 .order_by(ProductStockShard.shard)).all()
+        return {'product_id': product_id, 'stock_shards': row.stock_shards,
+                'total_stock': row.total_stock, 'shards': list(shards)}
@@ -1,11 +1,13 @@
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from app.models.base_model import Base
 from fastapi.testclient import TestClient
 from app.main import app
 from app.core.db import get_session  # Only import get_session
 import logging
+import re
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,7 +21,10 @@ def db_engine():
     logger.info("Creating SQLite database engine...")
     test_engine = create_engine(
         TEST_DATABASE_URL,
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False},
+        # Routes run services in the threadpool; every thread must see the
+        # same in-memory database
+        poolclass=StaticPool
     )
     Base.metadata.create_all(bind=test_engine)
     yield test_engine
@@ -62,10 +67,35 @@ def client(db_session):
     # Clear all overrides after the test
     app.dependency_overrides.clear()
 
+@pytest.fixture(autouse=True)
+def clear_product_cache():
+    """Tests share one database session-wide, so cached pages must not leak between them"""
+    from app.services.product_service import product_cache
+    product_cache.clear()
+    yield
+    product_cache.clear()
+
 @pytest.fixture(autouse=True)
 def setup_app():
     # Register all routers
     from app.routers.api.v1.routes import products, orders
     app.include_router(products.router)
     app.include_router(orders.router)
-    yield
\ No newline at end of file
+    yield
+
+@pytest.fixture
+def assert_max_queries():
+    """Check a response against a query budget: ``assert_max_queries(response, 3)``.
+
+    Reads the statement count QueryStatsMiddleware put in Server-Timing, so
+    a change that adds queries to an endpoint (an N+1, a refresh) fails here.
+    """
+    def check(response, max_queries: int):
+        match = re.search(r'\bdb;dur=[\d.]+;desc="(\d+) quer', response.headers.get("server-timing", ""))
+        assert match, "no db entry in the Server-Timing header"
+        count = int(match.group(1))
+        request = response.request
+        assert count <= max_queries, \
+            f"{request.method} {request.url.path} ran {count} SQL statements, over its budget of {max_queries}"
+        return count
+    return check
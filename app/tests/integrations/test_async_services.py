@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from app.models.base_model import Base
+from app.models.order import OrderStatus
+from app.services.product_service import AsyncProductService
+from app.services.order_management_service import AsyncOrderManagementService
+from app.schemas.product import ProductCreate, FilterProductParams
+from app.schemas.order import OrderCreate
+from app.lib.exceptions import AppException, ErrorCode
+
+ASYNC_TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def async_session():
+    """Create an AsyncSession on a fresh aiosqlite in-memory database"""
+    engine = create_async_engine(ASYNC_TEST_DATABASE_URL, poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with session_factory() as session:
+        yield session
+    await engine.dispose()
+
+@pytest.fixture
+def product_data():
+    return {
+        "name": "Test Product",
+        "description": "Test Description",
+        "price": 100,
+        "stock": 10
+    }
+
+async def test_async_create_and_list_products(async_session, product_data):
+    service = AsyncProductService(async_session)
+    product = await service.create_product(ProductCreate(**product_data))
+    assert product.id is not None
+
+    result = await service.get_all_products(FilterProductParams(skip=0, limit=10))
+    assert [p.name for p in result.products] == [product_data["name"]]
+
+async def test_async_process_order(async_session, product_data):
+    product = await AsyncProductService(async_session).create_product(ProductCreate(**product_data))
+
+    order = await AsyncOrderManagementService(async_session).process_order(
+        OrderCreate(products=[{"product_id": product.id, "quantity": 3}])
+    )
+
+    assert order.status == OrderStatus.COMPLETED
+    assert order.total_price == 300
+    await async_session.refresh(product)
+    assert product.stock == 7
+
+async def test_async_process_order_errors_propagate(async_session):
+    with pytest.raises(AppException) as exc:
+        await AsyncOrderManagementService(async_session).process_order(
+            OrderCreate(products=[{"product_id": 99999, "quantity": 1}])
+        )
+    assert exc.value.error_code == ErrorCode.PRODUCT_NOT_FOUND
+
+async def test_sync_session_runs_in_threadpool(db_session, product_data):
+    service = AsyncProductService(db_session)
+    product = await service.create_product(ProductCreate(**product_data))
+
+    result = await service.get_all_products(FilterProductParams(skip=0, limit=100))
+    assert product.id in [p.id for p in result.products]
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.product import Product
+from app.schemas.order import OrderCreate
+from app.services.order_batcher import OrderBatcher
+from app.services.order_management_service import OrderManagementService
+from app.lib.exceptions import AppException, ErrorCode
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def session_factory(db_engine):
+    return sessionmaker(bind=db_engine, expire_on_commit=False)
+
+@pytest.fixture
+def product(session_factory):
+    with session_factory() as session:
+        product = Product(name="Batched Product", description="Batched", price=10, stock=5)
+        session.add(product)
+        session.commit()
+        return product
+
+@pytest.fixture
+def batches(monkeypatch):
+    sizes = []
+    process_orders = OrderManagementService.process_orders
+
+    def record(self, order_requests):
+        sizes.append(len(order_requests))
+        return process_orders(self, order_requests)
+
+    monkeypatch.setattr(OrderManagementService, "process_orders", record)
+    return sizes
+
+def order_for(product, quantity):
+    return OrderCreate(products=[{"product_id": product.id, "quantity": quantity}])
+
+async def test_concurrent_orders_share_one_batch(session_factory, product, batches):
+    batcher = OrderBatcher(session_factory, max_size=10, max_wait=0.05)
+
+    results = await asyncio.gather(
+        batcher.submit(order_for(product, 2)),
+        batcher.submit(order_for(product, 2)),
+        batcher.submit(order_for(product, 2)),
+        return_exceptions=True,
+    )
+
+    assert batches == [3]
+    assert [order.products[0]["quantity"] for order in results[:2]] == [2, 2]
+    assert isinstance(results[2], AppException)
+    assert results[2].error_code == ErrorCode.INSUFFICIENT_INVENTORY
+    with session_factory() as session:
+        assert session.get(Product, product.id).stock == 1
+
+async def test_full_batch_is_placed_without_waiting(session_factory, product, batches):
+    batcher = OrderBatcher(session_factory, max_size=2, max_wait=60)
+
+    results = await asyncio.wait_for(asyncio.gather(
+        batcher.submit(order_for(product, 1)),
+        batcher.submit(order_for(product, 1)),
+    ), timeout=5)
+
+    assert batches == [2]
+    assert all(order.id is not None for order in results)
@@ -1,11 +1,14 @@
 import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select, update
 from app.services.order_management_service import OrderManagementService
 from app.services.product_service import ProductService
-from app.schemas.order import OrderCreate
+from app.schemas.order import FilterOrderParams, OrderCreate
 from app.schemas.product import ProductCreate
-from app.models.order import OrderStatus
+from app.models.order import Order, OrderIdempotencyKey, OrderItem, OrderStatus
 from app.models.product import Product
 from app.lib.exceptions import AppException, ErrorCode
+from app.lib.pagination import encode_cursor
 
 class TestOrderManagementService:
     @pytest.fixture(autouse=True)
@@ -82,22 +85,311 @@ class TestOrderManagementService:
         self.db_session.refresh(self.test_product)
         assert self.test_product.stock == 8  # 10 - 2
 
-    def test_invalid_order_status_update_stock(self):
+    def test_process_order_commits_once(self):
+        commits = []
+
+        def on_commit(conn):
+            commits.append(True)
+
+        engine = self.db_session.get_bind()
+        event.listen(engine, "commit", on_commit)
+        try:
+            order = self.service.process_order(OrderCreate(products=[
+                {"product_id": self.test_product.id, "quantity": 1}
+            ]))
+        finally:
+            event.remove(engine, "commit", on_commit)
+
+        assert len(commits) == 1
+        assert order.id is not None
+        assert order.status == OrderStatus.COMPLETED
+        assert order.created_at is not None
+
+    def test_process_order_failure_leaves_stock_untouched(self):
+        other_product = self.product_service.create_product(
+            ProductCreate(name="Scarce Product", description="Scarce", price=5, stock=1)
+        )
         order_data = {
             "products": [
-                {
-                    "product_id": self.test_product.id,
-                    "quantity": 2
-                }
+                {"product_id": self.test_product.id, "quantity": 2},
+                {"product_id": other_product.id, "quantity": 5}
             ]
         }
-        
-        # Process the order
-        order, products_to_update = self.service._OrderManagementService__create_order(order_request=OrderCreate(**order_data))
+
+        with pytest.raises(AppException) as exc:
+            self.service.process_order(OrderCreate(**order_data))
+        assert exc.value.error_code == ErrorCode.INSUFFICIENT_INVENTORY
+
+        self.db_session.refresh(self.test_product)
+        assert self.test_product.stock == 10
+
+    def test_process_order_merges_duplicate_products(self):
         self.db_session.rollback()
         self.db_session.expire_all()
-        
-        # Try to process the same order again
+        order_data = {
+            "products": [
+                {"product_id": self.test_product.id, "quantity": 1},
+                {"product_id": self.test_product.id, "quantity": 2}
+            ]
+        }
+
+        order = self.service.process_order(OrderCreate(**order_data))
+
+        assert order.products == [{"product_id": self.test_product.id, "quantity": 3}]
+        assert order.total_price == 300
+        self.db_session.refresh(self.test_product)
+        assert self.test_product.stock == 7
+
+    def test_process_order_reports_all_problems(self):
+        other_product = self.product_service.create_product(
+            ProductCreate(name="Other Product", description="Other", price=5, stock=1)
+        )
+        order_data = {
+            "products": [
+                {"product_id": 99999, "quantity": 1},
+                {"product_id": other_product.id, "quantity": 2},
+                {"product_id": 99998, "quantity": 1}
+            ]
+        }
+
+        with pytest.raises(AppException) as exc:
+            self.service.process_order(OrderCreate(**order_data))
+
+        assert exc.value.error_code == ErrorCode.PRODUCT_NOT_FOUND
+        assert exc.value.details["missing_product_ids"] == [99998, 99999]
+        assert [line["product_id"] for line in exc.value.details["insufficient_stock"]] == [other_product.id]
+
+    def test_process_order_locks_products_in_one_statement(self):
+        product_ids = [
+            self.product_service.create_product(
+                ProductCreate(name=f"Basket Product {i}", description="Basket", price=1, stock=5)
+            ).id
+            for i in range(5)
+        ]
+        statements = []
+        committed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            # Only the statements issued while the locks are being taken
+            if not committed and "FROM products" in statement:
+                statements.append(statement)
+
+        def on_commit(conn):
+            committed.append(True)
+
+        engine = self.db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        event.listen(engine, "commit", on_commit)
+        try:
+            self.service.process_order(OrderCreate(products=[
+                {"product_id": product_id, "quantity": 1} for product_id in reversed(product_ids)
+            ]))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+            event.remove(engine, "commit", on_commit)
+
+        assert len(statements) == 1
+        assert "ORDER BY products.id" in statements[0]
+
+    def test_process_order_invalidates_cached_product(self):
+        cached = self.product_service.get_product(self.test_product.id)
+        assert cached.stock == 10
+
+        self.service.process_order(OrderCreate(products=[
+            {"product_id": self.test_product.id, "quantity": 4}
+        ]))
+
+        assert self.product_service.get_product(self.test_product.id).stock == 6
+
+    def test_process_orders_applies_orders_in_sequence(self):
+        commits = []
+
+        def on_commit(conn):
+            commits.append(True)
+
+        engine = self.db_session.get_bind()
+        event.listen(engine, "commit", on_commit)
+        try:
+            results = self.service.process_orders([
+                OrderCreate(products=[{"product_id": self.test_product.id, "quantity": 6}]),
+                OrderCreate(products=[{"product_id": self.test_product.id, "quantity": 6}]),
+                OrderCreate(products=[{"product_id": 99999, "quantity": 1}]),
+                OrderCreate(products=[{"product_id": self.test_product.id, "quantity": 4}]),
+            ])
+        finally:
+            event.remove(engine, "commit", on_commit)
+
+        assert len(commits) == 1
+        first, second, third, fourth = results
+        assert first.status == OrderStatus.COMPLETED
+        assert first.total_price == 600
+        assert second.error_code == ErrorCode.INSUFFICIENT_INVENTORY
+        assert second.details['insufficient_stock'][0]['available_stock'] == 4
+        assert third.error_code == ErrorCode.PRODUCT_NOT_FOUND
+        assert fourth.products == [{"product_id": self.test_product.id, "quantity": 4}]
+        assert fourth.id > first.id
+
+        self.db_session.refresh(self.test_product)
+        assert self.test_product.stock == 0
+
+    def test_process_orders_all_rejected_leaves_stock_untouched(self):
+        results = self.service.process_orders([
+            OrderCreate(products=[{"product_id": self.test_product.id, "quantity": 11}]),
+        ])
+
+        assert results[0].error_code == ErrorCode.INSUFFICIENT_INVENTORY
+        self.db_session.refresh(self.test_product)
+        assert self.test_product.stock == 10
+
+    def test_process_order_records_items_with_price_snapshot(self):
+        other_product = self.product_service.create_product(
+            ProductCreate(name="Other Product", description="Other", price=7, stock=5)
+        )
+        order = self.service.process_order(OrderCreate(products=[
+            {"product_id": other_product.id, "quantity": 2},
+            {"product_id": self.test_product.id, "quantity": 1}
+        ]))
+
+        self.db_session.execute(update(Product).where(Product.id == self.test_product.id).values(price=150))
+        self.db_session.commit()
+
+        items = self.db_session.scalars(select(OrderItem).where(OrderItem.order_id == order.id).order_by(OrderItem.product_id)).all()
+        assert [(item.product_id, item.quantity, item.unit_price, item.product_name) for item in items] == [
+            (self.test_product.id, 1, 100, "Test Product"),
+            (other_product.id, 2, 7, "Other Product"),
+        ]
+
+    def test_process_orders_records_items_of_accepted_orders(self):
+        first, rejected, second = self.service.process_orders([
+            OrderCreate(products=[{"product_id": self.test_product.id, "quantity": 1}]),
+            OrderCreate(products=[{"product_id": 99999, "quantity": 1}]),
+            OrderCreate(products=[{"product_id": self.test_product.id, "quantity": 3}]),
+        ])
+
+        items = self.db_session.scalars(select(OrderItem).where(OrderItem.order_id.in_([first.id, second.id]))
+                                        .order_by(OrderItem.order_id)).all()
+        assert [(item.order_id, item.quantity) for item in items] == [(first.id, 1), (second.id, 3)]
+        assert isinstance(rejected, AppException)
+
+    def create_orders_at(self, *created_at, status=OrderStatus.COMPLETED):
+        orders = [Order(products=[], total_price=0, status=status, created_at=moment) for moment in created_at]
+        self.db_session.add_all(orders)
+        self.db_session.commit()
+        return orders
+
+    def test_get_orders_pages_newest_first(self):
+        day = datetime(2001, 1, 1)
+        orders = self.create_orders_at(*(day + timedelta(hours=hours) for hours in (1, 2, 2, 3, 4)))
+        filter_params = {"created_from": day, "created_to": day + timedelta(days=1), "limit": 2}
+
+        pages = [self.service.get_orders(FilterOrderParams(**filter_params))]
+        while pages[-1].next_cursor:
+            pages.append(self.service.get_orders(FilterOrderParams(**filter_params, cursor=pages[-1].next_cursor)))
+
+        assert [[order.id for order in page.orders] for page in pages] == [
+            [orders[4].id, orders[3].id], [orders[2].id, orders[1].id], [orders[0].id]
+        ]
+
+    def test_get_orders_filters_by_status_and_range(self):
+        day = datetime(2002, 1, 1)
+        pending, = self.create_orders_at(day + timedelta(hours=1), status=OrderStatus.PENDING)
+        self.create_orders_at(day + timedelta(hours=2), day + timedelta(days=2))
+
+        result = self.service.get_orders(FilterOrderParams(status="pending", created_from=day,
+                                                           created_to=day + timedelta(days=1)))
+
+        assert [order.id for order in result.orders] == [pending.id]
+        assert result.next_cursor is None
+
+    def test_get_orders_invalid_cursor(self):
+        with pytest.raises(AppException) as exc:
+            self.service.get_orders(FilterOrderParams(cursor=encode_cursor({"created_at": "yesterday", "id": 1})))
+        assert exc.value.error_code == ErrorCode.VALIDATION_ERROR
+
+    @pytest.mark.parametrize("filters, index", [
+        ({}, "ix_orders_created_at_id"),
+        ({"status": "completed", "created_from": datetime(2001, 1, 1)}, "ix_orders_status_created_at_id"),
+    ])
+    def test_get_orders_is_served_by_index(self, filters, index):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        engine = self.db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            self.service.get_orders(FilterOrderParams(**filters, cursor=encode_cursor({"created_at": "2030-01-01T00:00:00", "id": 1})))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        statement, parameters = statements[-1]
+        plan = " ".join(row[-1] for row in self.db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+
+    def order_of(self, quantity):
+        return OrderCreate(products=[{"product_id": self.test_product.id, "quantity": quantity}])
+
+    def stock_left(self):
+        return self.db_session.scalar(select(Product.stock).where(Product.id == self.test_product.id))
+
+    def test_process_idempotent_order_replays_response(self):
+        first, replayed_first = self.service.process_idempotent_order(self.order_of(2), "key-replay")
+        second, replayed_second = self.service.process_idempotent_order(self.order_of(2), "key-replay")
+
+        assert (replayed_first, replayed_second) == (False, True)
+        assert second == first
+        assert self.stock_left() == 8
+        assert self.db_session.scalar(select(func.count()).select_from(Order).where(Order.id == first["id"])) == 1
+
+    def test_process_idempotent_order_rejects_reused_key(self):
+        self.service.process_idempotent_order(self.order_of(1), "key-reused")
+
+        with pytest.raises(AppException) as exc:
+            self.service.process_idempotent_order(self.order_of(3), "key-reused")
+        assert exc.value.error_code == ErrorCode.IDEMPOTENCY_KEY_REUSED
+        assert self.stock_left() == 9
+
+    def test_process_idempotent_order_failure_keeps_key_free(self):
+        with pytest.raises(AppException):
+            self.service.process_idempotent_order(self.order_of(20), "key-failed")
+        assert self.db_session.get(OrderIdempotencyKey, "key-failed") is None
+
+        _, replayed = self.service.process_idempotent_order(self.order_of(1), "key-failed")
+        assert not replayed
+
+    def test_process_idempotent_order_after_expiry(self):
+        first, _ = self.service.process_idempotent_order(self.order_of(1), "key-expired")
+        self.db_session.execute(update(OrderIdempotencyKey)
+                                .where(OrderIdempotencyKey.key == "key-expired")
+                                .values(expires_at=datetime(2000, 1, 1)))
+        self.db_session.commit()
+
+        second, replayed = self.service.process_idempotent_order(self.order_of(1), "key-expired")
+
+        assert not replayed
+        assert second["id"] != first["id"]
+        assert self.stock_left() == 8
+
+    def test_purge_idempotency_keys(self):
+        for key in ("purge-1", "purge-2", "purge-3"):
+            self.service.process_idempotent_order(self.order_of(1), key)
+        self.db_session.execute(update(OrderIdempotencyKey)
+                                .where(OrderIdempotencyKey.key.in_(["purge-1", "purge-2"]))
+                                .values(expires_at=datetime(2000, 1, 1)))
+        self.db_session.commit()
+
+        assert self.service.purge_idempotency_keys(batch_size=1) == 2
+        assert self.db_session.scalars(select(OrderIdempotencyKey.key)
+                                       .where(OrderIdempotencyKey.key.like("purge-%"))).all() == ["purge-3"]
+
+    def test_get_order(self):
+        order, = self.create_orders_at(datetime(2003, 1, 1))
+
+        assert self.service.get_order(order.id).id == order.id
+
+    def test_get_order_not_found(self):
         with pytest.raises(AppException) as exc:
-            self.service._OrderManagementService__verify_and_update_product_stock(order, products_to_update)
-        assert exc.value.error_code == ErrorCode.CANNOT_UPDATE_STOCK
\ No newline at end of file
+            self.service.get_order(999999)
+        assert exc.value.error_code == ErrorCode.ORDER_NOT_FOUND
@@ -1,7 +1,15 @@
+import json
 import pytest
-from app.services.product_service import ProductService
-from app.schemas.product import ProductCreate, FilterProductParams
+from app.services.product_service import ProductService, product_cache, prefix_upper_bound
+from app.services.stock_shard_service import StockShardService
+from app.services.order_management_service import OrderManagementService
+from app.schemas.order import OrderCreate
+from sqlalchemy import event, update
+from app.models.product import Product, ProductStockShard
+from app.schemas.product import ProductCreate, FilterProductParams, ProductSearchParams, MAX_PAGE_SIZE
 from app.lib.exceptions import AppException, ErrorCode
+from app.lib.pagination import encode_cursor
+from pydantic import ValidationError
 import logging
 
 
@@ -10,6 +18,7 @@ class TestProductService:
     @pytest.fixture(autouse=True)
     def setup(self, db_session):
         self.service = ProductService(db_session)
+        self.db_session = db_session
         # Configure logging
         logging.basicConfig(level=logging.DEBUG)
         self.logger = logging.getLogger(__name__)
@@ -48,4 +57,239 @@ class TestProductService:
         result = self.service.get_all_products(filter_params)
         
         assert len(result.products) > 0
-        assert result.products[0].name == self.valid_product_data["name"]
\ No newline at end of file
+        assert result.products[0].name == self.valid_product_data["name"]
+
+    def test_get_all_products_keyset_pagination(self):
+        created_ids = [
+            self.service.create_product(ProductCreate(**self.valid_product_data)).id
+            for _ in range(5)
+        ]
+
+        seen_ids = []
+        result = self.service.get_all_products(FilterProductParams(limit=2))
+        seen_ids.extend(p.id for p in result.products)
+        while result.next_cursor:
+            assert len(result.products) == 2
+            result = self.service.get_all_products(FilterProductParams(limit=2, cursor=result.next_cursor))
+            seen_ids.extend(p.id for p in result.products)
+
+        assert seen_ids == sorted(set(seen_ids))
+        assert set(created_ids) <= set(seen_ids)
+
+    def test_get_all_products_invalid_cursor(self):
+        with pytest.raises(AppException) as exc_info:
+            self.service.get_all_products(FilterProductParams(cursor="not-a-cursor"))
+        assert exc_info.value.error_code == ErrorCode.VALIDATION_ERROR
+
+    @pytest.mark.parametrize("sort, position", [
+        ("id", {"id": [1, 2]}),
+        ("id", {"id": "7"}),
+        ("id", {"id": True}),
+        ("price", {"price": "cheap", "id": 1}),
+        ("price", {"price": 10, "id": None}),
+        ("name", {"name": 5, "id": 1}),
+    ])
+    def test_get_all_products_cursor_with_wrong_types(self, sort, position):
+        with pytest.raises(AppException) as exc_info:
+            self.service.get_all_products(FilterProductParams(sort=sort, cursor=encode_cursor(position)))
+        assert exc_info.value.error_code == ErrorCode.VALIDATION_ERROR
+
+    def list_all(self, **filters):
+        result = self.service.get_all_products(FilterProductParams(limit=2, **filters))
+        products = list(result.products)
+        while result.next_cursor:
+            result = self.service.get_all_products(FilterProductParams(limit=2, cursor=result.next_cursor, **filters))
+            products.extend(result.products)
+        return products
+
+    def test_get_all_products_by_price_range(self):
+        created = [self.service.create_product(ProductCreate(name="Priced", description="", price=price, stock=1))
+                   for price in (70003, 70001, 70005, 70001, 70009)]
+
+        ascending = self.list_all(sort="price", min_price=70000.5, max_price=70005)
+        descending = self.list_all(sort="-price", min_price=70001, max_price=70005.9)
+
+        expected = [(p.price, p.id) for p in sorted(created[:4], key=lambda p: (p.price, p.id))]
+        assert [(p.price, p.id) for p in ascending] == expected
+        assert [(p.price, p.id) for p in descending] == expected[::-1]
+
+    def test_get_all_products_by_name_prefix_in_stock(self):
+        names = ["Facet Chair", "Facet Bench", "Facet Sofa", "Facets", "facet lamp", "Facer"]
+        products = {name: self.service.create_product(ProductCreate(name=name, description="", price=10, stock=5)) for name in names}
+        self.db_session.execute(update(Product).where(Product.id == products["Facet Sofa"].id).values(stock=0))
+        self.db_session.commit()
+        StockShardService(self.db_session).reshard(products["Facet Bench"].id, 2)
+
+        assert [p.name for p in self.list_all(sort="name", name_prefix="Facet")] == ["Facet Bench", "Facet Chair", "Facet Sofa", "Facets"]
+        assert [p.name for p in self.list_all(sort="name", name_prefix="Facet ", in_stock=True)] == ["Facet Bench", "Facet Chair"]
+
+    def test_get_all_products_in_stock_skips_drained_shards(self):
+        product = self.service.create_product(ProductCreate(name="Drained", description="", price=70100, stock=4))
+        StockShardService(self.db_session).reshard(product.id, 2)
+        self.db_session.execute(update(ProductStockShard).where(ProductStockShard.product_id == product.id).values(stock=0))
+        self.db_session.commit()
+
+        assert self.list_all(sort="price", min_price=70100, max_price=70100, in_stock=True) == []
+
+    def test_get_all_products_total(self):
+        for price in (70201, 70202, 70203):
+            self.service.create_product(ProductCreate(name="Counted", description="", price=price, stock=1))
+
+        result = self.service.get_all_products(FilterProductParams(sort="price", min_price=70201, max_price=70203, limit=1, include_total=True))
+
+        assert (result.total, result.total_is_estimate) == (3, False)
+        assert self.service.get_all_products(FilterProductParams(limit=1)).total is None
+
+    @pytest.mark.parametrize("filters", [
+        {"min_price": 1},
+        {"sort": "name", "max_price": 10},
+        {"name_prefix": "a"},
+        {"sort": "price", "name_prefix": "a"},
+        {"sort": "price", "min_price": 10, "max_price": 5},
+    ])
+    def test_filters_without_an_index_are_rejected(self, filters):
+        with pytest.raises(ValidationError):
+            FilterProductParams(**filters)
+
+    @pytest.mark.parametrize("filters, index", [
+        ({"sort": "price", "min_price": 5}, "ix_products_price_id"),
+        ({"sort": "-price", "in_stock": True}, "ix_products_in_stock_price_id"),
+        # SQLite's ix_products_name ends in the rowid, it may serve this too
+        ({"sort": "name", "name_prefix": "Fa"}, "ix_products_name"),
+        ({"sort": "name", "in_stock": True}, "ix_products_in_stock_name_id"),
+        ({"in_stock": True}, "ix_products_in_stock_id"),
+    ])
+    def test_get_all_products_is_served_by_index(self, filters, index):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        fields = {"price": "price", "-price": "price", "name": "name"}
+        position = {"id": 1}
+        if filters.get("sort") in fields:
+            position[fields[filters["sort"]]] = "Fa" if filters["sort"] == "name" else 5
+        engine = self.db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            self.service.get_all_products(FilterProductParams(**filters, cursor=encode_cursor(position)))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        statement, parameters = statements[-1]
+        plan = " ".join(row[-1] for row in self.db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_prefix_upper_bound(self):
+        assert prefix_upper_bound("abc") == "abd"
+        assert prefix_upper_bound("a" + chr(0x10FFFF)) == "b"
+        assert prefix_upper_bound(chr(0x10FFFF)) is None
+
+    def test_import_products_reports_row_errors(self):
+        rows = [
+            (1, self.valid_product_data),
+            (2, {**self.valid_product_data, "stock": -5}),
+            (3, {"name": "Missing price"}),
+            (4, "Invalid JSON")
+        ]
+
+        result = self.service.import_products(rows)
+
+        assert result.inserted == 1
+        assert result.failed == 3
+        assert [error.row for error in result.errors] == [2, 3, 4]
+        assert result.errors[0].errors == ["Stock cannot be negative"]
+
+    def test_get_all_products_served_from_cache(self):
+        self.service.create_product(ProductCreate(**self.valid_product_data))
+        filter_params = FilterProductParams(skip=0, limit=10)
+
+        first = self.service.get_all_products(filter_params)
+        hits = product_cache.stats()["hits"]
+        second = self.service.get_all_products(filter_params)
+
+        assert second is first
+        assert product_cache.stats()["hits"] == hits + 1
+
+    def test_get_all_products_json(self):
+        self.service.create_product(ProductCreate(**self.valid_product_data))
+        filter_params = FilterProductParams(skip=0, limit=MAX_PAGE_SIZE)
+
+        body = self.service.get_all_products_json(filter_params)
+
+        assert json.loads(body) == self.service.get_all_products(filter_params).model_dump()
+        assert self.service.get_all_products_json(filter_params) is body
+
+    def test_create_product_invalidates_cached_pages(self):
+        filter_params = FilterProductParams(skip=0, limit=MAX_PAGE_SIZE)
+        before = self.service.get_all_products(filter_params)
+
+        self.service.create_product(ProductCreate(**self.valid_product_data))
+
+        assert self.service.get_all_products(filter_params) is not before
+
+    def test_get_product(self):
+        product = self.service.create_product(ProductCreate(**self.valid_product_data))
+
+        result = self.service.get_product(product.id)
+
+        assert result.id == product.id
+        assert self.service.get_product(product.id) is result
+
+    def test_get_product_not_found(self):
+        with pytest.raises(AppException) as exc_info:
+            self.service.get_product(99999)
+        assert exc_info.value.error_code == ErrorCode.PRODUCT_NOT_FOUND
+
+    def test_catalog_etag_follows_every_write(self):
+        product = self.service.create_product(ProductCreate(**self.valid_product_data))
+        etag = self.service.get_catalog_etag()
+        assert self.service.get_catalog_etag() == etag
+
+        # Writes within the same clock tick still move it on
+        etags = {etag}
+        for _ in range(3):
+            OrderManagementService(self.db_session).process_order(
+                OrderCreate(products=[{"product_id": product.id, "quantity": 1}]))
+            etags.add(self.service.get_catalog_etag())
+        assert len(etags) == 4
+
+    def test_catalog_etag_ignores_rejected_orders(self):
+        product = self.service.create_product(ProductCreate(**self.valid_product_data))
+        etag = self.service.get_catalog_etag()
+
+        results = OrderManagementService(self.db_session).process_orders(
+            [OrderCreate(products=[{"product_id": product.id, "quantity": 1000}])])
+
+        assert isinstance(results[0], AppException)
+        assert self.service.get_catalog_etag() == etag
+
+    def test_search_products_ranks_name_matches_first(self):
+        in_description = self.service.create_product(ProductCreate(name="Kettle", description="Pairs with any teapot", price=5, stock=1))
+        in_name = self.service.create_product(ProductCreate(name="Ceramic Teapot", description="Holds a litre", price=9, stock=1))
+        self.service.create_product(ProductCreate(name="Mug", description="Ceramic", price=2, stock=1))
+
+        result = self.service.search_products(ProductSearchParams(q="teapot"))
+
+        assert [product.id for product in result.products] == [in_name.id, in_description.id]
+
+    def test_search_products_requires_every_word(self):
+        product = self.service.create_product(ProductCreate(name="Walnut Desk", description="Solid wood", price=300, stock=2))
+        self.service.create_product(ProductCreate(name="Walnut Shelf", description="Veneer", price=90, stock=2))
+
+        result = self.service.search_products(ProductSearchParams(q='walnut, "wood"!'))
+
+        assert [found.id for found in result.products if found.name.startswith("Walnut")] == [product.id]
+
+    def test_search_products_sees_updated_names(self):
+        product = self.service.create_product(ProductCreate(name="Plain Lamp", description="Desk lamp", price=30, stock=2))
+
+        self.db_session.execute(update(Product).where(Product.id == product.id).values(name="Brass Lamp"))
+        self.db_session.commit()
+
+        assert [found.id for found in self.service.search_products(ProductSearchParams(q="brass")).products] == [product.id]
+        assert self.service.search_products(ProductSearchParams(q="plain")).products == []
+
+    def test_search_products_without_words(self):
+        assert self.service.search_products(ProductSearchParams(q="?!")).products == []
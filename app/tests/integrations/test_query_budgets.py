@@ -0,0 +1,54 @@
+import pytest
+from app.core.config import settings
+from app.models.product import Product
+
+# SQL statements each endpoint may run; raise one only with the query plan
+# that justifies it
+
+@pytest.fixture
+def products(db_session):
+    products = [Product(name=f"Budget Product {i}", description="", price=10, stock=100) for i in range(10)]
+    db_session.add_all(products)
+    db_session.commit()
+    yield products
+    for product in products:
+        db_session.delete(product)
+    db_session.commit()
+
+@pytest.fixture
+def product_headers():
+    return {"x-token": settings.PRODUCT_TOKEN}
+
+@pytest.fixture
+def order_headers():
+    return {"x-token": settings.ORDER_TOKEN}
+
+def test_catalog_page_budget(client, products, product_headers, assert_max_queries):
+    response = client.get("/api/v1/products/", params={"limit": 10}, headers=product_headers)
+
+    assert response.status_code == 200
+    # Catalog ETag, then the page
+    assert_max_queries(response, 2)
+
+def test_product_detail_budget(client, products, product_headers, assert_max_queries):
+    response = client.get(f"/api/v1/products/{products[0].id}", headers=product_headers)
+
+    assert response.status_code == 200
+    assert_max_queries(response, 1)
+
+@pytest.mark.parametrize("lines", [1, 10])
+def test_place_order_budget_does_not_grow_with_lines(client, products, order_headers, assert_max_queries, lines):
+    response = client.post("/api/v1/orders/", headers=order_headers, json={
+        "products": [{"product_id": product.id, "quantity": 1} for product in products[:lines]]
+    })
+
+    assert response.status_code == 200
+    # Lock the products, insert the order and its items, update the stock,
+    # bump the catalog version
+    assert_max_queries(response, 6)
+
+def test_order_list_budget(client, products, order_headers, assert_max_queries):
+    response = client.get("/api/v1/orders/", headers=order_headers)
+
+    assert response.status_code == 200
+    assert_max_queries(response, 1)
@@ -0,0 +1,154 @@
+import pytest
+from sqlalchemy import create_engine, insert, select, update
+from app.core import replicas
+from app.core.config import settings
+from app.core.replicas import Replica, ReplicaSet
+from app.lib.exceptions import AppException
+from app.models.base_model import Base
+from app.models.order import Order
+from app.models.product import Product
+from app.services.product_service import product_cache
+
+pytestmark = pytest.mark.anyio
+
+REPLICA_PRODUCT_ID = 100_000
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+def replica_engine(path):
+    # A file database, so that it has a QueuePool to count connections on
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Product).values(id=REPLICA_PRODUCT_ID, name="Replica Product", description="",
+                                            price=10, stock=5))
+    return engine
+
+@pytest.fixture
+def replica(tmp_path):
+    engine = replica_engine(tmp_path / "replica.db")
+    yield Replica("replica0", engine)
+    engine.dispose()
+
+@pytest.fixture
+def replica_set(monkeypatch, replica):
+    replica_set = ReplicaSet([replica], max_lag=5.0)
+    monkeypatch.setattr(replicas, "replica_set", replica_set)
+    return replica_set
+
+@pytest.fixture
+def product_headers():
+    return {"x-token": settings.PRODUCT_TOKEN}
+
+def lag_of(lags):
+    async def probe(replica):
+        lag = lags[replica.name]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+    return probe
+
+def test_catalog_read_goes_to_replica(client, replica_set, product_headers):
+    response = client.get(f"/api/v1/products/{REPLICA_PRODUCT_ID}", headers=product_headers)
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "Replica Product"
+
+def test_read_primary_header_reads_own_writes(client, replica_set, product_headers):
+    response = client.get(f"/api/v1/products/{REPLICA_PRODUCT_ID}",
+                          headers={**product_headers, "x-read-primary": "true"})
+
+    assert response.status_code == 404
+
+def test_read_primary_header_skips_cached_entries(client, replica_set, product_headers):
+    # Cached from the replica
+    assert client.get(f"/api/v1/products/{REPLICA_PRODUCT_ID}", headers=product_headers).status_code == 200
+
+    response = client.get(f"/api/v1/products/{REPLICA_PRODUCT_ID}",
+                          headers={**product_headers, "x-read-primary": "true"})
+
+    assert response.status_code == 404
+
+def test_replica_reads_are_cached_no_longer_than_max_lag(monkeypatch, client, replica, replica_set, product_headers):
+    now = [0.0]
+    monkeypatch.setattr(product_cache, "_clock", lambda: now[0])
+    monkeypatch.setattr(settings, "READ_REPLICA_MAX_LAG", 5.0)
+    url = f"/api/v1/products/{REPLICA_PRODUCT_ID}"
+    assert client.get(url, headers=product_headers).json()["stock"] == 5
+
+    with replica.engine.begin() as conn:
+        conn.execute(update(Product).where(Product.id == REPLICA_PRODUCT_ID).values(stock=4))
+    now[0] = 4.9
+    assert client.get(url, headers=product_headers).json()["stock"] == 5
+    now[0] = 5.0
+    assert client.get(url, headers=product_headers).json()["stock"] == 4
+
+def test_writes_go_to_primary(client, db_session, replica, replica_set):
+    product = Product(name="Primary Product", description="", price=10, stock=5)
+    db_session.add(product)
+    db_session.commit()
+
+    response = client.post("/api/v1/orders/", headers={"x-token": settings.ORDER_TOKEN},
+                           json={"products": [{"product_id": product.id, "quantity": 1}]})
+
+    assert response.status_code == 200
+    with replica.session_factory() as session:
+        assert session.scalars(select(Order)).all() == []
+
+async def test_lagging_replica_leaves_rotation_until_caught_up(replica, replica_set):
+    lags = {"replica0": 12.0}
+    replica_set._lag_probe = lag_of(lags)
+
+    await replica_set.check()
+    assert not replica.healthy
+    assert replica.lag == 12.0
+    assert replica_set.choose() is None
+
+    lags["replica0"] = 0.5
+    await replica_set.check()
+    assert replica_set.choose() is replica
+
+async def test_unreachable_replica_leaves_rotation(replica, replica_set):
+    replica_set._lag_probe = lag_of({"replica0": ConnectionError("refused")})
+
+    await replica_set.check()
+
+    assert not replica.healthy
+    assert replica.lag is None
+
+async def test_sqlite_replica_counts_as_caught_up(replica, replica_set):
+    await replica_set.check()
+
+    assert replica.healthy
+    assert replica.lag == 0
+
+def test_round_robin_alternates_between_healthy_replicas(tmp_path):
+    first = Replica("replica0", replica_engine(tmp_path / "first.db"))
+    second = Replica("replica1", replica_engine(tmp_path / "second.db"))
+    third = Replica("replica2", replica_engine(tmp_path / "third.db"))
+    third.healthy = False
+    replica_set = ReplicaSet([first, second, third], strategy="round_robin")
+
+    assert [replica_set.choose() for _ in range(4)] == [first, second, first, second]
+
+def test_least_connections_picks_least_busy_replica(tmp_path):
+    busy = Replica("replica0", replica_engine(tmp_path / "busy.db"))
+    idle = Replica("replica1", replica_engine(tmp_path / "idle.db"))
+    replica_set = ReplicaSet([busy, idle], strategy="least_connections")
+
+    with busy.engine.connect():
+        assert replica_set.choose() is idle
+    with idle.engine.connect():
+        assert replica_set.choose() is busy
+
+def test_replica_session_rejects_writes_and_row_locks(replica):
+    with replica.session_factory() as session:
+        with pytest.raises(AppException):
+            session.execute(select(Product).with_for_update())
+        with pytest.raises(AppException):
+            session.execute(insert(Product).values(name="Nope", description="", price=1, stock=1))
+        session.add(Product(name="Nope", description="", price=1, stock=1))
+        with pytest.raises(AppException):
+            session.flush()
@@ -0,0 +1,80 @@
+import pytest
+from app.services.order_management_service import OrderManagementService
+from app.services.product_service import ProductService
+from app.services.stock_shard_service import StockShardService
+from app.schemas.order import OrderCreate
+from app.schemas.product import ProductCreate, FilterProductParams, MAX_PAGE_SIZE
+from app.lib.exceptions import AppException, ErrorCode
+
+class TestStockShardService:
+    @pytest.fixture(autouse=True)
+    def setup(self, db_session):
+        self.service = StockShardService(db_session)
+        self.db_session = db_session
+        self.order_service = OrderManagementService(db_session)
+        self.product_service = ProductService(db_session)
+        self.product = self.product_service.create_product(
+            ProductCreate(name="Hot Product", description="Flash sale", price=10, stock=10)
+        )
+
+    def order(self, quantity):
+        return self.order_service.process_order(OrderCreate(products=[
+            {"product_id": self.product.id, "quantity": quantity}
+        ]))
+
+    def test_reshard_spreads_stock_evenly(self):
+        result = self.service.reshard(self.product.id, 3)
+
+        assert result == {'product_id': self.product.id, 'stock_shards': 3, 'total_stock': 10, 'shards': [4, 3, 3]}
+        assert self.product_service.get_product(self.product.id).stock == 10
+
+    def test_order_takes_stock_from_a_single_shard(self):
+        self.service.reshard(self.product.id, 2)
+
+        self.order(3)
+
+        shards = self.service.describe(self.product.id)['shards']
+        assert sorted(shards) == [2, 5]
+        assert self.product_service.get_product(self.product.id).stock == 7
+
+    def test_order_larger_than_any_shard_drains_several(self):
+        self.service.reshard(self.product.id, 4)
+
+        order = self.order(9)
+
+        assert order.total_price == 90
+        assert self.service.describe(self.product.id)['total_stock'] == 1
+
+    def test_order_above_total_sharded_stock_is_rejected(self):
+        self.service.reshard(self.product.id, 4)
+
+        with pytest.raises(AppException) as exc:
+            self.order(11)
+        assert exc.value.error_code == ErrorCode.INSUFFICIENT_INVENTORY
+        assert exc.value.details['insufficient_stock'][0]['available_stock'] == 10
+        assert self.service.describe(self.product.id)['shards'] == [3, 3, 2, 2]
+
+    def test_rebalance_and_merge_keep_total(self):
+        self.service.reshard(self.product.id, 2)
+        self.order(5)
+
+        assert self.service.rebalance(self.product.id)['shards'] == [3, 2]
+        merged = self.service.merge(self.product.id)
+
+        assert merged == {'product_id': self.product.id, 'stock_shards': 0, 'total_stock': 5, 'shards': []}
+        page = self.product_service.get_all_products(FilterProductParams(limit=MAX_PAGE_SIZE))
+        assert next(product for product in page.products if product.id == self.product.id).stock == 5
+
+    def test_reshard_unknown_product(self):
+        with pytest.raises(AppException) as exc:
+            self.service.reshard(99999, 2)
+        assert exc.value.error_code == ErrorCode.PRODUCT_NOT_FOUND
+
+    def test_shard_writes_change_catalog_etag(self):
+        etag = self.product_service.get_catalog_etag()
+        self.service.reshard(self.product.id, 2)
+        resharded = self.product_service.get_catalog_etag()
+
+        self.order(1)
+
+        assert len({etag, resharded, self.product_service.get_catalog_etag()}) == 3
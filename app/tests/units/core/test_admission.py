@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from app.core.admission import AdmissionController, Priority
+from app.lib.exceptions import AppException, ErrorCode
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+def controller(max_in_flight=1, max_queue=2, queue_timeout=1.0):
+    return AdmissionController(max_in_flight, max_queue=max_queue, queue_timeout=queue_timeout, retry_after=3)
+
+async def queue(admission, priority):
+    task = asyncio.create_task(admission.acquire(priority))
+    await asyncio.sleep(0)
+    return task
+
+async def test_admits_up_to_max_in_flight_then_queues():
+    admission = controller(max_in_flight=2)
+    await admission.acquire(Priority.READ)
+    await admission.acquire(Priority.READ)
+    waiting = await queue(admission, Priority.READ)
+
+    assert admission.snapshot() == {"in_flight": 2, "max_in_flight": 2, "queued_order_write": 0, "queued_read": 1}
+    admission.release()
+    await waiting
+    assert admission.in_flight == 2
+    assert admission.queued == 0
+
+async def test_sheds_with_retry_after_when_queue_full():
+    admission = controller(max_queue=1)
+    await admission.acquire(Priority.READ)
+    await queue(admission, Priority.READ)
+
+    with pytest.raises(AppException) as error:
+        await admission.acquire(Priority.READ)
+    assert error.value.error_code == ErrorCode.SERVICE_UNAVAILABLE
+    assert error.value.details == {"reason": "queue_full"}
+    assert error.value.headers == {"Retry-After": "3"}
+
+async def test_sheds_after_queue_timeout():
+    admission = controller(queue_timeout=0.01)
+    await admission.acquire(Priority.READ)
+
+    with pytest.raises(AppException) as error:
+        await admission.acquire(Priority.READ)
+    assert error.value.details == {"reason": "timeout"}
+    assert admission.queued == 0
+    admission.release()
+    assert admission.in_flight == 0
+
+async def test_order_writes_are_admitted_before_reads():
+    admission = controller(max_queue=3)
+    await admission.acquire(Priority.READ)
+    read = await queue(admission, Priority.READ)
+    write = await queue(admission, Priority.ORDER_WRITE)
+
+    admission.release()
+    await write
+    assert not read.done()
+    admission.release()
+    await read
+
+async def test_order_write_preempts_newest_read_when_queue_full():
+    admission = controller(max_queue=2)
+    await admission.acquire(Priority.READ)
+    oldest = await queue(admission, Priority.READ)
+    newest = await queue(admission, Priority.READ)
+
+    write = await queue(admission, Priority.ORDER_WRITE)
+    with pytest.raises(AppException) as error:
+        await newest
+    assert error.value.details == {"reason": "preempted"}
+    assert not oldest.done()
+
+    admission.release()
+    await write
+    admission.release()
+    await oldest
+
+async def test_cancelled_waiter_leaves_queue():
+    admission = controller()
+    await admission.acquire(Priority.READ)
+    waiting = await queue(admission, Priority.READ)
+
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert admission.queued == 0
+    admission.release()
+    assert admission.in_flight == 0
+
+async def test_disabled_controller_admits_everything():
+    admission = AdmissionController(0, max_queue=0, queue_timeout=0, retry_after=1, enabled=False)
+    async with admission.slot(Priority.READ):
+        assert admission.in_flight == 0
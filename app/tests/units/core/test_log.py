@@ -0,0 +1,51 @@
+import io
+import json
+import logging
+import pytest
+from app.core.log import SAMPLED, JsonFormatter, SamplingFilter, configure_logging, setup_logging
+
+
+@pytest.fixture
+def captured_logs():
+    stream = io.StringIO()
+    listener = configure_logging("INFO", "json", sample_rate=0.0, stream=stream)
+
+    def read():
+        # Stopping the listener drains the queue
+        listener.stop()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield read
+    setup_logging()
+
+def test_records_are_written_as_json_lines(captured_logs):
+    logger = logging.getLogger("test.log")
+    logger.info("Placed order %s", 7, extra={"order_id": 7})
+    logger.debug("Not at this level")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed")
+
+    placed, failed = captured_logs()
+
+    assert placed["message"] == "Placed order 7"
+    assert placed["level"] == "INFO"
+    assert placed["logger"] == "test.log"
+    assert placed["order_id"] == 7
+    assert failed["message"] == "Failed"
+    assert "ValueError: boom" in failed["exception"]
+
+def test_sampled_records_below_warning_are_dropped(captured_logs):
+    logger = logging.getLogger("test.log")
+    logger.info("Stock update", extra=SAMPLED)
+    logger.warning("Stock low", extra=SAMPLED)
+    logger.info("Not sampled")
+
+    assert [entry["message"] for entry in captured_logs()] == ["Stock low", "Not sampled"]
+
+def test_sampling_filter_tags_kept_records_with_the_rate():
+    record = logging.makeLogRecord({"msg": "Stock update", "levelno": logging.INFO, **SAMPLED})
+
+    assert SamplingFilter(1.0).filter(record)
+    assert json.loads(JsonFormatter().format(record))["sample_rate"] == 1.0
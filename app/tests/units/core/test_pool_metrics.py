@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from app.core.pool_metrics import InstrumentedQueuePool, PoolMetrics
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05
+    )
+    yield engine
+    engine.dispose()
+
+def test_checkouts_and_checkins_are_counted(engine):
+    metrics = PoolMetrics("test")
+    metrics.attach(engine)
+
+    with engine.connect():
+        assert metrics.snapshot()["checked_out"] == 1
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checked_out"] == 0
+    assert snapshot["checkouts"] == 1
+    assert snapshot["checkins"] == 1
+    assert snapshot["connects"] == 1
+    assert snapshot["waits"] == 1
+
+def test_exhausted_pool_records_timeout(engine):
+    metrics = PoolMetrics("test")
+    metrics.attach(engine)
+
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_seconds_max"] >= 0.05
+
+def test_metrics_survive_dispose(engine):
+    metrics = PoolMetrics("test")
+    metrics.attach(engine)
+    engine.dispose()
+
+    with engine.connect():
+        pass
+
+    assert metrics.snapshot()["checkouts"] == 1
+    assert metrics.snapshot()["waits"] == 1
@@ -0,0 +1,60 @@
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.core.query_stats import QueryStats, current_query_stats, track_queries
+from app.lib.exceptions import AppException, ErrorCode
+from app.middleware import ErrorHandlerMiddleware, QueryStatsMiddleware
+
+def test_track_queries_counts_statements_in_context(db_engine):
+    with db_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with track_queries() as stats:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        conn.execute(text("SELECT 3"))
+
+    assert stats.count == 2
+    assert stats.seconds > 0
+    assert current_query_stats() is None
+
+def test_server_timing_entry():
+    assert QueryStats(count=3, seconds=0.0125).server_timing() == 'db;dur=12.50;desc="3 queries"'
+    assert QueryStats(count=1, seconds=0.001).server_timing() == 'db;dur=1.00;desc="1 query"'
+
+def query_app(db_engine) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ErrorHandlerMiddleware)
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/queries")
+    def queries():
+        with db_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {}
+
+    @app.get("/error")
+    def error():
+        with db_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        raise AppException(ErrorCode.PRODUCT_NOT_FOUND)
+
+    return app
+
+def test_middleware_reports_queries_in_header_and_access_log(db_engine, caplog):
+    with TestClient(query_app(db_engine)) as client, caplog.at_level(logging.INFO, logger="app.access"):
+        response = client.get("/queries")
+
+    assert response.headers["server-timing"].endswith('desc="2 queries"')
+    record = next(record for record in caplog.records if record.name == "app.access")
+    assert record.db_queries == 2
+    assert record.status == 200
+    assert record.route == "/queries"
+
+def test_middleware_reports_queries_of_error_responses(db_engine):
+    with TestClient(query_app(db_engine)) as client:
+        response = client.get("/error")
+
+    assert response.status_code == 404
+    assert response.headers["server-timing"].endswith('desc="1 query"')
@@ -0,0 +1,71 @@
+from app.lib.cache import TTLLRUCache, MISSING
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_cached_value_and_counts_hits():
+    cache = TTLLRUCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is MISSING
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLLRUCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLLRUCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 10
+    assert cache.get("a") is MISSING
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+def test_entry_ttl_can_only_shorten_the_cache_ttl():
+    clock = FakeClock()
+    cache = TTLLRUCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("short", 1, ttl=2)
+    cache.set("long", 2, ttl=60)
+
+    clock.now = 2
+    assert cache.get("short") is MISSING
+    clock.now = 9
+    assert cache.get("long") == 2
+    clock.now = 10
+    assert cache.get("long") is MISSING
+
+def test_invalidate_tags_only_drops_tagged_entries():
+    cache = TTLLRUCache(maxsize=10, ttl=10)
+    cache.set("page-1", [1, 2], tags=["pages", ("product", 1), ("product", 2)])
+    cache.set("page-2", [3], tags=["pages", ("product", 3)])
+    cache.set(("product", 3), 3, tags=[("product", 3)])
+
+    cache.invalidate_tags([("product", 3)])
+
+    assert cache.get("page-1") == [1, 2]
+    assert cache.get("page-2") is MISSING
+    assert cache.get(("product", 3)) is MISSING
+
+def test_zero_size_disables_cache():
+    cache = TTLLRUCache(maxsize=0, ttl=10)
+    cache.set("a", 1)
+    assert cache.get("a") is MISSING
@@ -1,6 +1,7 @@
 import pytest
-from unittest.mock import Mock, patch
-from app.schemas.order import Order, OrderCreate, OrderItemBase, OrderStatus
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from app.schemas.order import AllOrders, FilterOrderParams, Order, OrderCreate, OrderItemBase, OrderStatus
 from app.lib.exceptions import ErrorCode, AppException
 
 TEST_TOKEN = "test-order-token"
@@ -20,8 +21,8 @@ def headers():
 @pytest.fixture
 def mock_order_service(db_session):
     """Create a mock order management service and patch the instance creation"""
-    with patch("app.routers.api.v1.routes.orders.OrderManagementService") as mock_service:
-        service_instance = Mock()
+    with patch("app.routers.api.v1.routes.orders.AsyncOrderManagementService") as mock_service:
+        service_instance = AsyncMock()
         mock_service.return_value = service_instance
         yield service_instance
 
@@ -140,4 +141,83 @@ def test_invalid_token(client, mock_order_service):
     }
     response = client.post("/api/v1/orders/", json=request_data, headers=headers)
     assert response.status_code == 400
-    assert response.json()["detail"] == "X-Token header invalid"
\ No newline at end of file
+    assert response.json()["detail"] == "X-Token header invalid"
+
+
+def test_read_orders(client, mock_order_service, headers):
+    mock_order_service.get_orders.return_value = AllOrders(
+        orders=[Order(id=3, products=[OrderItemBase(product_id=1, quantity=1)], total_price=10,
+                      status=OrderStatus.COMPLETED, created_at=datetime(2025, 1, 2))],
+        next_cursor="eyJpZCI6M30"
+    )
+
+    response = client.get(
+        "/api/v1/orders/?status=completed&created_from=2025-01-01T00:00:00&limit=1",
+        headers=headers
+    )
+
+    assert response.status_code == 200
+    assert response.json()["orders"][0]["created_at"] == "2025-01-02T00:00:00"
+    assert response.json()["next_cursor"] == "eyJpZCI6M30"
+    filter_params = mock_order_service.get_orders.call_args[0][0]
+    assert isinstance(filter_params, FilterOrderParams)
+    assert filter_params.status == OrderStatus.COMPLETED
+    assert filter_params.created_from == datetime(2025, 1, 1)
+    assert filter_params.limit == 1
+
+def test_read_orders_invalid_range(client, mock_order_service, headers):
+    response = client.get(
+        "/api/v1/orders/?created_from=2025-01-02T00:00:00&created_to=2025-01-01T00:00:00",
+        headers=headers
+    )
+
+    assert response.status_code == 422
+    mock_order_service.get_orders.assert_not_called()
+
+def test_read_order_not_found(client, mock_order_service, headers):
+    mock_order_service.get_order.side_effect = AppException(
+        error_code=ErrorCode.ORDER_NOT_FOUND,
+        message="Order not found",
+        details={"order_id": 5}
+    )
+
+    response = client.get("/api/v1/orders/5", headers=headers)
+
+    assert response.status_code == 404
+    assert response.json()["details"] == {"order_id": 5}
+    mock_order_service.get_order.assert_called_once_with(5)
+
+def test_create_order_with_idempotency_key(client, mock_order_service, headers):
+    body = {"id": 7, "products": [{"product_id": 1, "quantity": 2}], "total_price": 20.0,
+            "status": "completed", "created_at": "2026-01-01T00:00:00"}
+    mock_order_service.process_idempotent_order.return_value = (body, True)
+
+    response = client.post("/api/v1/orders/", json={"products": [{"product_id": 1, "quantity": 2}]},
+                           headers={**headers, "idempotency-key": "abc"})
+
+    assert response.status_code == 200
+    assert response.json() == body
+    assert response.headers["idempotent-replayed"] == "true"
+    order_request, key = mock_order_service.process_idempotent_order.call_args.args
+    assert key == "abc"
+    mock_order_service.process_order.assert_not_called()
+
+def test_create_order_idempotency_key_reused(client, mock_order_service, headers):
+    mock_order_service.process_idempotent_order.side_effect = AppException(ErrorCode.IDEMPOTENCY_KEY_REUSED)
+
+    response = client.post("/api/v1/orders/", json={"products": [{"product_id": 1, "quantity": 2}]},
+                           headers={**headers, "idempotency-key": "abc"})
+
+    assert response.status_code == 422
+
+def test_create_order_shed_when_overloaded(client, mock_order_service, headers, monkeypatch):
+    from app.core.admission import admission_controller
+    monkeypatch.setattr(admission_controller, "max_in_flight", 0)
+    monkeypatch.setattr(admission_controller, "max_queue", 0)
+
+    response = client.post("/api/v1/orders/", json={"products": [{"product_id": 1, "quantity": 2}]}, headers=headers)
+
+    assert response.status_code == 503
+    assert response.json()["details"] == {"reason": "queue_full"}
+    assert response.headers["retry-after"] == "1"
+    mock_order_service.process_order.assert_not_called()
@@ -1,7 +1,14 @@
+import csv
+import io
+import json
 import pytest
 from unittest.mock import Mock, patch
-from app.schemas.product import Product, ProductCreate, FilterProductParams, AllProducts
-from app.services.product_service import ProductService
+from app.schemas.product import Product, ProductCreate, FilterProductParams, AllProducts, ProductSearchParams, ProductSearchResults, MAX_PAGE_SIZE
+from app.services.product_service import AsyncProductService
+from app.models.product import CatalogVersion, Product as ProductModel
+from app.core.config import settings
+from app.lib.exceptions import AppException, ErrorCode
+from sqlalchemy import select, update
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
@@ -23,9 +30,10 @@ def headers():
 @pytest.fixture
 def mock_product_service(db_session):
     """Create a mock product service and patch the instance creation"""
-    with patch("app.routers.api.v1.routes.products.ProductService") as mock_service:
+    with patch("app.routers.api.v1.routes.products.AsyncProductService") as mock_service:
         # Configure the mock to return an instance
-        service_instance = Mock(spec=ProductService)
+        service_instance = Mock(spec=AsyncProductService)
+        service_instance.get_catalog_etag.return_value = 'W/"catalog-version"'
         mock_service.return_value = service_instance
         yield service_instance
 
@@ -39,13 +47,14 @@ def test_read_products_success(client, mock_product_service, headers):
     )
     
     # Configure mock to return the test data
-    mock_product_service.get_all_products.return_value = mock_products
+    mock_product_service.get_catalog_page.return_value = ('W/"catalog-version"', mock_products)
 
     # Make request
     response = client.get("/api/v1/products/?skip=0&limit=10", headers=headers)
     
     # Assert response
     assert response.status_code == 200
+    assert response.headers["etag"] == 'W/"catalog-version"'
     data = response.json()
     assert "products" in data
     assert len(data["products"]) == 2
@@ -53,12 +62,34 @@ def test_read_products_success(client, mock_product_service, headers):
     assert data["products"][1]["name"] == "Test Product 2"
     
     # Verify service called correctly
-    mock_product_service.get_all_products.assert_called_once()
-    filter_params = mock_product_service.get_all_products.call_args[0][0]
+    mock_product_service.get_catalog_page.assert_called_once()
+    filter_params = mock_product_service.get_catalog_page.call_args[0][0]
     assert isinstance(filter_params, FilterProductParams)
     assert filter_params.skip == 0
     assert filter_params.limit == 10
 
+def test_read_product_success(client, mock_product_service, headers):
+    mock_product_service.get_product.return_value = Product(
+        id=7, name="Test Product 7", description="Test description 7", price=70, stock=7
+    )
+
+    response = client.get("/api/v1/products/7", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == 7
+    mock_product_service.get_product.assert_called_once_with(7)
+
+def test_read_product_not_found(client, mock_product_service, headers):
+    mock_product_service.get_product.side_effect = AppException(
+        error_code=ErrorCode.PRODUCT_NOT_FOUND,
+        message="Product not found"
+    )
+
+    response = client.get("/api/v1/products/99999", headers=headers)
+
+    assert response.status_code == 404
+    assert response.json()["message"] == "Product not found"
+
 def test_create_product_success(client, mock_product_service, headers):
     # Prepare test data
     request_data = {
@@ -105,6 +136,98 @@ def test_read_products_invalid_params(client, mock_product_service, headers):
     response = client.get("/api/v1/products/?skip=-1&limit=0", headers=headers)
     assert response.status_code == 422
 
+def test_read_products_not_modified(client, mock_product_service, headers):
+    response = client.get(
+        "/api/v1/products/?skip=0&limit=10",
+        headers={**headers, "if-none-match": 'W/"other", W/"catalog-version"'}
+    )
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"catalog-version"'
+    mock_product_service.get_catalog_page.assert_not_called()
+
+def test_read_products_fast_json_matches_response_model(client, headers):
+    for i in range(3):
+        client.post("/api/v1/products/", json={"name": f"Fast {i}", "description": "d", "price": 1.5, "stock": i}, headers=headers)
+    expected = client.get("/api/v1/products/?limit=2", headers=headers)
+
+    with patch.object(settings, "FAST_JSON_RESPONSES", True):
+        response = client.get("/api/v1/products/?limit=2", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"] == expected.headers["etag"]
+    assert response.json() == expected.json()
+    # The documented response body is the same either way
+    schema = client.get("/openapi.json").json()["paths"]["/api/v1/products/"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/AllProducts"}
+
+def test_read_products_etag_changes_with_catalog(client, headers):
+    first = client.get("/api/v1/products/", headers=headers)
+    etag = first.headers["etag"]
+    assert client.get("/api/v1/products/", headers={**headers, "if-none-match": etag}).status_code == 304
+
+    client.post("/api/v1/products/", json={"name": "New", "description": "d", "price": 1, "stock": 1}, headers=headers)
+
+    second = client.get("/api/v1/products/", headers={**headers, "if-none-match": etag})
+    assert second.status_code == 200
+    assert second.headers["etag"] != etag
+
+@pytest.mark.parametrize("fast_json", [False, True])
+def test_read_products_keeps_a_cached_page_with_its_etag(client, headers, db_session, fast_json):
+    with patch.object(settings, "FAST_JSON_RESPONSES", fast_json):
+        first = client.get("/api/v1/products/", headers=headers)
+        # A write this worker's cache does not hear of, like another worker's
+        db_session.execute(update(CatalogVersion).where(CatalogVersion.slot == 0).values(version=CatalogVersion.version + 1))
+        db_session.commit()
+
+        second = client.get("/api/v1/products/", headers={**headers, "if-none-match": first.headers["etag"]})
+        fresh = client.get("/api/v1/products/", headers=headers)
+
+    # The catalog moved on, but the cached page is still the one that ETag names
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.content == b""
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] == first.headers["etag"]
+    assert fresh.json() == first.json()
+
+def test_read_products_limit_above_maximum(client, mock_product_service, headers):
+    response = client.get(f"/api/v1/products/?limit={MAX_PAGE_SIZE + 1}", headers=headers)
+    assert response.status_code == 422
+    mock_product_service.get_catalog_page.assert_not_called()
+
+def test_read_products_cursor_with_skip(client, mock_product_service, headers):
+    response = client.get("/api/v1/products/?skip=10&cursor=eyJpZCI6MX0", headers=headers)
+    assert response.status_code == 422
+
+def test_read_products_filter_needs_its_sort(client, mock_product_service, headers):
+    response = client.get("/api/v1/products/?min_price=10", headers=headers)
+    assert response.status_code == 422
+    mock_product_service.get_catalog_page.assert_not_called()
+
+def test_read_products_passes_filters(client, mock_product_service, headers):
+    mock_product_service.get_catalog_page.return_value = ('W/"catalog-version"', AllProducts(products=[], total=0, total_is_estimate=False))
+    response = client.get("/api/v1/products/?sort=name&name_prefix=Tea&in_stock=true&include_total=true", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
+    filter_query = mock_product_service.get_catalog_page.call_args.args[0]
+    assert (filter_query.sort, filter_query.name_prefix, filter_query.in_stock) == ("name", "Tea", True)
+
+def test_read_products_with_cursor(client, mock_product_service, headers):
+    mock_product_service.get_catalog_page.return_value = ('W/"catalog-version"', AllProducts(
+        products=[Product(id=3, name="Test Product 3", description="Test description 3", price=10, stock=1)],
+        next_cursor="eyJpZCI6M30"
+    ))
+
+    response = client.get("/api/v1/products/?cursor=eyJpZCI6Mn0&limit=1", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] == "eyJpZCI6M30"
+    filter_params = mock_product_service.get_catalog_page.call_args[0][0]
+    assert filter_params.cursor == "eyJpZCI6Mn0"
+    assert filter_params.limit == 1
+
 def test_create_product_invalid_data(client, mock_product_service, headers):
     # Test with missing required fields
     response = client.post(
@@ -128,4 +251,159 @@ def test_invalid_token(client, mock_product_service):
     headers = {"x-token": "wrong-token"}
     response = client.get("/api/v1/products/?skip=0&limit=10", headers=headers)
     assert response.status_code == 400
-    assert response.json()["detail"] == "X-Token header invalid"
\ No newline at end of file
+    assert response.json()["detail"] == "X-Token header invalid"
+def test_bulk_import_ndjson(client, headers):
+    body = "\n".join([
+        '{"name": "Bulk 1", "description": "d", "price": 10, "stock": 1}',
+        '{"name": "Bulk 2", "description": "d", "price": -1, "stock": 1}',
+        'not json',
+        '{"name": "Bulk 3", "description": "d", "price": 12, "stock": 3}',
+        ''
+    ])
+
+    with patch.object(settings, "BULK_IMPORT_CHUNK_SIZE", 2):
+        response = client.post(
+            "/api/v1/products/bulk",
+            content=body,
+            headers={**headers, "content-type": "application/x-ndjson"}
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    assert data["failed"] == 2
+    assert [error["row"] for error in data["errors"]] == [2, 3]
+    assert data["errors"][0]["errors"] == ["Price cannot be negative"]
+
+def test_bulk_import_csv(client, headers, db_session):
+    body = (
+        "name,description,price,stock\r\n"
+        'CSV Product,"Multi\nline, quoted",15,4\r\n'
+        "Broken Product,d,abc,1\r\n"
+    )
+
+    response = client.post(
+        "/api/v1/products/bulk",
+        content=body.encode(),
+        headers={**headers, "content-type": "text/csv; charset=utf-8"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 1
+    assert data["errors"][0]["row"] == 2
+    imported = db_session.scalars(select(ProductModel).where(ProductModel.name == "CSV Product")).one()
+    assert imported.description == "Multi\nline, quoted"
+    assert imported.stock == 4
+
+def test_bulk_import_reports_unreadable_lines(client, headers):
+    body = b"\n".join([
+        '\ufeff{"name": "Bulk 1", "description": "d", "price": 10, "stock": 1}'.encode(),
+        b'{"name": "Bad \xff", "description": "d", "price": 10, "stock": 1}',
+        b'{"name": "Long", "description": "' + b"x" * 200 + b'", "price": 10, "stock": 1}',
+        '\ufeff{"name": "Bulk 2", "description": "d", "price": 10, "stock": 1}'.encode(),
+        b'{"name": "Bulk 3", "description": "d", "price": 10, "stock": 1}',
+    ])
+
+    # Small chunks, so that the long line is dropped before its end arrives
+    def chunks():
+        for start in range(0, len(body), 16):
+            yield body[start:start + 16]
+
+    with patch.object(settings, "BULK_IMPORT_MAX_LINE_BYTES", 100):
+        response = client.post(
+            "/api/v1/products/bulk",
+            content=chunks(),
+            headers={**headers, "content-type": "application/x-ndjson"}
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    # A byte order mark only counts as one at the start of the stream
+    assert [error["row"] for error in data["errors"]] == [2, 3, 4]
+    assert data["errors"][0]["errors"][0].startswith("Invalid UTF-8")
+    assert data["errors"][1]["errors"] == ["Line longer than 100 bytes"]
+    assert data["errors"][2]["errors"][0].startswith("Invalid JSON")
+
+def test_bulk_import_csv_bounds_unterminated_quotes(client, headers):
+    body = (
+        "\ufeffname,description,price,stock\n"
+        'Open Quote,"never closed,1,1\n'
+        + "filler,d,1,1\n" * 10 +
+        "CSV Product,d,15,4\n"
+    )
+
+    with patch.object(settings, "BULK_IMPORT_MAX_LINE_BYTES", 100):
+        response = client.post(
+            "/api/v1/products/bulk",
+            content=body.encode(),
+            headers={**headers, "content-type": "text/csv"}
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    # The open quote swallows six more lines before the record gets too long
+    assert data["errors"] == [{"row": 1, "errors": ["Record longer than 100 characters"]}]
+    assert data["inserted"] == 5
+
+def test_bulk_import_csv_unreadable_header(client, headers):
+    response = client.post(
+        "/api/v1/products/bulk",
+        content=b"name,descr\xffiption,price,stock\nCSV Product,d,15,4\n",
+        headers={**headers, "content-type": "text/csv"}
+    )
+    assert response.status_code == 400
+
+def test_bulk_import_unsupported_content_type(client, headers):
+    response = client.post(
+        "/api/v1/products/bulk",
+        content=b"<products/>",
+        headers={**headers, "content-type": "application/xml"}
+    )
+    assert response.status_code == 400
+
+def test_export_products_ndjson(client, headers, db_session):
+    db_session.add_all([
+        ProductModel(name="Export 1", description="d", price=1, stock=1),
+        ProductModel(name="Export 2", description="d", price=2, stock=2)
+    ])
+    db_session.commit()
+    expected = db_session.scalars(select(ProductModel.id).order_by(ProductModel.id)).all()
+
+    response = client.get("/api/v1/products/export", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == expected
+    assert set(rows[0]) == {"id", "name", "description", "price", "stock"}
+
+def test_export_products_csv(client, headers, db_session):
+    db_session.add(ProductModel(name='Export, "quoted"', description="d", price=3, stock=3))
+    db_session.commit()
+
+    response = client.get("/api/v1/products/export?format=csv", headers=headers)
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert 'Export, "quoted"' in [row["name"] for row in rows]
+
+def test_search_products(client, mock_product_service, headers):
+    mock_product_service.search_products.return_value = ProductSearchResults(products=[
+        Product(id=4, name="Ceramic Teapot", description="Holds a litre", price=9, stock=1)
+    ])
+
+    response = client.get("/api/v1/products/search?q=teapot&limit=5", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["products"][0]["name"] == "Ceramic Teapot"
+    search_query = mock_product_service.search_products.call_args[0][0]
+    assert isinstance(search_query, ProductSearchParams)
+    assert (search_query.q, search_query.limit) == ("teapot", 5)
+
+def test_search_products_requires_query(client, mock_product_service, headers):
+    response = client.get("/api/v1/products/search", headers=headers)
+
+    assert response.status_code == 422
+    mock_product_service.search_products.assert_not_called()
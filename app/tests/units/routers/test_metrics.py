@@ -0,0 +1,51 @@
+import pytest
+from unittest.mock import patch
+from app.lib.metrics import Registry
+
+TEST_TOKEN = "test-product-token"
+
+@pytest.fixture(autouse=True)
+def mock_settings():
+    with patch("app.dependencies.settings") as mock_settings:
+        mock_settings.PRODUCT_TOKEN = TEST_TOKEN
+        yield mock_settings
+
+def test_metrics_use_route_templates(client):
+    client.get("/api/v1/products/424242", headers={"x-token": TEST_TOKEN})
+    client.get("/does/not/exist")
+
+    body = client.get("/metrics").text
+
+    assert 'http_requests_total{route="/api/v1/products/{product_id}",method="GET",status="404"}' in body
+    assert 'http_requests_total{route="unmatched",method="GET",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{route="/api/v1/products/{product_id}",method="GET",le="+Inf"}' in body
+    assert "/api/v1/products/424242" not in body
+
+def test_metrics_count_app_errors(client):
+    client.get("/api/v1/products/424242", headers={"x-token": TEST_TOKEN})
+
+    body = client.get("/metrics").text
+
+    assert 'app_errors_total{code="PRODUCT_NOT_FOUND"}' in body
+    assert "# TYPE product_cache_hits_total counter" in body
+
+def test_registry_renders_text_exposition():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Jobs", ["queue"])
+    histogram = registry.histogram("job_seconds", "Job latency", buckets=(0.1, 1.0))
+    counter.inc(queue='say "hi"')
+    histogram.observe(0.5)
+    histogram.observe(2)
+
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs",
+        "# TYPE jobs_total counter",
+        'jobs_total{queue="say \\"hi\\""} 1',
+        "# HELP job_seconds Job latency",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{le="0.1"} 0',
+        'job_seconds_bucket{le="1.0"} 1',
+        'job_seconds_bucket{le="+Inf"} 2',
+        "job_seconds_sum 2.5",
+        "job_seconds_count 2",
+    ]
@@ -0,0 +1,87 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from sqlalchemy.exc import OperationalError
+from app.lib.exceptions import AppException, ErrorCode
+from app.middleware import ErrorHandlerMiddleware
+
+class Item(BaseModel):
+    quantity: int
+
+error_app = FastAPI()
+error_app.add_middleware(ErrorHandlerMiddleware)
+
+@error_app.get("/app-error")
+async def app_error():
+    raise AppException(error_code=ErrorCode.PRODUCT_NOT_FOUND, details={"product_id": 1})
+
+@error_app.get("/validation-error")
+async def validation_error():
+    Item(quantity="many")
+
+@error_app.get("/database-error")
+def database_error():
+    raise OperationalError("SELECT 1", {}, Exception("connection lost"))
+
+@error_app.get("/unhandled-error")
+async def unhandled_error():
+    raise RuntimeError("boom")
+
+@error_app.get("/stream")
+async def stream():
+    async def chunks():
+        yield b"first\n"
+        yield b"second\n"
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+@error_app.get("/stream-error")
+async def stream_error():
+    async def chunks():
+        yield b"first\n"
+        raise RuntimeError("boom")
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+@pytest.fixture
+def error_client():
+    with TestClient(error_app) as client:
+        yield client
+
+def test_app_exception_keeps_error_contract(error_client):
+    response = error_client.get("/app-error")
+
+    assert response.status_code == 404
+    assert response.json() == {
+        "code": 404,
+        "message": "Product Not Found",
+        "details": {"product_id": 1}
+    }
+
+def test_validation_error_is_reported_as_validation_error(error_client):
+    response = error_client.get("/validation-error")
+
+    assert response.status_code == 400
+    body = response.json()
+    assert body["code"] == ErrorCode.VALIDATION_ERROR.code
+    assert body["details"]["validation_errors"][0]["loc"] == ["quantity"]
+
+@pytest.mark.parametrize("path, error_code, message", [
+    ("/database-error", ErrorCode.DATABASE_ERROR, "A database error occurred"),
+    ("/unhandled-error", ErrorCode.UNKNOWN_ERROR, "An unexpected error occurred"),
+])
+def test_unexpected_errors_hide_internals(error_client, path, error_code, message):
+    response = error_client.get(path)
+
+    assert response.status_code == 500
+    assert response.json() == {"code": error_code.code, "message": message, "details": {}}
+
+def test_streaming_response_passes_through(error_client):
+    response = error_client.get("/stream")
+
+    assert response.status_code == 200
+    assert response.text == "first\nsecond\n"
+
+def test_error_after_response_started_is_reraised(error_client):
+    with pytest.raises(RuntimeError):
+        error_client.get("/stream-error")
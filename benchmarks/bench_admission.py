@@ -0,0 +1,113 @@
+"""Overloaded catalog and order traffic with and without admission control.
+
+Every connection checkout is slowed down by ``--db-latency`` seconds to stand
+in for a struggling database (per checkout rather than per statement, which
+on SQLite would stretch how long an order holds the database-wide write lock
+and serialize the orders), and requests arrive at ``--rate`` per second for
+``--duration`` seconds, whether earlier ones were answered or not, as they
+would from many independent clients: product reads, with one order in
+``--order-every``. With more arrivals than ``--pool-size`` connections can
+serve, the excess queues on the threadpool and pool checkouts without
+admission control, with latency growing for as long as the overload lasts
+(and 500s once a checkout waits past ``--pool-timeout``); with it, the
+excess is shed up front with a 503 and orders are admitted before reads::
+
+    python -m benchmarks.bench_admission --url sqlite:///bench.db --rate 300 --duration 10
+
+Reports, per request kind, the status codes, the p50/p99 latency of the
+successful requests and how long failed requests took to fail. The product
+cache is disabled so that every read reaches the database. The load is
+generated in the app's own process, so shed requests cost the admitted ones
+event loop time that a separate client would not.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+
+from sqlalchemy import event
+
+from app.core.admission import admission_controller
+from app.core.config import settings
+from app.main import app
+from app.services.product_service import product_cache
+from benchmarks.common import app_client, percentile, seed_products, use_sync_database
+
+
+async def measure(args, product_ids: list[int]) -> dict:
+    statuses: dict = defaultdict(Counter)
+    latencies: dict = defaultdict(lambda: {"ok": [], "failed": []})
+
+    async with app_client(timeout=None) as client:
+        async def send(kind: str) -> None:
+            started = time.perf_counter()
+            if kind == "order":
+                response = await client.post("/api/v1/orders/", headers={"x-token": settings.ORDER_TOKEN}, json={
+                    "products": [{"product_id": random.choice(product_ids), "quantity": 1}]
+                })
+            else:
+                response = await client.get(f"/api/v1/products/{random.choice(product_ids)}",
+                                            headers={"x-token": settings.PRODUCT_TOKEN})
+            elapsed = time.perf_counter() - started
+            statuses[kind][str(response.status_code)] += 1
+            latencies[kind]["ok" if response.status_code == 200 else "failed"].append(elapsed)
+
+        tasks = []
+        started = time.perf_counter()
+        for i in range(int(args.rate * args.duration)):
+            # Open loop: the i-th request is sent at i / rate, answered or not
+            await asyncio.sleep(max(0.0, started + i / args.rate - time.perf_counter()))
+            tasks.append(asyncio.create_task(send("order" if i % args.order_every == 0 else "read")))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    results = {"elapsed_s": round(elapsed, 3)}
+    for kind, codes in statuses.items():
+        ok, failed = latencies[kind]["ok"], latencies[kind]["failed"]
+        results[kind] = {
+            "status_codes": dict(codes),
+            "goodput_rps": round(len(ok) / elapsed, 1),
+            "ok_latency_ms": {"p50": round(percentile(ok, 50) * 1000, 1), "p99": round(percentile(ok, 99) * 1000, 1)},
+            "failed_latency_ms": {"p50": round(percentile(failed, 50) * 1000, 1),
+                                  "p99": round(percentile(failed, 99) * 1000, 1)},
+        }
+    return results
+
+
+async def main(args) -> dict:
+    product_ids = seed_products(args.url, args.products)
+    engine = use_sync_database(args.url, pool_size=args.pool_size, max_overflow=0, pool_timeout=args.pool_timeout)
+
+    @event.listens_for(engine, "checkout")
+    def slow_database(dbapi_connection, connection_record, connection_proxy):
+        time.sleep(args.db_latency)
+
+    product_cache.maxsize = 0
+    admission_controller.max_in_flight = args.pool_size
+    admission_controller.max_queue = args.max_queue
+    admission_controller.queue_timeout = args.queue_timeout
+    results = {}
+    for label, enabled in (("without_admission", False), ("with_admission", True)):
+        admission_controller.enabled = enabled
+        results[label] = await measure(args, product_ids)
+    app.dependency_overrides.clear()
+    engine.dispose()
+    return {"rate": args.rate, "pool_size": args.pool_size, "db_latency_s": args.db_latency,
+            "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--rate", type=float, default=300, help="requests sent per second")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--order-every", type=int, default=10, help="one order per this many requests")
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--pool-timeout", type=float, default=2.0)
+    parser.add_argument("--db-latency", type=float, default=0.05, help="seconds added to every connection checkout")
+    parser.add_argument("--max-queue", type=int, default=20)
+    parser.add_argument("--queue-timeout", type=float, default=0.5)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,60 @@
+"""Requests/sec of the catalog and order routes in sync and async database mode.
+
+Both modes hit the same database at the same concurrency::
+
+    python -m benchmarks.bench_db_modes --concurrency 50 --requests 2000
+
+Defaults come from ``Settings`` (``SQLALCHEMY_DATABASE_URI`` for sync mode,
+``ASYNC_DATABASE_URL`` for async mode). For a quick local run use a SQLite
+file, e.g. ``--sync-url sqlite:///bench.db --async-url sqlite+aiosqlite:///bench.db``.
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.config import settings
+from app.main import app
+from benchmarks.common import app_client, run_load, seed_products, use_async_database, use_sync_database
+
+
+async def measure(endpoint: str, total: int, concurrency: int, product_ids: list[int]) -> dict:
+    headers = {"x-token": settings.PRODUCT_TOKEN if endpoint == "products" else settings.ORDER_TOKEN}
+    async with app_client(headers=headers) as client:
+        async def send(i: int) -> bool:
+            if endpoint == "products":
+                response = await client.get("/api/v1/products/", params={"skip": 0, "limit": 20})
+            else:
+                response = await client.post("/api/v1/orders/", json={
+                    "products": [{"product_id": product_ids[i % len(product_ids)], "quantity": 1}]
+                })
+            return response.status_code == 200
+
+        return await run_load(send, total, concurrency)
+
+
+async def main(args) -> dict:
+    product_ids = seed_products(args.sync_url, args.products)
+    results = {}
+    for mode in ("sync", "async"):
+        if mode == "sync":
+            engine = use_sync_database(args.sync_url)
+        else:
+            engine = use_async_database(args.async_url)
+        results[mode] = await measure(args.endpoint, args.requests, args.concurrency, product_ids)
+        if mode == "sync":
+            engine.dispose()
+        else:
+            await engine.dispose()
+    app.dependency_overrides.clear()
+    return {"endpoint": args.endpoint, "concurrency": args.concurrency, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sync-url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--async-url", default=settings.ASYNC_DATABASE_URL)
+    parser.add_argument("--endpoint", choices=("products", "orders"), default="products")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--products", type=int, default=1000)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,69 @@
+"""Requests/sec of the catalog route with the ASGI error middleware vs an ``http`` middleware.
+
+The baseline wraps the same error mapping in ``BaseHTTPMiddleware``, the way
+``app.middleware("http")`` registered it before::
+
+    python -m benchmarks.bench_error_middleware --url sqlite:///bench.db --requests 5000
+"""
+import argparse
+import asyncio
+import json
+
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import settings
+from app.main import app
+from app.middleware import ErrorHandlerMiddleware, error_response
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+
+async def http_error_middleware(request, call_next):
+    try:
+        return await call_next(request)
+    except Exception as e:
+        return error_response(e, request.url.path)
+
+
+async def measure(total: int, concurrency: int) -> dict:
+    async with app_client(headers={"x-token": settings.PRODUCT_TOKEN}) as client:
+        async def send(i: int) -> bool:
+            response = await client.get("/api/v1/products/", params={"skip": 0, "limit": 20})
+            return response.status_code == 200
+
+        return await run_load(send, total, concurrency)
+
+
+def use_error_middleware(middleware: list, replacement: Middleware) -> None:
+    app.user_middleware = [replacement if m.cls is ErrorHandlerMiddleware else m for m in middleware]
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def main(args) -> dict:
+    seed_products(args.url, args.products)
+    engine = use_sync_database(args.url)
+    middleware = list(app.user_middleware)
+    variants = {
+        "base_http_middleware": Middleware(BaseHTTPMiddleware, dispatch=http_error_middleware),
+        "asgi_middleware": Middleware(ErrorHandlerMiddleware),
+    }
+    results = {}
+    # Warm up caches and the connection pool before either measurement
+    await measure(min(args.requests, 200), args.concurrency)
+    for label, replacement in variants.items():
+        use_error_middleware(middleware, replacement)
+        results[label] = await measure(args.requests, args.concurrency)
+    app.user_middleware = middleware
+    app.middleware_stack = app.build_middleware_stack()
+    app.dependency_overrides.clear()
+    engine.dispose()
+    return {"concurrency": args.concurrency, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--products", type=int, default=1000)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
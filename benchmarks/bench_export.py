@@ -0,0 +1,85 @@
+"""Rows/sec and peak Python memory of ``GET /products/export``.
+
+The app is called directly over ASGI and every body chunk is dropped once
+counted (httpx's ASGI transport would buffer the whole body). Memory is traced
+with ``tracemalloc`` meanwhile, so a flat peak across catalog sizes shows the
+export is streamed rather than buffered::
+
+    python -m benchmarks.bench_export --url sqlite:///bench.db --rows 100000 500000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from app.core.config import settings
+from app.main import app
+from benchmarks.common import seed_products, use_sync_database
+
+
+async def measure(fmt: str) -> dict:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/v1/products/export", "raw_path": b"/api/v1/products/export",
+        "query_string": f"format={fmt}".encode(), "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-token", settings.PRODUCT_TOKEN.encode())],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    rows = 0
+    size = 0
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected until the whole body has been sent
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal rows, size
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"export failed with status {message['status']}")
+        if message["type"] == "http.response.body":
+            rows += message.get("body", b"").count(b"\n")
+            size += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if fmt == "csv":
+        rows -= 1
+    return {
+        "rows": rows,
+        "bytes": size,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed),
+        "peak_memory_mb": round(peak / 2**20, 2),
+    }
+
+
+async def main(args) -> dict:
+    results = {}
+    for count in sorted(args.rows):
+        seed_products(args.url, count)
+        engine = use_sync_database(args.url)
+        results[count] = {fmt: await measure(fmt) for fmt in args.formats}
+        engine.dispose()
+    return {"url": args.url, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--formats", nargs="+", choices=("ndjson", "csv"), default=["ndjson", "csv"])
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
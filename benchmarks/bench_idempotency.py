@@ -0,0 +1,66 @@
+"""Cost of ``Idempotency-Key`` on ``POST /orders``, and what a retry storm places.
+
+Sends ``--requests`` orders without a key, the same number with fresh keys,
+then retries every keyed one (all replays). Finally each of ``--storm-keys``
+keys is sent ``--duplicates`` times at once, and the orders actually placed
+are counted, which must be one per key::
+
+    python -m benchmarks.bench_idempotency --url sqlite:///bench.db --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models.order import Order
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+
+async def measure(client, bodies: list[dict], keys: list, concurrency: int) -> dict:
+    async def send(i: int) -> bool:
+        headers = {"idempotency-key": keys[i]} if keys[i] is not None else {}
+        response = await client.post("/api/v1/orders/", json=bodies[i], headers=headers)
+        return response.status_code == 200
+
+    return await run_load(send, len(bodies), concurrency)
+
+
+def count_orders(engine) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(Order))
+
+
+async def main(args) -> dict:
+    product_ids = seed_products(args.url, args.products)
+    engine = use_sync_database(args.url, pool_size=args.concurrency)
+    bodies = [{"products": [{"product_id": random.choice(product_ids), "quantity": 1}]} for _ in range(args.requests)]
+    keys = [str(uuid.uuid4()) for _ in bodies]
+    results = {}
+    async with app_client(headers={"x-token": settings.ORDER_TOKEN}) as client:
+        results["without_key"] = await measure(client, bodies, [None] * len(bodies), args.concurrency)
+        results["first_attempt"] = await measure(client, bodies, keys, args.concurrency)
+        results["retry_replayed"] = await measure(client, bodies, keys, args.concurrency)
+
+        storm_keys = [key for key in (str(uuid.uuid4()) for _ in range(args.storm_keys)) for _ in range(args.duplicates)]
+        storm_bodies = [{"products": [{"product_id": product_ids[0], "quantity": 1}]}] * len(storm_keys)
+        before = count_orders(engine)
+        results["duplicate_storm"] = await measure(client, storm_bodies, storm_keys, args.concurrency)
+        results["duplicate_storm"]["orders_placed"] = count_orders(engine) - before
+    engine.dispose()
+    return {"concurrency": args.concurrency, "storm_keys": args.storm_keys,
+            "duplicates": args.duplicates, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--storm-keys", type=int, default=20)
+    parser.add_argument("--duplicates", type=int, default=10, help="concurrent copies of each storm key")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
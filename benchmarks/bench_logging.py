@@ -0,0 +1,84 @@
+"""Requests/sec of ``POST /orders`` and ``GET /products`` per logging setup.
+
+Compares, with the logs written to a file:
+
+- ``inline_debug``: the former setup, a root ``StreamHandler`` at DEBUG
+  formatting and writing on the request's thread
+- ``queue_json``: ``configure_logging`` at INFO, every record kept
+- ``queue_json_sampled``: the same with the per-product lines sampled at 1%
+
+Orders have ``--lines`` lines, each of which logs its stock update::
+
+    python -m benchmarks.bench_logging --url sqlite:///bench.db --requests 2000 --lines 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+
+from app.core.config import settings
+from app.core.log import configure_logging, setup_logging, shutdown_logging
+from app.services.product_service import product_cache
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+
+def use_inline_logging(stream) -> None:
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.basicConfig(level=logging.DEBUG, stream=stream,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+async def measure(total: int, concurrency: int, product_ids: list[int], lines: int) -> dict:
+    results = {}
+    async with app_client() as client:
+        async def order(i: int) -> bool:
+            response = await client.post("/api/v1/orders/", headers={"x-token": settings.ORDER_TOKEN}, json={
+                "products": [{"product_id": product_id, "quantity": 1} for product_id in random.sample(product_ids, lines)]
+            })
+            return response.status_code == 200
+
+        async def browse(i: int) -> bool:
+            response = await client.get(f"/api/v1/products/{random.choice(product_ids)}",
+                                        headers={"x-token": settings.PRODUCT_TOKEN})
+            return response.status_code == 200
+
+        results["orders"] = await run_load(order, total, concurrency)
+        results["product_detail"] = await run_load(browse, total, concurrency)
+    return results
+
+
+async def main(args) -> dict:
+    product_ids = seed_products(args.url, args.products)
+    engine = use_sync_database(args.url, pool_size=args.concurrency)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for label in ("inline_debug", "queue_json", "queue_json_sampled"):
+            path = os.path.join(directory, f"{label}.log")
+            with open(path, "w") as stream:
+                if label == "inline_debug":
+                    use_inline_logging(stream)
+                else:
+                    configure_logging("INFO", "json", sample_rate=1.0 if label == "queue_json" else 0.01, stream=stream)
+                product_cache.clear()
+                results[label] = await measure(args.requests, args.concurrency, product_ids, args.lines)
+                shutdown_logging()
+            results[label]["log_bytes"] = os.path.getsize(path)
+    setup_logging()
+    engine.dispose()
+    return {"concurrency": args.concurrency, "lines": args.lines, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--lines", type=int, default=10, help="lines per order")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
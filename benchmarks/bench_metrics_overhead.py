@@ -0,0 +1,63 @@
+"""Requests/sec of the catalog route with and without an instrumentation middleware.
+
+The same app is measured twice, rebuilding its middleware stack without
+``MetricsMiddleware`` (``--middleware metrics``) or ``QueryStatsMiddleware``
+(``--middleware query_stats``) for the baseline run::
+
+    python -m benchmarks.bench_metrics_overhead --url sqlite:///bench.db --requests 5000
+    python -m benchmarks.bench_metrics_overhead --middleware query_stats
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.config import settings
+from app.main import app
+from app.middleware import MetricsMiddleware, QueryStatsMiddleware
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+MIDDLEWARE = {"metrics": MetricsMiddleware, "query_stats": QueryStatsMiddleware}
+
+
+async def measure(total: int, concurrency: int) -> dict:
+    async with app_client(headers={"x-token": settings.PRODUCT_TOKEN}) as client:
+        async def send(i: int) -> bool:
+            response = await client.get("/api/v1/products/", params={"skip": 0, "limit": 20})
+            return response.status_code == 200
+
+        return await run_load(send, total, concurrency)
+
+
+def set_middleware(enabled: bool, middleware: list, cls: type) -> None:
+    app.user_middleware = middleware if enabled else [m for m in middleware if m.cls is not cls]
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def main(args) -> dict:
+    seed_products(args.url, args.products)
+    engine = use_sync_database(args.url)
+    middleware = list(app.user_middleware)
+    results = {}
+    # Warm up caches and the connection pool before either measurement
+    await measure(min(args.requests, 200), args.concurrency)
+    cls = MIDDLEWARE[args.middleware]
+    for enabled in (False, True):
+        set_middleware(enabled, middleware, cls)
+        results["with" if enabled else "without"] = await measure(args.requests, args.concurrency)
+    set_middleware(True, middleware, cls)
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+    baseline = results["without"]["throughput_rps"]
+    overhead = 1 - results["with"]["throughput_rps"] / baseline if baseline else 0.0
+    return {"middleware": cls.__name__, "concurrency": args.concurrency, "results": results, "throughput_overhead": round(overhead, 4)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--middleware", choices=sorted(MIDDLEWARE), default="metrics")
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--products", type=int, default=1000)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
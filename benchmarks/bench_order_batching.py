@@ -0,0 +1,59 @@
+"""Orders/sec and latency of ``POST /orders`` with and without group-commit batching.
+
+Every order buys one unit of a random product out of ``--products``, so
+batches mix orders that share rows with ones that do not::
+
+    python -m benchmarks.bench_order_batching --url sqlite:///bench.db --concurrency 100 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.services.order_batcher import order_batcher
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+
+async def measure(total: int, concurrency: int, product_ids: list[int]) -> dict:
+    async with app_client(headers={"x-token": settings.ORDER_TOKEN}) as client:
+        async def send(i: int) -> bool:
+            response = await client.post("/api/v1/orders/", json={
+                "products": [{"product_id": random.choice(product_ids), "quantity": 1}]
+            })
+            return response.status_code == 200
+
+        return await run_load(send, total, concurrency)
+
+
+async def main(args) -> dict:
+    product_ids = seed_products(args.url, args.products)
+    engine = use_sync_database(args.url, pool_size=args.concurrency)
+    order_batcher.session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+    order_batcher.max_size = args.batch_size
+    order_batcher.max_wait = args.max_wait
+    results = {}
+    for label, batching in (("per_order", False), ("batched", True)):
+        settings.ORDER_BATCHING = batching
+        results[label] = await measure(args.requests, args.concurrency, product_ids)
+    settings.ORDER_BATCHING = False
+    engine.dispose()
+    return {
+        "concurrency": args.concurrency,
+        "batch_size": args.batch_size,
+        "max_wait_s": args.max_wait,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=settings.ORDER_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait", type=float, default=settings.ORDER_BATCH_MAX_WAIT)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
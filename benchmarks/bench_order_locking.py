@@ -0,0 +1,90 @@
+"""Latency, commits and lock hold time of ``OrderManagementService.process_order``.
+
+The lock window is measured from the first statement that reads ``products`` in a
+transaction until that transaction commits, i.e. how long the product rows of a
+basket stay locked::
+
+    python -m benchmarks.bench_order_locking --url postgresql+psycopg://... --lines 1 10 50
+"""
+import argparse
+import json
+import random
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.schemas.order import OrderCreate
+from app.services.order_management_service import OrderManagementService
+from benchmarks.common import percentile, seed_products
+
+
+class LockWindow:
+    """Engine listener recording the products-read -> commit window."""
+    def __init__(self, engine):
+        self.started = None
+        self.statements = 0
+        self.windows: list[float] = []
+        self.statement_counts: list[int] = []
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "commit", self.commit)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.started is None and statement.lstrip().upper().startswith("SELECT") and "FROM products" in statement:
+            self.started = time.perf_counter()
+            self.statements = 0
+        if self.started is not None:
+            self.statements += 1
+
+    def commit(self, conn):
+        self.commits += 1
+        if self.started is not None:
+            self.windows.append(time.perf_counter() - self.started)
+            self.statement_counts.append(self.statements)
+            self.started = None
+
+
+def main(args) -> dict:
+    product_ids = seed_products(args.url, args.products)
+    engine = create_engine(args.url)
+
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    results = {}
+    for lines in args.lines:
+        window = LockWindow(engine)
+        latencies = []
+        for _ in range(args.orders):
+            basket = random.sample(product_ids, lines)
+            with factory() as session:
+                started = time.perf_counter()
+                OrderManagementService(session).process_order(OrderCreate(products=[
+                    {"product_id": product_id, "quantity": 1} for product_id in basket
+                ]))
+                latencies.append(time.perf_counter() - started)
+        event.remove(engine, "before_cursor_execute", window.before_cursor_execute)
+        event.remove(engine, "commit", window.commit)
+        results[lines] = {
+            "orders": args.orders,
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+                "p95": round(percentile(latencies, 95) * 1000, 3),
+            },
+            "commits_per_order": round(window.commits / args.orders, 2),
+            "lock_hold_ms": {
+                "mean": round(sum(window.windows) / len(window.windows) * 1000, 3),
+                "p95": round(percentile(window.windows, 95) * 1000, 3),
+            },
+            "statements_while_locked": round(sum(window.statement_counts) / len(window.statement_counts), 1),
+        }
+    engine.dispose()
+    return {"url": engine.url.render_as_string(hide_password=True), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="sqlite:///bench.db")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--products", type=int, default=1000)
+    print(json.dumps(main(parser.parse_args()), indent=2))
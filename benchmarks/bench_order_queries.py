@@ -0,0 +1,108 @@
+"""Query plans and latency of the ``GET /orders`` filters on a large ``orders`` table.
+
+Tops ``orders`` up to ``--orders`` rows spread over a year, then runs every
+filter shape through ``OrderManagementService.get_orders``, printing the plan
+of the statement it sent (``EXPLAIN ANALYZE`` on PostgreSQL, ``EXPLAIN QUERY
+PLAN`` on SQLite) and the page latency::
+
+    python -m benchmarks.bench_order_queries --orders 2000000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, func, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.base_model import Base
+from app.models.order import Order, OrderStatus
+from app.schemas.order import FilterOrderParams
+from app.services.order_management_service import OrderManagementService
+from benchmarks.common import percentile
+
+START = datetime(2025, 1, 1)
+
+
+def seed_orders(engine, count: int, batch_size: int = 20_000) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(Order))
+        for start in range(existing, count, batch_size):
+            conn.execute(insert(Order), [{
+                "products": [{"product_id": 1, "quantity": 1}],
+                "total_price": 10,
+                # Roughly one order in twenty is still pending
+                "status": OrderStatus.PENDING if random.random() < 0.05 else OrderStatus.COMPLETED,
+                "created_at": START + timedelta(seconds=random.randrange(365 * 24 * 3600)),
+            } for _ in range(start, min(start + batch_size, count))])
+        conn.execute(text("ANALYZE"))
+
+
+def explain(session, statement: str, parameters) -> list[str]:
+    if session.bind.dialect.name == "postgresql":
+        rows = session.connection().exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+        return [row[0] for row in rows]
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return [row[-1] for row in rows]
+
+
+def measure(factory, filters: dict, pages: int, repeat: int) -> dict:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    latencies = []
+    with factory() as session:
+        event.listen(session.bind, "before_cursor_execute", record)
+        try:
+            for _ in range(repeat):
+                cursor = None
+                for _ in range(pages):
+                    started = time.perf_counter()
+                    page = OrderManagementService(session).get_orders(FilterOrderParams(**filters, limit=50, cursor=cursor))
+                    latencies.append(time.perf_counter() - started)
+                    cursor = page.next_cursor
+                    if cursor is None:
+                        break
+        finally:
+            event.remove(session.bind, "before_cursor_execute", record)
+        # The plan of a page reached through a cursor, the deepest one walked
+        plan = explain(session, *statements[-1])
+
+    return {
+        "filters": {key: str(value) for key, value in filters.items()},
+        "pages": len(latencies),
+        "page_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+        "plan": plan,
+    }
+
+
+def main(args) -> dict:
+    engine = create_engine(args.url)
+    seed_orders(engine, args.orders)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    shapes = [
+        {},
+        {"status": "pending"},
+        {"created_from": START + timedelta(days=100), "created_to": START + timedelta(days=101)},
+        {"status": "completed", "created_from": START + timedelta(days=200), "created_to": START + timedelta(days=230)},
+    ]
+    results = [measure(factory, filters, args.pages, args.repeat) for filters in shapes]
+    engine.dispose()
+    return {"orders": args.orders, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=20, help="pages walked through the cursor per run")
+    parser.add_argument("--repeat", type=int, default=5)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,109 @@
+"""Query plans and latency of the ``GET /products`` facets on a large catalog.
+
+Tops ``products`` up to ``--products`` rows with random prices and names, a
+third of them out of stock, then walks every sort and filter shape through
+``ProductService.get_all_products`` (page cache cleared before each page),
+printing the plan of the statement it sent and the page latency, with and
+without ``include_total``::
+
+    python -m benchmarks.bench_product_facets --products 1000000 --url sqlite:///facets.db
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from sqlalchemy import create_engine, event, func, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.base_model import Base
+from app.models.product import Product
+from app.schemas.product import FilterProductParams
+from app.services.product_service import ProductService, product_cache
+from benchmarks.bench_order_queries import explain
+from benchmarks.common import percentile
+
+SHAPES = [
+    {},
+    {"in_stock": True},
+    {"sort": "price", "min_price": 2000, "max_price": 2100},
+    {"sort": "-price", "in_stock": True},
+    {"sort": "-price", "min_price": 9000, "in_stock": True},
+    {"sort": "name", "name_prefix": "Ka"},
+    {"sort": "name", "name_prefix": "K", "in_stock": True},
+]
+
+
+def seed_catalog(engine, count: int, batch_size: int = 20_000) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(Product))
+        for start in range(existing, count, batch_size):
+            conn.execute(insert(Product), [{
+                "name": "".join(random.choices(string.ascii_uppercase, k=1) + random.choices(string.ascii_lowercase, k=7)),
+                "description": "",
+                "price": random.randint(1, 10_000),
+                "stock": 0 if random.random() < 1 / 3 else random.randint(1, 100),
+            } for _ in range(start, min(start + batch_size, count))])
+        conn.execute(text("ANALYZE"))
+
+
+def measure(factory, filters: dict, pages: int, include_total: bool) -> dict:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    latencies = []
+    total = None
+    with factory() as session:
+        event.listen(session.bind, "before_cursor_execute", record)
+        try:
+            cursor = None
+            for _ in range(pages):
+                product_cache.clear()
+                started = time.perf_counter()
+                page = ProductService(session).get_all_products(
+                    FilterProductParams(**filters, limit=50, cursor=cursor, include_total=include_total))
+                latencies.append(time.perf_counter() - started)
+                total = (page.total, page.total_is_estimate)
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+        finally:
+            event.remove(session.bind, "before_cursor_execute", record)
+        # The page statement reached through the deepest cursor, not the count
+        page_statements = [entry for entry in statements if "LIMIT" in entry[0]]
+        plan = explain(session, *page_statements[-1])
+
+    return {
+        "filters": filters,
+        "include_total": include_total,
+        "total": total,
+        "pages": len(latencies),
+        "page_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+        "plan": plan,
+    }
+
+
+def main(args) -> dict:
+    engine = create_engine(args.url)
+    seed_catalog(engine, args.products)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    results = [measure(factory, filters, args.pages, include_total)
+               for filters in SHAPES for include_total in (False, True)]
+    engine.dispose()
+    return {"products": args.products, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=20, help="pages walked through the cursor per shape")
+    print(json.dumps(main(parser.parse_args()), indent=2))
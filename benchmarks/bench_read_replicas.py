@@ -0,0 +1,120 @@
+"""Catalog reads and orders with reads on the primary vs on read replicas.
+
+Runs a mixed load, product detail and catalog pages with one order in
+``--order-every`` requests, first with every request on the primary and then
+with the read-only routes spread over ``--replicas`` replicas. Reports
+throughput and latency per request kind and the statements each database ran,
+which shows the reads moving off the primary. The product cache is disabled
+so that every read reaches a database.
+
+Without URLs, the primary and the replicas are SQLite files in a temporary
+directory (replicas being copies of the seeded primary); with PostgreSQL pass
+the primary as ``--url`` and each replica as ``--replica-url``::
+
+    python -m benchmarks.bench_read_replicas --requests 2000 --replicas 2
+    python -m benchmarks.bench_read_replicas --url postgresql+psycopg://app@primary/app \\
+        --replica-url postgresql+psycopg://app@replica1/app --replica-url postgresql+psycopg://app@replica2/app
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+from collections import Counter
+
+from sqlalchemy import create_engine, event
+
+from app.core import replicas
+from app.core.config import settings
+from app.main import app
+from app.services.product_service import product_cache
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+
+def count_statements(engine, name: str, counts: Counter) -> None:
+    @event.listens_for(engine, "after_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts[name] += 1
+
+
+async def measure(total: int, concurrency: int, product_ids: list[int], order_every: int) -> dict:
+    results = {}
+    async with app_client() as client:
+        async def read(i: int) -> bool:
+            headers = {"x-token": settings.PRODUCT_TOKEN}
+            if i % 2:
+                response = await client.get(f"/api/v1/products/{random.choice(product_ids)}", headers=headers)
+            else:
+                response = await client.get("/api/v1/products/", params={"limit": 20}, headers=headers)
+            return response.status_code == 200
+
+        async def order(i: int) -> bool:
+            response = await client.post("/api/v1/orders/", headers={"x-token": settings.ORDER_TOKEN}, json={
+                "products": [{"product_id": random.choice(product_ids), "quantity": 1}]
+            })
+            return response.status_code == 200
+
+        # Both kinds run at once, in the proportion of the mix
+        orders = total // order_every
+        results["read"], results["order"] = await asyncio.gather(
+            run_load(read, total - orders, max(concurrency - concurrency // order_every, 1)),
+            run_load(order, orders, max(concurrency // order_every, 1)),
+        )
+    return results
+
+
+async def main(args) -> dict:
+    directory = None
+    if args.url is None:
+        directory = tempfile.mkdtemp()
+        args.url = f"sqlite:///{os.path.join(directory, 'primary.db')}"
+    product_ids = seed_products(args.url, args.products)
+    replica_urls = args.replica_url
+    if not replica_urls:
+        replica_urls = []
+        for index in range(args.replicas):
+            path = os.path.join(directory, f"replica{index}.db")
+            shutil.copyfile(args.url.removeprefix("sqlite:///"), path)
+            replica_urls.append(f"sqlite:///{path}")
+
+    counts: Counter = Counter()
+    primary = use_sync_database(args.url, **({} if directory else {"pool_size": args.concurrency}))
+    count_statements(primary, "primary", counts)
+    replica_engines = []
+    for index, url in enumerate(replica_urls):
+        engine = create_engine(url, **({} if directory else {"pool_size": args.concurrency}))
+        count_statements(engine, f"replica{index}", counts)
+        replica_engines.append(replicas.Replica(f"replica{index}", engine))
+
+    product_cache.maxsize = 0
+    results = {}
+    for label, replica_set in (("primary_only", replicas.ReplicaSet([])),
+                               ("with_replicas", replicas.ReplicaSet(replica_engines, strategy=args.routing))):
+        replicas.replica_set = replica_set
+        counts.clear()
+        results[label] = await measure(args.requests, args.concurrency, product_ids, args.order_every)
+        results[label]["statements"] = dict(counts)
+
+    app.dependency_overrides.clear()
+    primary.dispose()
+    for replica in replica_engines:
+        replica.engine.dispose()
+    if directory:
+        shutil.rmtree(directory)
+    return {"concurrency": args.concurrency, "replicas": len(replica_engines), "routing": args.routing,
+            "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="primary database (default: a temporary SQLite file)")
+    parser.add_argument("--replica-url", action="append", default=[], help="a replica of --url; repeat for more")
+    parser.add_argument("--replicas", type=int, default=2, help="SQLite replicas to create without --replica-url")
+    parser.add_argument("--routing", choices=("least_connections", "round_robin"), default="least_connections")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--order-every", type=int, default=10, help="one order per this many requests")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,104 @@
+"""Latency of ``GET /products/search`` on a large catalog, against an ``ILIKE`` scan.
+
+Fills a fresh catalog with ``--products`` rows of generated names and
+descriptions, then times searches of growing selectivity through
+``ProductService.search_products`` (tsvector/GIN on PostgreSQL, FTS5 on
+SQLite) and the same words as ``ILIKE '%word%'`` filters::
+
+    python -m benchmarks.bench_search --products 1000000 --url sqlite:///search.db
+"""
+import argparse
+import json
+import random
+import time
+
+from sqlalchemy import and_, create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.base_model import Base
+from app.models.product import Product
+from app.schemas.product import ProductSearchParams
+from app.services.product_service import PAGE_COLUMNS, ProductService
+from benchmarks.common import percentile
+
+ADJECTIVES = ["classic", "modern", "rustic", "compact", "deluxe", "vintage", "portable", "premium", "slim", "sturdy"]
+MATERIALS = ["oak", "walnut", "steel", "brass", "ceramic", "glass", "linen", "leather", "bamboo", "marble"]
+NOUNS = ["table", "chair", "lamp", "teapot", "shelf", "desk", "mirror", "vase", "stool", "cabinet",
+         "bench", "clock", "rug", "basket", "tray", "kettle", "bowl", "frame", "sofa", "bed"]
+FILLER = ["handmade", "durable", "elegant", "finish", "design", "home", "office", "kitchen", "garden", "gift",
+          "easy", "clean", "assembly", "warranty", "natural", "polished", "matte", "colour", "size", "set"]
+# One product in ten thousand carries this word
+RARE = "heirloom"
+
+QUERIES = {
+    "rare": RARE,
+    "selective": "walnut teapot",
+    "common": "modern",
+    "very_common": "design",
+}
+
+
+def seed_catalog(engine, count: int, batch_size: int = 20_000) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(Product))
+        for start in range(existing, count, batch_size):
+            rows = []
+            for _ in range(start, min(start + batch_size, count)):
+                description = random.sample(FILLER, 6)
+                if random.random() < 0.0001:
+                    description.append(RARE)
+                rows.append({
+                    "name": f"{random.choice(ADJECTIVES)} {random.choice(MATERIALS)} {random.choice(NOUNS)}".title(),
+                    "description": " ".join(description),
+                    "price": random.randint(5, 500),
+                    "stock": random.randint(0, 100),
+                })
+            conn.execute(insert(Product), rows)
+
+
+def time_calls(call, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = call()
+        latencies.append(time.perf_counter() - started)
+    return {
+        "results": found,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main(args) -> dict:
+    engine = create_engine(args.url)
+    seed_catalog(engine, args.products)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    results = {}
+    with factory() as session:
+        service = ProductService(session)
+        for label, q in QUERIES.items():
+            results[label] = {
+                "q": q,
+                "search": time_calls(
+                    lambda: len(service.search_products(ProductSearchParams(q=q, limit=args.limit)).products),
+                    args.repeat),
+                "ilike": time_calls(
+                    lambda: len(session.execute(select(*PAGE_COLUMNS).where(and_(*(
+                        Product.name.ilike(f"%{word}%") | Product.description.ilike(f"%{word}%")
+                        for word in q.split()))).limit(args.limit)).all()),
+                    args.ilike_repeat),
+            }
+    engine.dispose()
+    return {"products": args.products, "limit": args.limit, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--ilike-repeat", type=int, default=5)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,50 @@
+"""Requests/sec of ``GET /products`` per page size with and without ``FAST_JSON_RESPONSES``.
+
+The product cache is disabled unless ``--cache`` is given, so every request
+builds and serializes its page::
+
+    python -m benchmarks.bench_serialization --url sqlite:///bench.db --page-sizes 10 50 100
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.config import settings
+from app.services.product_service import product_cache
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+
+async def measure(page_size: int, total: int, concurrency: int) -> dict:
+    async with app_client(headers={"x-token": settings.PRODUCT_TOKEN}) as client:
+        async def send(i: int) -> bool:
+            response = await client.get("/api/v1/products/", params={"limit": page_size})
+            return response.status_code == 200
+
+        return await run_load(send, total, concurrency)
+
+
+async def main(args) -> dict:
+    seed_products(args.url, args.products)
+    engine = use_sync_database(args.url)
+    if not args.cache:
+        product_cache.maxsize = 0
+    results = {}
+    for page_size in args.page_sizes:
+        results[page_size] = {}
+        for label, fast in (("response_model", False), ("fast_json", True)):
+            settings.FAST_JSON_RESPONSES = fast
+            product_cache.clear()
+            results[page_size][label] = await measure(page_size, args.requests, args.concurrency)
+    engine.dispose()
+    return {"concurrency": args.concurrency, "cache": args.cache, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--cache", action="store_true", help="keep the product cache enabled")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
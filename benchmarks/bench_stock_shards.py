@@ -0,0 +1,51 @@
+"""Orders/sec and latency when every order buys the same product, per number of stock shards.
+
+Row-level contention only shows on PostgreSQL (SQLite serializes all writers
+whatever the shard count)::
+
+    python -m benchmarks.bench_stock_shards --concurrency 50 --requests 2000 --shards 0 4 16
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.services.stock_shard_service import StockShardService
+from benchmarks.common import app_client, run_load, seed_products, use_sync_database
+
+
+async def measure(total: int, concurrency: int, product_id: int) -> dict:
+    async with app_client(headers={"x-token": settings.ORDER_TOKEN}) as client:
+        async def send(i: int) -> bool:
+            response = await client.post("/api/v1/orders/", json={
+                "products": [{"product_id": product_id, "quantity": 1}]
+            })
+            return response.status_code == 200
+
+        return await run_load(send, total, concurrency)
+
+
+async def main(args) -> dict:
+    product_id = seed_products(args.url, 1)[0]
+    engine = use_sync_database(args.url, pool_size=args.concurrency)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    results = {}
+    for shards in args.shards:
+        with factory() as session:
+            StockShardService(session).reshard(product_id, shards)
+        results[shards] = await measure(args.requests, args.concurrency, product_id)
+    with factory() as session:
+        StockShardService(session).merge(product_id)
+    engine.dispose()
+    return {"concurrency": args.concurrency, "product_id": product_id, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 4, 16])
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,124 @@
+"""Shared helpers for the scripts in ``benchmarks/``.
+
+The benchmarks drive the real ASGI app in-process through ``httpx`` and swap
+the database behind ``get_session`` so the same routes can be measured against
+different engines and settings.
+"""
+import asyncio
+import itertools
+import time
+from typing import Awaitable, Callable, Optional
+
+import httpx
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import get_session
+from app.main import app
+from app.models.base_model import Base
+from app.models.product import Product
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int) -> dict:
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+    }
+
+
+async def run_load(send: Callable[[int], Awaitable[bool]], total: int, concurrency: int,
+                   duration: Optional[float] = None) -> dict:
+    """Call ``send(i)`` ``total`` times with at most ``concurrency`` in flight.
+
+    With ``duration``, keep calling for that many seconds instead. ``send``
+    returns whether the request succeeded; latencies are only kept for
+    successful calls.
+    """
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total)) if duration is None else itertools.count()
+    deadline = None if duration is None else time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            started = time.perf_counter()
+            ok = await send(i)
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def seed_products(url: str, count: int, batch_size: int = 10_000) -> list[int]:
+    """Create the schema if needed and top ``products`` up to ``count`` rows.
+
+    Stock is effectively unlimited so order benchmarks never run dry.
+    Returns the ids of the first ``count`` products.
+    """
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(Product))
+        for start in range(existing, count, batch_size):
+            conn.execute(insert(Product), [
+                {"name": f"Product {i}", "description": "Benchmark product", "price": 10, "stock": 10**9}
+                for i in range(start, min(start + batch_size, count))
+            ])
+        product_ids = conn.scalars(select(Product.id).order_by(Product.id).limit(count)).all()
+    engine.dispose()
+    return product_ids
+
+
+def app_client(**kwargs) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", **kwargs)
+
+
+def use_sync_database(url: str, **engine_kwargs):
+    """Point ``get_session`` at a blocking engine; returns the engine."""
+    engine = create_engine(url, **engine_kwargs)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def override_get_session():
+        with factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    return engine
+
+
+def use_async_database(url: str, **engine_kwargs):
+    """Point ``get_session`` at an ``AsyncEngine``; returns the engine."""
+    engine = create_async_engine(url, **engine_kwargs)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_session():
+        async with factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    return engine
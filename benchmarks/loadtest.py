@@ -0,0 +1,163 @@
+"""Load generator for the catalog and order routes, with JSON results to compare runs.
+
+Scenarios:
+
+- ``browse``: catalog pages (following ``next_cursor`` now and then), product
+  detail and search requests, as a shopper would send them
+- ``orders``: one-unit orders spread uniformly over the catalog
+- ``hot_product``: one-unit orders all for the same product
+
+Runs in-process against the ASGI app on ``--url`` (an async driver URL such
+as ``sqlite+aiosqlite://`` selects the async engine), or against a running
+server with ``--base-url``. The products are discovered through the API, so
+seed the database first (``python -m benchmarks.seed``)::
+
+    python -m benchmarks.loadtest browse orders hot_product --url sqlite:///bench.db --concurrency 50
+    python -m benchmarks.loadtest orders --base-url http://localhost:8000 --duration 60 --output run.json
+
+Each scenario runs for ``--requests`` requests, or ``--duration`` seconds
+if given, and reports throughput, p50/p95/p99 latency, the error rate and
+the status codes seen.
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.main import app
+from benchmarks.bench_search import NOUNS
+from benchmarks.common import app_client, run_load, use_async_database, use_sync_database
+
+SCENARIOS = ("browse", "orders", "hot_product")
+
+
+class Scenario:
+    def __init__(self, client: httpx.AsyncClient, product_ids: list[int], args):
+        self.client = client
+        self.product_ids = product_ids
+        self.product_headers = {"x-token": args.product_token}
+        self.order_headers = {"x-token": args.order_token}
+        self.cursors: list[str] = []
+        self.status_codes: Counter = Counter()
+
+    async def send(self, name: str) -> bool:
+        try:
+            response = await getattr(self, name)()
+        except httpx.HTTPError as e:
+            # Timeouts and refused connections of a server under load
+            self.status_codes[type(e).__name__] += 1
+            return False
+        self.status_codes[str(response.status_code)] += 1
+        return response.status_code == 200
+
+    async def browse(self) -> httpx.Response:
+        roll = random.random()
+        if roll < 0.4:
+            cursor = random.choice(self.cursors) if self.cursors and random.random() < 0.5 else None
+            params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+            response = await self.client.get("/api/v1/products/", params=params, headers=self.product_headers)
+            if response.status_code == 200 and response.json()["next_cursor"] and len(self.cursors) < 1000:
+                self.cursors.append(response.json()["next_cursor"])
+            return response
+        if roll < 0.9:
+            return await self.client.get(f"/api/v1/products/{random.choice(self.product_ids)}", headers=self.product_headers)
+        return await self.client.get("/api/v1/products/search", params={"q": random.choice(NOUNS)},
+                                     headers=self.product_headers)
+
+    async def orders(self) -> httpx.Response:
+        return await self.order(random.choice(self.product_ids))
+
+    async def hot_product(self) -> httpx.Response:
+        return await self.order(self.product_ids[0])
+
+    async def order(self, product_id: int) -> httpx.Response:
+        return await self.client.post("/api/v1/orders/", json={"products": [{"product_id": product_id, "quantity": 1}]},
+                                      headers=self.order_headers)
+
+
+async def discover_products(client: httpx.AsyncClient, limit: int, token: str) -> list[int]:
+    product_ids: list[int] = []
+    params = {"limit": 100}
+    while len(product_ids) < limit:
+        response = await client.get("/api/v1/products/", params=params, headers={"x-token": token})
+        if response.status_code != 200:
+            raise SystemExit(f"Listing the products failed with {response.status_code}: {response.text}")
+        page = response.json()
+        product_ids.extend(product["id"] for product in page["products"])
+        if not page["next_cursor"]:
+            break
+        params = {"limit": 100, "cursor": page["next_cursor"]}
+    return product_ids[:limit]
+
+
+async def main(args) -> dict:
+    engine = None
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+        target = args.base_url
+    else:
+        url = make_url(args.url)
+        # One connection per client; SQLite's drivers pick their own pool
+        pool = {} if url.get_backend_name() == "sqlite" else {"pool_size": args.concurrency}
+        if url.get_dialect().is_async:
+            engine = use_async_database(args.url, **pool)
+        else:
+            engine = use_sync_database(args.url, **pool)
+        client = app_client(timeout=args.timeout)
+        target = f"in-process {url.render_as_string(hide_password=True)}"
+
+    results = {}
+    try:
+        async with client:
+            product_ids = await discover_products(client, args.products, args.product_token)
+            if not product_ids:
+                raise SystemExit("No products found, seed the database first (python -m benchmarks.seed)")
+            for name in args.scenarios:
+                scenario = Scenario(client, product_ids, args)
+                summary = await run_load(lambda i: scenario.send(name), args.requests, args.concurrency, args.duration)
+                results[name] = {**summary, "status_codes": dict(scenario.status_codes)}
+    finally:
+        if engine is not None:
+            app.dependency_overrides.clear()
+            dispose = engine.dispose()
+            if asyncio.iscoroutine(dispose):
+                await dispose
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "target": target,
+        "concurrency": args.concurrency,
+        "products": len(product_ids),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--base-url", help="load a running server instead of the in-process app")
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI), help="database of the in-process app")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--duration", type=float, help="seconds per scenario, instead of --requests")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--products", type=int, default=1000, help="products discovered and ordered from")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--product-token", default=settings.PRODUCT_TOKEN)
+    parser.add_argument("--order-token", default=settings.ORDER_TOKEN)
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    if set(args.scenarios) - set(SCENARIOS):
+        parser.error(f"unknown scenario, choose from {', '.join(SCENARIOS)}")
+    result = asyncio.run(main(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
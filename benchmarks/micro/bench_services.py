@@ -0,0 +1,40 @@
+"""Timings of the service hot paths, against a saved baseline.
+
+Save a baseline, then fail any later run whose median regresses by more
+than 25% against it (back to back runs on one machine differ by up to ~20%)::
+
+    python -m pytest -c benchmarks/micro/pytest.ini benchmarks/micro --benchmark-save=baseline
+    python -m pytest -c benchmarks/micro/pytest.ini benchmarks/micro --benchmark-compare --benchmark-compare-fail=median:25%
+
+Add ``--db-url`` to time a local PostgreSQL instead of SQLite in-memory.
+"""
+import pytest
+from app.schemas.order import OrderCreate
+from app.schemas.product import FilterProductParams, ProductCreate
+from app.services.order_management_service import OrderManagementService
+from app.services.product_service import ProductService, product_cache
+
+PAGE_SIZES = (10, 50, 100)
+ORDER_LINES = (1, 10, 100)
+
+
+def bench_create_product(benchmark, db_session):
+    service = ProductService(db_session)
+    product = ProductCreate(name="Benchmark product", description="Created by a benchmark", price=10, stock=1)
+    benchmark(service.create_product, product)
+
+
+@pytest.mark.parametrize("page_size", PAGE_SIZES)
+def bench_get_all_products(benchmark, db_session, catalog, page_size):
+    # The page cache is emptied before every call: this times the query and
+    # the validation, not a cache hit
+    service = ProductService(db_session)
+    benchmark.pedantic(service.get_all_products, args=(FilterProductParams(limit=page_size),),
+                       setup=product_cache.clear, rounds=200, warmup_rounds=5)
+
+
+@pytest.mark.parametrize("lines", ORDER_LINES)
+def bench_process_order(benchmark, db_session, catalog, lines):
+    service = OrderManagementService(db_session)
+    order = OrderCreate(products=[{"product_id": product_id, "quantity": 1} for product_id in catalog[:lines]])
+    benchmark(service.process_order, order)
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.models.base_model import Base
+from app.models.product import Product
+from app.services.product_service import product_cache
+
+CATALOG_SIZE = 200
+
+def pytest_addoption(parser):
+    parser.addoption("--db-url", default="sqlite://",
+                     help="database to time the services on (default: SQLite in-memory). Use a scratch "
+                          "database, e.g. postgresql+psycopg://postgres@localhost/bench: the tables are "
+                          "created if missing and rows are added on every run")
+
+@pytest.fixture(scope="session")
+def db_engine(request):
+    url = request.config.getoption("--db-url")
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db_session(db_engine, benchmark):
+    # Runs on different databases must not be compared with each other
+    benchmark.extra_info["database"] = db_engine.dialect.name
+    session = sessionmaker(bind=db_engine, expire_on_commit=False)()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+        product_cache.clear()
+
+@pytest.fixture(scope="session")
+def catalog(db_engine) -> list:
+    """Ids of products of this run, with stock no benchmark can run out of."""
+    with db_engine.begin() as conn:
+        return list(conn.scalars(insert(Product).returning(Product.id, sort_by_parameter_order=True), [
+            {"name": f"Benchmark product {i}", "description": "Micro-benchmark product", "price": 10, "stock": 10**9}
+            for i in range(CATALOG_SIZE)
+        ]))
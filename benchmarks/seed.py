@@ -0,0 +1,95 @@
+"""Fill a database with synthetic products and orders for load tests.
+
+Tops the tables up to ``--products`` products and ``--orders`` orders (rows
+already there count), in multi-row inserts of ``--batch-size``. Products get
+searchable names and effectively unlimited stock so that order scenarios
+never run dry; orders get 1-3 lines with their ``order_items`` snapshots,
+spread over the past year::
+
+    python -m benchmarks.seed --url sqlite:///bench.db --products 100000 --orders 1000000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select
+
+from app.core.config import settings
+from app.models.base_model import Base
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.product import Product
+from benchmarks.bench_search import ADJECTIVES, FILLER, MATERIALS, NOUNS
+
+STOCK = 10**9
+
+
+def seed_products(conn, count: int, batch_size: int, rng: random.Random) -> int:
+    existing = conn.scalar(select(func.count()).select_from(Product))
+    for start in range(existing, count, batch_size):
+        conn.execute(insert(Product), [{
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(MATERIALS)} {rng.choice(NOUNS)}".title(),
+            "description": " ".join(rng.sample(FILLER, 6)),
+            "price": rng.randint(5, 500),
+            "stock": STOCK,
+        } for _ in range(start, min(start + batch_size, count))])
+    return max(count - existing, 0)
+
+
+def seed_orders(conn, count: int, batch_size: int, rng: random.Random) -> int:
+    existing = conn.scalar(select(func.count()).select_from(Order))
+    if existing >= count:
+        return 0
+    products = {row.id: row for row in conn.execute(select(Product.id, Product.name, Product.price))}
+    product_ids = list(products)
+    if not product_ids:
+        raise SystemExit("No products to order, seed some with --products")
+    now = datetime.now()
+    for start in range(existing, count, batch_size):
+        baskets = [{product_id: rng.randint(1, 3) for product_id in rng.sample(product_ids, rng.randint(1, 3))}
+                   for _ in range(start, min(start + batch_size, count))]
+        order_ids = conn.scalars(insert(Order).returning(Order.id, sort_by_parameter_order=True), [{
+            "products": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in basket.items()],
+            "total_price": sum(products[product_id].price * quantity for product_id, quantity in basket.items()),
+            "status": OrderStatus.COMPLETED,
+            "created_at": now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+        } for basket in baskets]).all()
+        conn.execute(insert(OrderItem), [{
+            "order_id": order_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "unit_price": products[product_id].price,
+            "product_name": products[product_id].name,
+        } for order_id, basket in zip(order_ids, baskets) for product_id, quantity in basket.items()])
+    return count - existing
+
+
+def main(args) -> dict:
+    rng = random.Random(args.seed)
+    engine = create_engine(args.url)
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    # One transaction per table: the orders need the products committed
+    with engine.begin() as conn:
+        products = seed_products(conn, args.products, args.batch_size, rng)
+    with engine.begin() as conn:
+        orders = seed_orders(conn, args.orders, args.batch_size, rng) if args.orders else 0
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return {
+        "products_added": products,
+        "orders_added": orders,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round((products + orders) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for reproducible data")
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -10,4 +10,4 @@ python setup_db.py
 alembic upgrade head
 
 # Start FastAPI application
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers 2
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers 2 --no-access-log
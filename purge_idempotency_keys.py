@@ -0,0 +1,20 @@
+# purge_idempotency_keys.py
+import argparse
+from app.core.db import SessionLocal
+from app.lib.exceptions import AppException
+from app.services.order_management_service import OrderManagementService
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete the expired POST /orders idempotency keys")
+    parser.add_argument("--batch-size", type=int, default=1000, help="keys deleted per transaction")
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        try:
+            purged = OrderManagementService(session).purge_idempotency_keys(args.batch_size)
+        except AppException as e:
+            parser.exit(1, f"{e.message}: {e.details}\n")
+    print(f"Purged {purged} expired idempotency keys")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# stock_shards.py
+import argparse
+import json
+from app.core.db import SessionLocal
+from app.lib.exceptions import AppException
+from app.services.stock_shard_service import StockShardService
+
+def main():
+    parser = argparse.ArgumentParser(description="Split, rebalance or merge the stock counters of a hot product")
+    commands = parser.add_subparsers(dest="command", required=True)
+    split = commands.add_parser("split", help="spread the product's stock over N shard rows")
+    split.add_argument("product_id", type=int)
+    split.add_argument("--shards", type=int, required=True)
+    for name, help in (("rebalance", "even out the existing shards"),
+                       ("merge", "move the stock back into products.stock"),
+                       ("show", "print the shards")):
+        commands.add_parser(name, help=help).add_argument("product_id", type=int)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        service = StockShardService(session)
+        try:
+            if args.command == "split":
+                result = service.reshard(args.product_id, args.shards)
+            elif args.command == "rebalance":
+                result = service.rebalance(args.product_id)
+            elif args.command == "merge":
+                result = service.merge(args.product_id)
+            else:
+                result = service.describe(args.product_id)
+        except AppException as e:
+            parser.exit(1, f"{e.message}: {e.details}\n")
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()